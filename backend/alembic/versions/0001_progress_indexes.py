@@ -0,0 +1,58 @@
+"""Indexes for progress / attempt lookups and unique (user_id, lesson_id) progress
+
+Tables themselves are created by Base.metadata.create_all (main.py, init_db.py),
+so on a fresh database these objects may already exist and are skipped.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_modules_course_id", "modules", ["course_id"]),
+    ("ix_lessons_module_id_lesson_number", "lessons", ["module_id", "lesson_number"]),
+    ("ix_user_progress_user_id_module_id", "user_progress", ["user_id", "module_id"]),
+    ("ix_test_attempts_user_id_module_id", "test_attempts", ["user_id", "module_id"]),
+]
+
+
+def _existing_names(table: str) -> set:
+    inspector = sa.inspect(op.get_bind())
+    names = {index["name"] for index in inspector.get_indexes(table)}
+    names |= {constraint["name"] for constraint in inspector.get_unique_constraints(table)}
+    return names
+
+
+def upgrade() -> None:
+    if "uq_user_progress_user_id_lesson_id" not in _existing_names("user_progress"):
+        # Drop duplicate lesson progress rows, keeping a completed one where present
+        op.execute("""
+            DELETE FROM user_progress a
+            USING user_progress b
+            WHERE a.lesson_id IS NOT NULL
+              AND a.user_id = b.user_id
+              AND a.lesson_id = b.lesson_id
+              AND (COALESCE(a.is_completed, false), a.id) < (COALESCE(b.is_completed, false), b.id)
+        """)
+        op.create_unique_constraint(
+            "uq_user_progress_user_id_lesson_id", "user_progress", ["user_id", "lesson_id"]
+        )
+
+    for name, table, columns in INDEXES:
+        if name not in _existing_names(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    op.drop_constraint("uq_user_progress_user_id_lesson_id", "user_progress", type_="unique")
@@ -0,0 +1,56 @@
+"""Unique attempt numbers per user/module and submission idempotency keys
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    columns = {column["name"] for column in inspector.get_columns("test_attempts")}
+    constraints = {constraint["name"] for constraint in inspector.get_unique_constraints("test_attempts")}
+
+    if "idempotency_key" not in columns:
+        op.add_column("test_attempts", sa.Column("idempotency_key", sa.String(), nullable=True))
+
+    if "uq_test_attempts_user_id_module_id_attempt_number" not in constraints:
+        # Renumber attempts in submission order to remove duplicates left by the old count() + 1
+        op.execute("""
+            UPDATE test_attempts t
+            SET attempt_number = numbered.rn
+            FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY user_id, module_id
+                    ORDER BY submitted_at NULLS LAST, started_at, id
+                ) AS rn
+                FROM test_attempts
+            ) numbered
+            WHERE t.id = numbered.id AND t.attempt_number IS DISTINCT FROM numbered.rn
+        """)
+        op.create_unique_constraint(
+            "uq_test_attempts_user_id_module_id_attempt_number",
+            "test_attempts",
+            ["user_id", "module_id", "attempt_number"]
+        )
+
+    if "uq_test_attempts_user_id_module_id_idempotency_key" not in constraints:
+        op.create_unique_constraint(
+            "uq_test_attempts_user_id_module_id_idempotency_key",
+            "test_attempts",
+            ["user_id", "module_id", "idempotency_key"]
+        )
+
+
+def downgrade() -> None:
+    op.drop_constraint("uq_test_attempts_user_id_module_id_idempotency_key", "test_attempts", type_="unique")
+    op.drop_constraint("uq_test_attempts_user_id_module_id_attempt_number", "test_attempts", type_="unique")
+    op.drop_column("test_attempts", "idempotency_key")
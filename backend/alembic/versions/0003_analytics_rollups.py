@@ -0,0 +1,130 @@
+"""Analytics rollup tables, backfilled from user_progress and test_attempts
+
+The tables may already exist (created empty by Base.metadata.create_all at
+startup, possibly without the newer columns); missing ones are added and the
+backfill recomputes the rollups from the source tables either way.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def module_user_stats_columns():
+    return [
+        sa.Column("user_id", UUID(as_uuid=True), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("module_id", sa.String(), sa.ForeignKey("modules.id"), primary_key=True),
+        sa.Column("lessons_completed", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("passed", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("passed_attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("best_percentage", sa.Float(), nullable=True),
+        sa.Column("percentage_sum", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("time_spent_seconds", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    ]
+
+
+def module_stats_columns():
+    return [
+        sa.Column("module_id", sa.String(), sa.ForeignKey("modules.id"), primary_key=True),
+        sa.Column("passed_learners", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("passed_attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("percentage_sum", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("time_spent_seconds", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    ]
+
+
+def module_stat_buckets_columns():
+    return [
+        sa.Column("module_id", sa.String(), sa.ForeignKey("modules.id"), primary_key=True),
+        sa.Column("metric", sa.String(), primary_key=True),  # lessons, attempts
+        sa.Column("value", sa.Integer(), primary_key=True),
+        sa.Column("users", sa.Integer(), nullable=False, server_default="0"),
+    ]
+
+
+TABLES = [
+    ("module_user_stats", module_user_stats_columns),
+    ("module_stats", module_stats_columns),
+    ("module_stat_buckets", module_stat_buckets_columns),
+]
+
+# Same computation as app.rollups, frozen as of this revision
+BACKFILL = [
+    "DELETE FROM module_stat_buckets",
+    "DELETE FROM module_stats",
+    "DELETE FROM module_user_stats",
+    """
+    INSERT INTO module_user_stats (user_id, module_id, lessons_completed, attempts, passed,
+                                   passed_attempts, best_percentage, percentage_sum,
+                                   time_spent_seconds, updated_at)
+    SELECT user_id, module_id, sum(lessons_completed), sum(attempts), bool_or(passed),
+           sum(passed_attempts), max(best_percentage), sum(percentage_sum),
+           sum(time_spent_seconds), now()
+    FROM (
+        SELECT user_id, module_id, count(*) AS lessons_completed, 0 AS attempts, false AS passed,
+               0 AS passed_attempts, NULL::float AS best_percentage, 0::float AS percentage_sum,
+               0 AS time_spent_seconds
+        FROM user_progress
+        WHERE is_completed = true AND lesson_id IS NOT NULL
+        GROUP BY user_id, module_id
+        UNION ALL
+        SELECT user_id, module_id, 0, count(*), bool_or(passed),
+               count(*) FILTER (WHERE passed = true), max(percentage),
+               coalesce(sum(percentage), 0), coalesce(sum(time_spent_seconds), 0)
+        FROM test_attempts
+        GROUP BY user_id, module_id
+    ) combined
+    GROUP BY user_id, module_id
+    """,
+    """
+    INSERT INTO module_stats (module_id, passed_learners, attempts, passed_attempts,
+                              percentage_sum, time_spent_seconds, updated_at)
+    SELECT module_id, count(*) FILTER (WHERE passed = true), sum(attempts), sum(passed_attempts),
+           sum(percentage_sum), sum(time_spent_seconds), now()
+    FROM module_user_stats
+    GROUP BY module_id
+    """,
+    """
+    INSERT INTO module_stat_buckets (module_id, metric, value, users)
+    SELECT module_id, 'lessons', lessons_completed, count(*)
+    FROM module_user_stats GROUP BY module_id, lessons_completed
+    UNION ALL
+    SELECT module_id, 'attempts', attempts, count(*)
+    FROM module_user_stats GROUP BY module_id, attempts
+    """,
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    existing_tables = set(inspector.get_table_names())
+    for name, columns in TABLES:
+        if name not in existing_tables:
+            op.create_table(name, *columns())
+            continue
+        existing = {column["name"] for column in inspector.get_columns(name)}
+        for column in columns():
+            if column.name not in existing:
+                op.add_column(name, column)
+    for statement in BACKFILL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    existing_tables = set(sa.inspect(op.get_bind()).get_table_names())
+    for name, _ in reversed(TABLES):
+        if name in existing_tables:
+            op.drop_table(name)
@@ -0,0 +1,25 @@
+"""Stored test sittings, one per user, module and attempt number
+
+The table may already exist (created by Base.metadata.create_all at startup).
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+"""
+from alembic import op
+
+from app.models import TestSession
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    TestSession.__table__.create(op.get_bind(), checkfirst=True)
+
+
+def downgrade() -> None:
+    TestSession.__table__.drop(op.get_bind(), checkfirst=True)
@@ -1,22 +1,102 @@
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from fastapi import Depends, HTTPException, status, Request, Security
 from fastapi.security import OAuth2PasswordBearer, HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models import User
+from app.password_pool import password_pool, PasswordPoolSaturated
 import os
+import time
+import uuid
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60  # 30 days
 
+# Authenticated users are cached briefly so steady-state requests skip the users lookup.
+# Updates are broadcast to all workers (PRINCIPAL_CHANNEL); the TTL bounds staleness
+# only while a worker's LISTEN connection is down.
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+PRINCIPAL_CHANNEL = "principal_changed"
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
 
+@dataclass(frozen=True, slots=True)
+class CurrentUser:
+    """Immutable snapshot of the authenticated user, safe to share between requests"""
+    id: uuid.UUID
+    email: str
+    full_name: Optional[str]
+    role: str
+    is_superuser: bool
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> "CurrentUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            role=user.role,
+            is_superuser=bool(user.is_superuser),
+            is_active=bool(user.is_active),
+        )
+
+
+class PrincipalCache:
+    """Size-bounded TTL cache of CurrentUser snapshots keyed by user id (JWT sub)"""
+
+    def __init__(self, ttl_seconds: float = AUTH_CACHE_TTL_SECONDS, max_entries: int = AUTH_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, CurrentUser]]" = OrderedDict()
+
+    def get(self, user_id: str) -> Optional[CurrentUser]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, principal = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(user_id, None)
+            return None
+        self._entries.move_to_end(user_id)
+        return principal
+
+    def set(self, user_id: str, principal: CurrentUser) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        self._entries[user_id] = (time.monotonic() + self.ttl_seconds, principal)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id) -> None:
+        self._entries.pop(str(user_id), None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+principal_cache = PrincipalCache()
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_updated_user(mapper, connection, target: User):
+    # Role, superuser or active flag changes must not be served from a stale snapshot:
+    # drop it here, and in the other workers once the transaction commits
+    principal_cache.invalidate(target.id)
+    connection.execute(select(func.pg_notify(PRINCIPAL_CHANNEL, str(target.id))))
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -25,6 +105,22 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def _run_in_password_pool(func, *args):
+    try:
+        return await password_pool.run(func, *args)
+    except PasswordPoolSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent sign-ins, please retry",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def hash_password(password: str) -> str:
+    """get_password_hash off the event loop; 503 when the password pool is saturated"""
+    return await _run_in_password_pool(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -36,23 +132,31 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
-    return db.query(User).filter(User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    return await db.scalar(select(User).filter(User.email == email))
+
 
+async def release_connection(db: AsyncSession) -> None:
+    """End the session's transaction and return its connection to the pool.
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-    user = get_user_by_email(db, email)
+    Loaded objects stay usable (detached). Call before awaiting the password
+    pool, so queued sign-ins don't hold DB connections.
+    """
+    await db.close()
+
+
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
+    user = await get_user_by_email(db, email)
+    await release_connection(db)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await _run_in_password_pool(verify_password, password, user.hashed_password):
         return None
     return user
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+async def get_user_from_token(db: AsyncSession, token: str) -> CurrentUser:
+    """Validate a JWT and resolve its user, using the principal cache when possible"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -61,21 +165,36 @@ async def get_current_user(
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
-        if user_id is None:
+        # Access tokens carry no typ; anything else (e.g. a test session) is not a login
+        if user_id is None or payload.get("typ") is not None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.id == user_id).first()
+
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    user = await db.scalar(select(User).filter(User.id == user_id))
     if user is None:
         raise credentials_exception
-    return user
+    principal = CurrentUser.from_user(user)
+    principal_cache.set(user_id, principal)
+    return principal
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> CurrentUser:
+    return await get_user_from_token(db, token)
 
 
 async def get_current_user_optional_token(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     credentials: Optional[HTTPAuthorizationCredentials] = Security(HTTPBearer(auto_error=False))
-) -> User:
+) -> CurrentUser:
     """Get current user supporting token from header or query parameter"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -93,26 +212,27 @@ async def get_current_user_optional_token(
     
     if not token:
         raise credentials_exception
-    
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise credentials_exception
-    return user
+
+    return await get_user_from_token(db, token)
 
 
 async def get_current_admin_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: CurrentUser = Depends(get_current_user)
+) -> CurrentUser:
     if not current_user.is_superuser:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
     return current_user
+
+
+async def get_current_hr_user(
+    current_user: CurrentUser = Depends(get_current_user)
+) -> CurrentUser:
+    if current_user.role != "hr" and not current_user.is_superuser:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return current_user
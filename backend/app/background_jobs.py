@@ -0,0 +1,112 @@
+"""Long-running admin operations as background tasks of the API process.
+
+The endpoint creates a job and answers 202 at once, so the work is not cut
+off by proxy timeouts. Each job's status (queued/running/done/failed,
+progress, result) is a JSON file under storage/jobs/<kind>, so any API
+worker can report it. Used by user imports and test re-scoring.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+BACKGROUND_JOB_TTL_SECONDS = int(os.getenv("BACKGROUND_JOB_TTL_HOURS", "24")) * 3600
+
+Progress = Callable[[Dict[str, Any]], None]
+
+
+class BackgroundJobs:
+    """Base class: subclasses create jobs with _new_job() and implement _work()"""
+
+    # Used in log messages
+    label = "Background job"
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._tasks: Set[asyncio.Task] = set()
+
+    def job_path(self, job_id: str, suffix: str) -> Optional[Path]:
+        """Path of a file belonging to a job, None for a malformed job id"""
+        try:
+            job_id = uuid.UUID(job_id).hex
+        except ValueError:
+            return None
+        return self.root / f"{job_id}{suffix}"
+
+    def _write_status(self, job: Dict[str, Any], **changes) -> None:
+        job.update(changes, updated_at=datetime.utcnow().isoformat())
+        tmp_path = self.root / f".{job['job_id']}.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, self.root / f"{job['job_id']}.json")
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        path = self.job_path(job_id, ".json")
+        if path is None or not path.exists():
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _new_job(self, **fields) -> Dict[str, Any]:
+        """Record a queued job. Blocking - call from a worker thread."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.cleanup_stale()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "created_at": datetime.utcnow().isoformat(),
+            "progress": None,
+            "result": None,
+            "error": None,
+            **fields,
+        }
+        self._write_status(job)
+        return job
+
+    async def _work(self, job: Dict[str, Any], progress: Progress) -> Any:
+        """Do the job; the return value is stored as its result"""
+        raise NotImplementedError
+
+    def _finished(self, job: Dict[str, Any]) -> None:
+        """Called after the job ended, whatever the outcome (e.g. to remove its input files)"""
+
+    def start(self, job: Dict[str, Any]) -> None:
+        task = asyncio.create_task(self._run(dict(job)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        self._write_status(job, status="running")
+        try:
+            result = await self._work(job, lambda progress: self._write_status(job, progress=progress))
+            self._write_status(job, status="done", result=result)
+        except asyncio.CancelledError:
+            self._write_status(job, status="failed", error="Interrupted by server shutdown")
+            raise
+        except Exception as e:
+            logger.error(f"{self.label} {job['job_id']} failed: {e}")
+            self._write_status(job, status="failed", error=str(e))
+        finally:
+            self._finished(job)
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def cleanup_stale(self, max_age_seconds: int = BACKGROUND_JOB_TTL_SECONDS) -> int:
+        """Remove job files not updated for max_age_seconds; returns number removed"""
+        removed = 0
+        cutoff = time.time() - max_age_seconds
+        for path in self.root.iterdir():
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
@@ -0,0 +1,119 @@
+"""Request body size limits enforced while the body is received.
+
+FastAPI parses File()/Form() parameters (spooling the whole multipart body)
+before the endpoint runs, so a size check on the parsed upload comes too late.
+Endpoints taking large bodies read them from limited_request() instead:
+Content-Length is checked up front, and a running byte count rejects chunked
+bodies that pass the limit while they are still being received.
+
+DiskMultiPartParser writes file parts straight into a given directory, so an
+upload is written to disk once and can then be linked into place, instead of
+being spooled to an anonymous temp file and copied again.
+"""
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import AsyncGenerator, List
+
+from fastapi import HTTPException, Request
+from starlette.datastructures import FormData, Headers
+from starlette.formparsers import MultiPartException, MultiPartParser
+from starlette.types import Message
+
+# Room for multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Request body is larger than {max_bytes} bytes")
+
+
+def check_content_length(request: Request, max_bytes: int) -> None:
+    """400 for a malformed Content-Length, 413 if it announces more than max_bytes"""
+    content_length = request.headers.get("content-length")
+    if content_length is None:
+        return
+    try:
+        length = int(content_length)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+    if length < 0:
+        raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+    if length > max_bytes:
+        raise _too_large(max_bytes)
+
+
+def limited_request(request: Request, max_bytes: int) -> Request:
+    """The same request, failing with 413 as soon as more than max_bytes of body arrive"""
+    check_content_length(request, max_bytes)
+    received = 0
+
+    async def receive() -> Message:
+        nonlocal received
+        message = await request.receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > max_bytes:
+                raise _too_large(max_bytes)
+        return message
+
+    return Request(request.scope, receive)
+
+
+class DiskUploadFile:
+    """File of an upload parsed by DiskMultiPartParser: a named temp file, hashed as it is written"""
+
+    def __init__(self, upload_dir: Path):
+        self._file = tempfile.NamedTemporaryFile(dir=upload_dir, prefix=".upload_", suffix=".part", delete=False)
+        self.path = Path(self._file.name)
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class DiskMultiPartParser(MultiPartParser):
+    """Multipart parser writing each file part to a hidden temp file in upload_dir.
+
+    upload_dir should be on the same filesystem as the upload's destination.
+    The UploadFile.file of parsed uploads is a DiskUploadFile. The caller
+    must call cleanup() (blocking) once the uploads are published or rejected.
+    """
+
+    def __init__(
+        self, headers: Headers, stream: AsyncGenerator[bytes, None], upload_dir: Path, max_files: int = 1
+    ):
+        super().__init__(headers, stream, max_files=max_files)
+        self.upload_dir = upload_dir
+        self.files: List[DiskUploadFile] = []
+
+    def on_headers_finished(self) -> None:
+        super().on_headers_finished()
+        upload = self._current_part.file
+        if upload is None:
+            return
+        # Replace the (still empty) spooled file Starlette created for the part
+        upload.file.close()
+        disk_file = DiskUploadFile(self.upload_dir)
+        self.files.append(disk_file)
+        self._files_to_close_on_error[-1] = disk_file
+        upload.file = disk_file
+
+    async def parse(self) -> FormData:
+        """Parse the body, answering 400 for a malformed multipart body like Request.form()"""
+        if not self.headers.get("content-type", "").startswith("multipart/form-data"):
+            raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
+        try:
+            return await super().parse()
+        except MultiPartException as e:
+            raise HTTPException(status_code=400, detail=e.message)
+
+    def cleanup(self) -> None:
+        """Close and remove the temp files (videos published from them locally are hard links and stay)"""
+        for disk_file in self.files:
+            disk_file.close()
+            disk_file.path.unlink(missing_ok=True)
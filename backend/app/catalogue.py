@@ -0,0 +1,63 @@
+"""Catalogue lookups shared by the routers.
+
+Content endpoints need a lesson or module together with its course_id to
+build storage paths. These helpers fetch both in a single joined query and
+raise the usual 404s.
+"""
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Lesson, Module
+
+
+def _lesson_with_course_id(module_id: str):
+    return (
+        select(Lesson, Module.course_id)
+        .join(Module, Module.id == Lesson.module_id)
+        .filter(Lesson.module_id == module_id)
+    )
+
+
+async def get_module_or_404(db: AsyncSession, module_id: str) -> Module:
+    module = await db.scalar(select(Module).filter(Module.id == module_id))
+    if not module:
+        raise HTTPException(status_code=404, detail="Module not found")
+    return module
+
+
+async def get_module_course_id(db: AsyncSession, module_id: str) -> str:
+    """course_id of a module, or 404 - when the module row itself is not needed"""
+    course_id = await db.scalar(select(Module.course_id).filter(Module.id == module_id))
+    if course_id is None:
+        raise HTTPException(status_code=404, detail="Module not found")
+    return str(course_id)
+
+
+async def get_lesson_with_course_id(db: AsyncSession, module_id: str, lesson_number: int) -> Tuple[Lesson, str]:
+    """Lesson and its course_id, or 404"""
+    row = (await db.execute(
+        _lesson_with_course_id(module_id).filter(Lesson.lesson_number == lesson_number)
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Lesson not found")
+    return row[0], str(row[1])
+
+
+async def get_lesson_and_next_with_course_id(
+    db: AsyncSession, module_id: str, lesson_number: int
+) -> Tuple[Lesson, Optional[Lesson], str]:
+    """Lesson, the following lesson (if any) and the course_id, or 404"""
+    rows = (await db.execute(
+        _lesson_with_course_id(module_id).filter(
+            Lesson.lesson_number.in_((lesson_number, lesson_number + 1))
+        )
+    )).all()
+    by_number = {lesson.lesson_number: (lesson, course_id) for lesson, course_id in rows}
+    if lesson_number not in by_number:
+        raise HTTPException(status_code=404, detail="Lesson not found")
+    lesson, course_id = by_number[lesson_number]
+    next_lesson = by_number.get(lesson_number + 1, (None, None))[0]
+    return lesson, next_lesson, str(course_id)
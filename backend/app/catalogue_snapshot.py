@@ -0,0 +1,264 @@
+"""Process-wide, immutable snapshot of the catalogue (courses -> modules -> lessons).
+
+The catalogue only changes through admin edits, so catalogue reads are
+served from memory. The snapshot is loaded at startup and replaced as a
+whole, never mutated. Writers call notify_changed() inside their
+transaction; PostgreSQL delivers the NOTIFY on commit to every worker
+LISTENing on CATALOGUE_CHANNEL, and each one reloads its snapshot.
+Other per-process caches receive their invalidations over the same LISTEN
+connection (subscribe()).
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import ASYNC_DATABASE_URL, AsyncSessionLocal
+from app.models import Course, Module, Lesson
+
+logger = logging.getLogger(__name__)
+
+CATALOGUE_CHANNEL = "catalogue_changed"
+CATALOGUE_RECONNECT_SECONDS = float(os.getenv("CATALOGUE_RECONNECT_SECONDS", "5"))
+
+# Plain asyncpg DSN for the dedicated LISTEN connection
+LISTEN_DSN = make_url(ASYNC_DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+# Attributes making up the listing orders below, and the types of their values
+CATALOGUE_KEY_FIELDS = ("id", "order_index")
+LESSON_KEY_FIELDS = ("id", "lesson_number")
+ORDER_KEY_TYPES = (int, str)
+
+
+def catalogue_order(record) -> Tuple[int, str]:
+    """Unique listing order of courses and modules (also the pagination key)"""
+    return (record.order_index or 0, str(record.id))
+
+
+def lesson_order(record) -> Tuple[int, str]:
+    """Unique listing order of lessons within a module (also the pagination key)"""
+    return (record.lesson_number, record.id)
+
+
+class LessonRecord:
+    __slots__ = ("id", "module_id", "lesson_number", "title", "order_index", "is_active", "updated_at")
+
+    def __init__(self, lesson: Lesson):
+        self.id = lesson.id
+        self.module_id = lesson.module_id
+        self.lesson_number = lesson.lesson_number
+        self.title = lesson.title
+        self.order_index = lesson.order_index
+        self.is_active = lesson.is_active
+        self.updated_at = lesson.updated_at
+
+
+class ModuleRecord:
+    __slots__ = (
+        "id", "course_id", "title", "description", "total_lessons",
+        "order_index", "is_active", "updated_at", "lessons"
+    )
+
+    def __init__(self, module: Module, lessons: Tuple[LessonRecord, ...]):
+        self.id = module.id
+        self.course_id = module.course_id
+        self.title = module.title
+        self.description = module.description
+        self.total_lessons = module.total_lessons
+        self.order_index = module.order_index
+        self.is_active = module.is_active
+        self.updated_at = module.updated_at
+        self.lessons = lessons  # ordered by lesson_order
+
+
+class CourseRecord:
+    __slots__ = ("id", "title", "description", "order_index", "is_active", "updated_at", "modules", "active_modules")
+
+    def __init__(self, course: Course, modules: Tuple[ModuleRecord, ...]):
+        self.id = course.id
+        self.title = course.title
+        self.description = course.description
+        self.order_index = course.order_index
+        self.is_active = course.is_active
+        self.updated_at = course.updated_at
+        self.modules = modules  # ordered by catalogue_order
+        self.active_modules = tuple(module for module in modules if module.is_active)
+
+
+class CatalogueSnapshot:
+    """Ordered catalogue with id indexes. Shared between requests - read only."""
+    __slots__ = (
+        "courses", "modules", "version", "last_modified",
+        "_active_courses", "_active_modules", "_courses_by_id", "_modules_by_id"
+    )
+
+    def __init__(self, courses: List[Course], modules: List[Module], lessons: List[Lesson]):
+        lessons_by_module: Dict[str, List[LessonRecord]] = {}
+        for lesson in sorted(lessons, key=lesson_order):
+            lessons_by_module.setdefault(lesson.module_id, []).append(LessonRecord(lesson))
+
+        module_records = [
+            ModuleRecord(module, tuple(lessons_by_module.get(module.id, ())))
+            for module in sorted(modules, key=catalogue_order)
+        ]
+        modules_by_course: Dict[uuid.UUID, List[ModuleRecord]] = {}
+        for module in module_records:
+            modules_by_course.setdefault(module.course_id, []).append(module)
+
+        self.courses = tuple(
+            CourseRecord(course, tuple(modules_by_course.get(course.id, ())))
+            for course in sorted(courses, key=catalogue_order)
+        )
+        self.modules = tuple(module_records)  # all courses, ordered by catalogue_order
+        self._active_courses = tuple(course for course in self.courses if course.is_active)
+        self._active_modules = tuple(module for module in self.modules if module.is_active)
+        self._courses_by_id = {course.id: course for course in self.courses}
+        self._modules_by_id = {module.id: module for module in self.modules}
+
+        # Validators for HTTP caching: identical data gives the same version in every worker
+        stamps = sorted(
+            f"{row.id}@{row.updated_at}" for rows in (courses, modules, lessons) for row in rows
+        )
+        self.version = hashlib.sha1("|".join(stamps).encode("utf-8")).hexdigest()
+        self.last_modified: Optional[datetime] = max(
+            (row.updated_at for rows in (courses, modules, lessons) for row in rows if row.updated_at),
+            default=None
+        )
+
+    def active_courses(self) -> Tuple[CourseRecord, ...]:
+        return self._active_courses
+
+    def active_modules(self) -> Tuple[ModuleRecord, ...]:
+        return self._active_modules
+
+    def course(self, course_id: str) -> Optional[CourseRecord]:
+        try:
+            return self._courses_by_id.get(uuid.UUID(str(course_id)))
+        except ValueError:
+            return None
+
+    def module(self, module_id: str) -> Optional[ModuleRecord]:
+        return self._modules_by_id.get(module_id)
+
+
+async def load_snapshot(db: AsyncSession) -> CatalogueSnapshot:
+    courses = (await db.scalars(select(Course))).all()
+    modules = (await db.scalars(select(Module))).all()
+    lessons = (await db.scalars(select(Lesson))).all()
+    return CatalogueSnapshot(courses, modules, lessons)
+
+
+class Catalogue:
+    def __init__(self, reconnect_seconds: float = CATALOGUE_RECONNECT_SECONDS):
+        self.reconnect_seconds = reconnect_seconds
+        self._snapshot: Optional[CatalogueSnapshot] = None
+        self._load_lock = asyncio.Lock()
+        # Loads are serialized by _load_lock; generations tell a caller whether
+        # a load that started after its own call has already finished
+        self._loads_started = 0
+        self._loads_done = 0
+        self._changed = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        # channel -> (called with each payload, called after (re)connecting)
+        self._subscriptions: Dict[str, Tuple[Callable[[str], None], Callable[[], None]]] = {}
+
+    async def get(self) -> CatalogueSnapshot:
+        """Current snapshot, loading it on first use"""
+        if self._snapshot is None:
+            async with self._load_lock:
+                # Requests queued behind the first load reuse its snapshot
+                if self._snapshot is None:
+                    await self._load()
+        return self._snapshot
+
+    async def refresh(self) -> None:
+        """Reload the snapshot; callers waiting on the same reload share it"""
+        requested_at = self._loads_started
+        async with self._load_lock:
+            if self._loads_done > requested_at:
+                return
+            await self._load()
+
+    async def _load(self) -> None:
+        self._loads_started += 1
+        generation = self._loads_started
+        async with AsyncSessionLocal() as db:
+            self._snapshot = await load_snapshot(db)
+        self._loads_done = generation
+        logger.info(f"Catalogue snapshot loaded (version {self._snapshot.version[:12]})")
+
+    async def notify_changed(self, db: AsyncSession) -> None:
+        """Announce a catalogue change; delivered to all workers when db commits"""
+        await db.execute(select(func.pg_notify(CATALOGUE_CHANNEL, "")))
+
+    def _on_notify(self, *args) -> None:
+        self._changed.set()
+
+    def subscribe(self, channel: str, on_notify: Callable[[str], None], on_reconnect: Callable[[], None]) -> None:
+        """Also LISTEN on channel; on_reconnect must drop state that missed notifications"""
+        self._subscriptions[channel] = (on_notify, on_reconnect)
+
+    async def _listen(self) -> None:
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(LISTEN_DSN)
+                await connection.add_listener(CATALOGUE_CHANNEL, self._on_notify)
+                for channel, (on_notify, on_reconnect) in self._subscriptions.items():
+                    await connection.add_listener(
+                        channel, lambda _conn, _pid, _channel, payload, on_notify=on_notify: on_notify(payload)
+                    )
+                    on_reconnect()
+                # Changes made while we were not listening were missed - reload
+                self._changed.set()
+                while not connection.is_closed():
+                    await asyncio.sleep(self.reconnect_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Catalogue listener disconnected: {e}")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(self.reconnect_seconds)
+
+    async def _reload_on_change(self) -> None:
+        while True:
+            await self._changed.wait()
+            # Notifications arriving during the reload coalesce into one more reload
+            self._changed.clear()
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Error reloading catalogue snapshot: {e}")
+                await asyncio.sleep(self.reconnect_seconds)
+                self._changed.set()
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._listen()),
+                asyncio.create_task(self._reload_on_change()),
+            ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+
+catalogue = Catalogue()
@@ -0,0 +1,222 @@
+"""Per-course content manifest.
+
+courses/<course_id>/manifest.json lists every content file of the course
+(lesson content, tests, metadata, videos) with its size, mtime and sha256,
+keyed by path relative to the course directory. Lookups and listings are
+answered from the parsed manifest, which is held in the shared ContentCache
+and revalidated with a single stat of manifest.json, instead of probing the
+lesson directories.
+
+StorageService write methods update the manifest under an exclusive file
+lock and replace it atomically. Rebuilds scan and hash without the lock and
+only merge the result in under it, so API writes never wait for hashing.
+Courses without a manifest are scanned (without hashes) by scan_missing()
+at startup, or on first access for courses added later; after editing
+files outside the API run rebuild_manifest.py, which also fills in the
+hashes. Media kept in a remote backend (S3) is listed through media_scan.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+# Derived files that are not content: precompressed and rendered sidecars, lock files
+UNTRACKED_SUFFIXES = {".gz", ".br", ".rendered", ".lock"}
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _entry(path: Path, sha256: Optional[str]) -> Dict[str, Any]:
+    """Entry for a local file (for remote media: the local file it was uploaded from)"""
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256}
+
+
+def _is_tracked(relative_path: Path) -> bool:
+    if relative_path.name == MANIFEST_FILENAME:
+        return False
+    # Hidden files are in-progress uploads / temp files
+    if any(part.startswith(".") for part in relative_path.parts):
+        return False
+    return relative_path.suffix.lower() not in UNTRACKED_SUFFIXES
+
+
+class ContentManifest:
+    def __init__(
+        self,
+        courses_path: Path,
+        cache,
+        media_scan: Optional[Callable[[str], Dict[str, Dict[str, Any]]]] = None
+    ):
+        self.courses_path = courses_path
+        self.cache = cache
+        # Lists remote media objects by storage-relative prefix, see MediaBackend.scan
+        self.media_scan = media_scan
+        self._lock = threading.Lock()
+
+    def _manifest_path(self, course_id: str) -> Path:
+        return self.courses_path / course_id / MANIFEST_FILENAME
+
+    @contextmanager
+    def _locked(self, course_id: str) -> Iterator[None]:
+        """Exclusive lock across threads and worker processes"""
+        lock_path = self._manifest_path(course_id).with_suffix(".lock")
+        with self._lock:
+            with open(lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self, course_id: str) -> Dict[str, Any]:
+        try:
+            return self.cache.get(self._manifest_path(course_id), _read_manifest)
+        except FileNotFoundError:
+            return {}
+
+    def _write(self, course_id: str, files: Dict[str, Any]) -> None:
+        manifest_path = self._manifest_path(course_id)
+        data = {"version": MANIFEST_VERSION, "course_id": course_id, "files": files}
+        with tempfile.NamedTemporaryFile(
+            "w", dir=manifest_path.parent, prefix=".manifest_", suffix=".tmp", delete=False, encoding="utf-8"
+        ) as tmp:
+            json.dump(data, tmp, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp.name, manifest_path)
+        self.cache.invalidate(manifest_path)
+
+    def files(self, course_id: str) -> Dict[str, Any]:
+        """All entries of a course, scanning it first if it has no manifest yet.
+
+        The returned dict is shared and must not be mutated.
+        """
+        files = self._load(course_id)
+        if files or self._manifest_path(course_id).exists():
+            return files
+        if not (self.courses_path / course_id).is_dir():
+            return files
+        self.rebuild(course_id, hashes=False)
+        return self._load(course_id)
+
+    def lookup(self, course_id: str, relative_path: str) -> Optional[Dict[str, Any]]:
+        return self.files(course_id).get(relative_path)
+
+    def list_dir(self, course_id: str, directory: str) -> List[str]:
+        """Names of files directly inside directory (relative to the course)"""
+        prefix = directory.rstrip("/") + "/"
+        return sorted(
+            path[len(prefix):] for path in self.files(course_id)
+            if path.startswith(prefix) and "/" not in path[len(prefix):]
+        )
+
+    def record(
+        self, course_id: str, relative_path: str, sha256: Optional[str] = None, source: Optional[Path] = None
+    ) -> None:
+        """Add or refresh the entry of a file that was just written.
+
+        source is the local file the content came from when it is not stored
+        under the course directory (media in a remote backend).
+        """
+        path = source if source is not None else self.courses_path / course_id / relative_path
+        entry = _entry(path, sha256 if sha256 is not None else hash_file(path))
+        with self._locked(course_id):
+            files = dict(self._load_or_scan(course_id))
+            files[relative_path] = entry
+            self._write(course_id, files)
+
+    def remove(self, course_id: str, relative_path: str) -> None:
+        with self._locked(course_id):
+            files = dict(self._load_or_scan(course_id))
+            if files.pop(relative_path, None) is not None:
+                self._write(course_id, files)
+
+    def _load_or_scan(self, course_id: str) -> Dict[str, Any]:
+        if self._manifest_path(course_id).exists():
+            return self._load(course_id)
+        return self._scan(course_id, hashes=False)
+
+    def _scan(self, course_id: str, hashes: bool) -> Dict[str, Any]:
+        course_path = self.courses_path / course_id
+        files = {}
+        for path in course_path.rglob("*"):
+            relative_path = path.relative_to(course_path)
+            if path.is_file() and _is_tracked(relative_path):
+                files[relative_path.as_posix()] = _entry(path, hash_file(path) if hashes else None)
+        if self.media_scan is not None:
+            # Remote objects are not hashed here - that would mean downloading them
+            prefix = f"{self.courses_path.name}/{course_id}/"
+            for key, entry in self.media_scan(prefix).items():
+                files[key[len(prefix):]] = {**entry, "sha256": None}
+        return files
+
+    def rebuild(self, course_id: str, hashes: bool = True) -> int:
+        """Rescan a course directory and rewrite its manifest; returns number of files"""
+        before = self._load(course_id)
+        scanned = self._scan(course_id, hashes)
+        with self._locked(course_id):
+            files = _merge_scan(scanned, before, self._load(course_id))
+            self._write(course_id, files)
+        logger.info(f"Rebuilt content manifest for course {course_id}: {len(files)} files")
+        return len(files)
+
+    def scan_missing(self) -> int:
+        """Build the manifests of courses that have none; returns number built"""
+        built = 0
+        for course_id in self.course_ids():
+            if not self._manifest_path(course_id).exists():
+                try:
+                    self.rebuild(course_id, hashes=False)
+                    built += 1
+                except Exception as e:
+                    logger.error(f"Error scanning course {course_id}: {e}")
+        return built
+
+    def course_ids(self) -> List[str]:
+        if not self.courses_path.exists():
+            return []
+        return sorted(path.name for path in self.courses_path.iterdir() if path.is_dir())
+
+
+def _merge_scan(scanned: Dict[str, Any], before: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Scan result, with the API writes made while it ran (before -> current) applied on top"""
+    files = dict(scanned)
+    for path in before.keys() | current.keys():
+        entry = current.get(path)
+        if entry == before.get(path):
+            continue
+        if entry is None:
+            files.pop(path, None)
+            continue
+        found = scanned.get(path)
+        same_file = found is not None and (found["size"], found["mtime_ns"]) == (entry["size"], entry["mtime_ns"])
+        if same_file and entry["sha256"] is None:
+            # The scan saw the same file and may have hashed it
+            continue
+        files[path] = entry
+    return files
+
+
+def _read_manifest(path: Path) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["files"]
@@ -0,0 +1,125 @@
+"""Streaming CSV exports of progress and test attempts for audits.
+
+Rows are read through a server-side cursor (yield_per) in a session owned
+by the generator and written out one batch at a time, so memory stays
+constant however many rows match. The file starts with a UTF-8 BOM so
+Excel opens Cyrillic names correctly, and text cells that Excel would read
+as a formula are prefixed with an apostrophe. Rows come in a fixed order,
+so two exports of the same data are identical.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Sequence
+
+from sqlalchemy import Select, func, select
+
+from app.database import AsyncSessionLocal
+from app.models import TestAttempt, User, UserProgress
+
+EXPORT_BATCH_SIZE = 1000
+
+# Leading characters that make Excel / LibreOffice evaluate a cell as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _filtered(query: Select, module_column, date_column, module_id: Optional[str],
+              date_from: Optional[datetime], date_to: Optional[datetime], role: Optional[str]) -> Select:
+    if module_id:
+        query = query.filter(module_column == module_id)
+    if date_from:
+        query = query.filter(date_column >= date_from)
+    if date_to:
+        query = query.filter(date_column < date_to)
+    if role:
+        query = query.filter(User.role == role)
+    return query
+
+
+PROGRESS_HEADER = [
+    "user_id", "email", "full_name", "role", "module_id", "lesson_id",
+    "lesson_number", "is_completed", "completed_at", "created_at"
+]
+
+
+def progress_export_query(module_id: Optional[str] = None, date_from: Optional[datetime] = None,
+                          date_to: Optional[datetime] = None, role: Optional[str] = None) -> Select:
+    """Lesson progress rows; the date range applies to completion (or first view) time"""
+    query = select(
+        UserProgress.user_id, User.email, User.full_name, User.role,
+        UserProgress.module_id, UserProgress.lesson_id, UserProgress.lesson_number,
+        UserProgress.is_completed, UserProgress.completed_at, UserProgress.created_at
+    ).join(User, User.id == UserProgress.user_id)
+    date_column = func.coalesce(UserProgress.completed_at, UserProgress.created_at)
+    query = _filtered(query, UserProgress.module_id, date_column, module_id, date_from, date_to, role)
+    return query.order_by(
+        UserProgress.user_id, UserProgress.module_id, UserProgress.lesson_number, UserProgress.id
+    )
+
+
+ATTEMPTS_HEADER = [
+    "attempt_id", "user_id", "email", "full_name", "role", "module_id", "attempt_number",
+    "score", "max_score", "percentage", "passed", "time_spent_seconds",
+    "started_at", "submitted_at", "suspicious_activity"
+]
+
+
+def attempts_export_query(module_id: Optional[str] = None, date_from: Optional[datetime] = None,
+                          date_to: Optional[datetime] = None, role: Optional[str] = None,
+                          include_answers: bool = False) -> Select:
+    """Test attempt rows filtered by submission time; answers are only read when requested"""
+    columns = [
+        TestAttempt.id, TestAttempt.user_id, User.email, User.full_name, User.role,
+        TestAttempt.module_id, TestAttempt.attempt_number, TestAttempt.score, TestAttempt.max_score,
+        TestAttempt.percentage, TestAttempt.passed, TestAttempt.time_spent_seconds,
+        TestAttempt.started_at, TestAttempt.submitted_at, TestAttempt.suspicious_activity
+    ]
+    if include_answers:
+        columns.append(TestAttempt.answers)
+    query = select(*columns).join(User, User.id == TestAttempt.user_id)
+    query = _filtered(query, TestAttempt.module_id, TestAttempt.submitted_at, module_id, date_from, date_to, role)
+    return query.order_by(TestAttempt.user_id, TestAttempt.module_id, TestAttempt.attempt_number, TestAttempt.id)
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+async def stream_csv(query: Select, header: Sequence[str],
+                     batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """Yield the CSV export of query batch by batch from a server-side cursor"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def take() -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    buffer.write("\ufeff")
+    writer.writerow(header)
+    yield take()
+
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            writer.writerows([_csv_value(value) for value in row] for row in rows)
+            yield take()
+
+
+def export_filename(kind: str) -> str:
+    return f"{kind}_{datetime.utcnow():%Y%m%d_%H%M%S}.csv"
+
+
+def attempts_header(include_answers: bool) -> List[str]:
+    return ATTEMPTS_HEADER + ["answers"] if include_answers else ATTEMPTS_HEADER
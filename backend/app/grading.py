@@ -0,0 +1,210 @@
+"""Test grading.
+
+questions.json is compiled once per file version into an AnswerKey
+(frozensets for multi-answer questions, normalized text keys, point values),
+so a submission is graded with set/str comparisons only. The same key is used
+to re-score stored attempts in batches after an admin fixes a test; that runs
+as a background job (RescoreJobs) since a module can have many attempts.
+"""
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.background_jobs import BackgroundJobs, Progress
+from app.database import AsyncSessionLocal
+from app.models import TestAttempt
+from app.rollups import rebuild_rollups
+from app.storage_service import storage_service
+
+logger = logging.getLogger(__name__)
+
+RESCORE_BATCH_SIZE = 1000
+
+# Question kinds
+SINGLE = 0      # multiple_choice with a single correct option
+MULTIPLE = 1    # multiple_choice with a list of correct options
+TEXT = 2        # free text, compared case-insensitively
+UNGRADED = 3    # unknown type, never scores
+
+
+class CompiledQuestion:
+    __slots__ = ("id", "kind", "key", "points")
+
+    def __init__(self, id: str, kind: int, key: Any, points: float):
+        self.id = id
+        self.kind = kind
+        self.key = key
+        self.points = points
+
+
+def _compile_question(q: Dict[str, Any]) -> CompiledQuestion:
+    correct_answer = q.get("correct_answer")
+    points = q.get("points", 1)
+
+    if q["type"] == "multiple_choice":
+        if isinstance(correct_answer, list):
+            try:
+                return CompiledQuestion(q["id"], MULTIPLE, frozenset(correct_answer), points)
+            except TypeError:
+                return CompiledQuestion(q["id"], UNGRADED, None, points)
+        return CompiledQuestion(q["id"], SINGLE, correct_answer, points)
+    if q["type"] == "text":
+        key = str(correct_answer).strip().lower() if correct_answer else None
+        return CompiledQuestion(q["id"], TEXT, key, points)
+    return CompiledQuestion(q["id"], UNGRADED, None, points)
+
+
+class AnswerKey:
+    """Precompiled answer key for one version of a module's questions.json"""
+    __slots__ = ("questions", "max_score")
+
+    def __init__(self, questions: Tuple[CompiledQuestion, ...]):
+        self.questions = questions
+        self.max_score = sum(q.points for q in questions)
+
+    def score(self, answers: Dict[str, Any]) -> float:
+        score = 0.0
+        for q in self.questions:
+            user_answer = answers.get(q.id)
+            kind = q.kind
+            if kind == MULTIPLE:
+                if isinstance(user_answer, list):
+                    try:
+                        if frozenset(user_answer) == q.key:
+                            score += q.points
+                    except TypeError:
+                        pass
+                else:
+                    try:
+                        if user_answer in q.key:
+                            score += q.points * 0.5  # Partial credit
+                    except TypeError:
+                        pass
+            elif kind == SINGLE:
+                if user_answer == q.key:
+                    score += q.points
+            elif kind == TEXT:
+                if user_answer and q.key is not None:
+                    if str(user_answer).strip().lower() == q.key:
+                        score += q.points
+        return score
+
+
+def compile_answer_key(questions_data: Dict[str, Any]) -> AnswerKey:
+    return AnswerKey(tuple(_compile_question(q) for q in questions_data.get("questions", [])))
+
+
+def get_answer_key(course_id: str, module_id: str) -> Optional[AnswerKey]:
+    """Compiled answer key for a module's test, cached until questions.json changes"""
+    return storage_service.get_test_questions(course_id, module_id, transform=compile_answer_key)
+
+
+def grade_batch(
+    answer_key: AnswerKey,
+    answers_batch: List[Dict[str, Any]],
+    passing_threshold: float
+) -> Tuple[List[float], List[float], List[bool]]:
+    """Grade many submissions at once; returns parallel lists (scores, percentages, passed)"""
+    max_score = answer_key.max_score
+    threshold = passing_threshold * 100
+    scores = [answer_key.score(answers or {}) for answers in answers_batch]
+    if max_score > 0:
+        percentages = [score / max_score * 100 for score in scores]
+    else:
+        percentages = [0] * len(scores)
+    passed = [percentage >= threshold for percentage in percentages]
+    return scores, percentages, passed
+
+
+async def rescore_module_attempts(
+    db: AsyncSession,
+    answer_key: AnswerKey,
+    module_id: str,
+    passing_threshold: float,
+    batch_size: int = RESCORE_BATCH_SIZE,
+    on_progress: Optional[Progress] = None
+) -> Dict[str, Any]:
+    """Re-grade every stored attempt of a module against answer_key.
+
+    Attempts are read in keyset-paginated batches (id order) so memory stays
+    bounded, and each batch is written back with one executemany UPDATE.
+    """
+    started = time.perf_counter()
+    total = 0
+    changed = 0
+    last_id = None
+
+    while True:
+        query = select(
+            TestAttempt.id, TestAttempt.answers, TestAttempt.score, TestAttempt.passed
+        ).filter(TestAttempt.module_id == module_id)
+        if last_id is not None:
+            query = query.filter(TestAttempt.id > last_id)
+        rows = (await db.execute(query.order_by(TestAttempt.id).limit(batch_size))).all()
+        if not rows:
+            break
+
+        scores, percentages, passed = grade_batch(
+            answer_key, [row.answers for row in rows], passing_threshold
+        )
+        updates = [
+            {
+                "id": row.id,
+                "score": scores[i],
+                "max_score": answer_key.max_score,
+                "percentage": percentages[i],
+                "passed": passed[i],
+            }
+            for i, row in enumerate(rows)
+        ]
+        changed += sum(1 for i, row in enumerate(rows) if row.score != scores[i] or row.passed != passed[i])
+        await db.execute(update(TestAttempt), updates)
+        await db.commit()
+
+        total += len(rows)
+        last_id = rows[-1].id
+        if on_progress:
+            on_progress({"attempts": total, "changed": changed})
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "module_id": module_id,
+        "attempts": total,
+        "changed": changed,
+        "seconds": round(elapsed, 3),
+        "attempts_per_second": round(total / elapsed, 1) if elapsed > 0 else None,
+    }
+    logger.info(f"Re-scored test attempts: {stats}")
+    return stats
+
+
+class RescoreJobs(BackgroundJobs):
+    """Re-scoring of a module's attempts, followed by a rebuild of its analytics rollups"""
+
+    label = "Test re-score"
+
+    def create(self, course_id: str, module_id: str) -> Dict[str, Any]:
+        """Queue a re-score. Blocking - call from a worker thread."""
+        return self._new_job(course_id=course_id, module_id=module_id)
+
+    async def _work(self, job: Dict[str, Any], progress: Progress) -> Dict[str, Any]:
+        course_id, module_id = job["course_id"], job["module_id"]
+        # Questions and settings as of when the job runs
+        answer_key = get_answer_key(course_id, module_id)
+        if not answer_key:
+            raise ValueError("Test not found")
+        settings_data = storage_service.get_test_settings(course_id, module_id) or {}
+
+        async with AsyncSessionLocal() as db:
+            stats = await rescore_module_attempts(
+                db, answer_key, module_id, settings_data.get("passing_threshold", 0.7), on_progress=progress
+            )
+            # Scores and pass flags changed - recompute the module's analytics rollups
+            await rebuild_rollups(db, module_id)
+        return stats
+
+
+rescore_jobs = RescoreJobs(storage_service.storage_path / "jobs" / "rescore")
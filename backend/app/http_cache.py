@@ -0,0 +1,57 @@
+"""HTTP validators (ETag / Last-Modified) and conditional GET handling.
+
+Handlers compute an ETag from cheap version data (row updated_at, file
+mtime/size) before loading the body; if it matches If-None-Match they return
+304 without touching storage or serializing the response.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Cache-Control policies. Responses are per-user authenticated, hence private.
+# Lessons and tests must always be revalidated so edits show up immediately;
+# catalogue listings may be reused briefly.
+LESSON_CACHE_CONTROL = "private, no-cache"
+TEST_CACHE_CONTROL = "private, no-cache"
+CATALOGUE_CACHE_CONTROL = "private, max-age=30"
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag derived from version parts (ids, timestamps, file versions)"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {candidate.strip() for candidate in header.split(",")}
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def _cache_headers(etag: str, cache_control: str, last_modified: Optional[datetime]) -> dict:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+
+def not_modified_response(etag: str, cache_control: str, last_modified: Optional[datetime] = None) -> Response:
+    return Response(status_code=304, headers=_cache_headers(etag, cache_control, last_modified))
+
+
+def set_cache_headers(
+    response: Response,
+    etag: str,
+    cache_control: str,
+    last_modified: Optional[datetime] = None
+) -> None:
+    response.headers.update(_cache_headers(etag, cache_control, last_modified))
@@ -0,0 +1,111 @@
+"""Server-side lesson rendering.
+
+content.md is rendered to sanitized HTML once per file version, together
+with a table of contents and the media it references. The result is kept in
+a content.md.rendered sidecar next to the raw markdown (so it survives
+restarts and is shared by all workers) and re-rendered when content.md or
+RENDERER_VERSION changes. [VIDEO:filename]
+placeholders become <div class="lesson-video" data-video="..."> elements
+that clients hydrate with a signed video URL.
+"""
+import html
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+
+import markdown
+import nh3
+from markdown.extensions.toc import TocExtension, slugify_unicode
+
+from app.storage_service import storage_service
+
+VIDEO_PLACEHOLDER = re.compile(r"\[VIDEO:([^\]]+)\]")
+
+MARKDOWN_EXTENSIONS = ["tables", "fenced_code", "sane_lists"]
+
+# Bump when the rendering changes, so existing sidecars are re-rendered
+RENDERER_VERSION = "lesson-html-2"
+
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+
+ALLOWED_ATTRIBUTES = {
+    **nh3.ALLOWED_ATTRIBUTES,
+    **{tag: {"id"} for tag in HEADING_TAGS},
+    "div": {"class", "data-video"},
+    "code": {"class"},
+}
+
+
+class RenderedLesson:
+    """HTML rendering of one version of a lesson's content.md"""
+    __slots__ = ("html", "toc", "media")
+
+    def __init__(self, html: str, toc: List[Dict[str, Any]], media: List[Dict[str, str]]):
+        self.html = html
+        self.toc = toc
+        self.media = media
+
+
+class _LessonCollector(HTMLParser):
+    """Collects headings (table of contents) and media from sanitized HTML"""
+
+    def __init__(self):
+        super().__init__()
+        self.toc: List[Dict[str, Any]] = []
+        self.media: List[Dict[str, str]] = []
+        self._heading: Optional[Dict[str, Any]] = None
+        self._heading_text: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in HEADING_TAGS and attrs.get("id"):
+            self._heading = {"level": int(tag[1]), "id": attrs["id"]}
+            self._heading_text = []
+        elif tag == "div" and attrs.get("data-video"):
+            self.media.append({"type": "video", "src": attrs["data-video"]})
+        elif tag == "img" and attrs.get("src"):
+            self.media.append({"type": "image", "src": attrs["src"]})
+
+    def handle_endtag(self, tag):
+        if self._heading is not None and tag == f"h{self._heading['level']}":
+            self._heading["title"] = " ".join("".join(self._heading_text).split())
+            self.toc.append(self._heading)
+            self._heading = None
+
+    def handle_data(self, data):
+        if self._heading is not None:
+            self._heading_text.append(data)
+
+
+def _video_tag(match: "re.Match") -> str:
+    return f'<div class="lesson-video" data-video="{html.escape(match.group(1).strip())}"></div>'
+
+
+def render_lesson_markdown(content: str) -> RenderedLesson:
+    # The toc extension only assigns heading ids; the TOC itself is read from
+    # the sanitized HTML, so it never contains text nh3 removed (e.g. <script>)
+    md = markdown.Markdown(
+        extensions=MARKDOWN_EXTENSIONS + [TocExtension(slugify=slugify_unicode)]
+    )
+    raw_html = md.convert(VIDEO_PLACEHOLDER.sub(_video_tag, content))
+    safe_html = nh3.clean(raw_html, attributes=ALLOWED_ATTRIBUTES)
+
+    collector = _LessonCollector()
+    collector.feed(safe_html)
+    collector.close()
+    return RenderedLesson(safe_html, collector.toc, collector.media)
+
+
+def _render_sidecar(content: str) -> Dict[str, Any]:
+    rendered = render_lesson_markdown(content)
+    return {"html": rendered.html, "toc": rendered.toc, "media": rendered.media}
+
+
+def get_rendered_lesson(course_id: str, module_id: str, lesson_id: str) -> Optional[RenderedLesson]:
+    """Rendered lesson for the current content.md version. Blocking - call from a worker thread."""
+    rendered = storage_service.get_lesson_rendering(
+        course_id, module_id, lesson_id, render=_render_sidecar, renderer=RENDERER_VERSION
+    )
+    if rendered is None:
+        return None
+    return RenderedLesson(rendered["html"], rendered["toc"], rendered["media"])
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, Float, JSON
+from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Text, Float, JSON, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -40,6 +40,9 @@ class Course(Base):
 
 class Module(Base):
     __tablename__ = "modules"
+    __table_args__ = (
+        Index("ix_modules_course_id", "course_id"),
+    )
 
     id = Column(String, primary_key=True)  # e.g., "Company_Module_01"
     course_id = Column(UUID(as_uuid=True), ForeignKey("courses.id"), nullable=False)
@@ -57,6 +60,9 @@ class Module(Base):
 
 class Lesson(Base):
     __tablename__ = "lessons"
+    __table_args__ = (
+        Index("ix_lessons_module_id_lesson_number", "module_id", "lesson_number"),
+    )
 
     id = Column(String, primary_key=True)  # e.g., "Company_Module_01_Lesson_01"
     module_id = Column(String, ForeignKey("modules.id"), nullable=False)
@@ -72,6 +78,11 @@ class Lesson(Base):
 
 class UserProgress(Base):
     __tablename__ = "user_progress"
+    __table_args__ = (
+        # One progress row per user and lesson; also the target of the ON CONFLICT upserts
+        UniqueConstraint("user_id", "lesson_id", name="uq_user_progress_user_id_lesson_id"),
+        Index("ix_user_progress_user_id_module_id", "user_id", "module_id"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
@@ -88,6 +99,17 @@ class UserProgress(Base):
 
 class TestAttempt(Base):
     __tablename__ = "test_attempts"
+    __table_args__ = (
+        Index("ix_test_attempts_user_id_module_id", "user_id", "module_id"),
+        UniqueConstraint(
+            "user_id", "module_id", "attempt_number",
+            name="uq_test_attempts_user_id_module_id_attempt_number"
+        ),
+        UniqueConstraint(
+            "user_id", "module_id", "idempotency_key",
+            name="uq_test_attempts_user_id_module_id_idempotency_key"
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
@@ -102,6 +124,59 @@ class TestAttempt(Base):
     started_at = Column(DateTime, default=datetime.utcnow)
     submitted_at = Column(DateTime, nullable=True)
     suspicious_activity = Column(JSON, nullable=True)  # Track tab switches, etc.
+    idempotency_key = Column(String, nullable=True)  # Idempotency-Key header of the submission
 
     user = relationship("User", back_populates="test_attempts")
 
+
+class TestSession(Base):
+    """A started test sitting; one per user, module and attempt number"""
+    __tablename__ = "test_sessions"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    module_id = Column(String, ForeignKey("modules.id"), primary_key=True)
+    attempt_number = Column(Integer, primary_key=True)
+    seed = Column(Integer, nullable=False)
+    started_at = Column(DateTime, nullable=False)
+    deadline = Column(DateTime, nullable=True)
+
+
+# Analytics rollups, maintained incrementally by app/rollups.py
+
+class ModuleUserStats(Base):
+    """Per user and module: lessons completed and test attempt totals"""
+    __tablename__ = "module_user_stats"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    module_id = Column(String, ForeignKey("modules.id"), primary_key=True)
+    lessons_completed = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    passed = Column(Boolean, nullable=False, default=False)
+    passed_attempts = Column(Integer, nullable=False, default=0)
+    best_percentage = Column(Float, nullable=True)
+    percentage_sum = Column(Float, nullable=False, default=0)
+    time_spent_seconds = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ModuleStats(Base):
+    """Per module test totals across all users, summed from module_user_stats"""
+    __tablename__ = "module_stats"
+
+    module_id = Column(String, ForeignKey("modules.id"), primary_key=True)
+    passed_learners = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    passed_attempts = Column(Integer, nullable=False, default=0)
+    percentage_sum = Column(Float, nullable=False, default=0)
+    time_spent_seconds = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ModuleStatBucket(Base):
+    """Number of users of a module per lessons-completed / attempts value"""
+    __tablename__ = "module_stat_buckets"
+
+    module_id = Column(String, ForeignKey("modules.id"), primary_key=True)
+    metric = Column(String, primary_key=True)  # lessons, attempts
+    value = Column(Integer, primary_key=True)
+    users = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,103 @@
+"""Keyset pagination and field selection for list endpoints.
+
+Lists are ordered by a unique key (order_index, id) or (lesson_number, id).
+Without limit or cursor a list is returned whole, as before pagination
+existed. A page is requested with ?limit=N&cursor=<opaque> (cursor alone
+uses DEFAULT_PAGE_SIZE); the cursor encodes the
+key of the last item returned, so the next page starts right after it
+(WHERE key > cursor for SQL, a binary search for the in-memory catalogue)
+and costs the same however deep the client pages. The cursor of the next
+page is returned in the X-Next-Cursor header (list responses) or the
+next_cursor field (object responses), and is absent on the last page.
+
+?fields=a,b limits the attributes returned; the key fields are always
+included so clients can keep paging.
+"""
+import base64
+import bisect
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+@dataclass(frozen=True)
+class PageParams:
+    limit: Optional[int]
+    cursor: Optional[str]
+    fields: Optional[str]
+
+    @property
+    def size(self) -> Optional[int]:
+        """Page size, or None if the client asked for the whole list"""
+        if self.limit is not None:
+            return self.limit
+        return DEFAULT_PAGE_SIZE if self.cursor else None
+
+
+def page_params(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated attributes to return")
+) -> PageParams:
+    return PageParams(limit=limit, cursor=cursor, fields=fields)
+
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    data = json.dumps(list(key))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> Tuple:
+    """Cursor back to a key tuple with the given part types, or 400"""
+    try:
+        parts = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        # Any JSON value decodes - only a list of the right length and types is a key
+        if not isinstance(parts, list) or len(parts) != len(types) or not all(isinstance(part, kind) for part, kind in zip(parts, types)):
+            raise ValueError(cursor)
+        return tuple(parts)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel], key_fields: Sequence[str]) -> Optional[List[str]]:
+    """Requested attribute names (key fields first), None for all, or 400 for unknown names"""
+    if not fields:
+        return None
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return list(key_fields) + [name for name in requested if name not in key_fields]
+
+
+def page_sequence(items: Sequence, sort_key: Callable[[Any], Tuple], params: PageParams,
+                  key_types: Sequence[type]) -> Tuple[Sequence, Optional[str]]:
+    """One page of an in-memory sequence already ordered by sort_key, and the next cursor"""
+    if params.size is None:
+        return items, None
+    start = 0
+    if params.cursor:
+        start = bisect.bisect_right(items, decode_cursor(params.cursor, key_types), key=sort_key)
+    page = items[start:start + params.size]
+    has_more = start + params.size < len(items)
+    return page, encode_cursor(sort_key(page[-1])) if has_more and page else None
+
+
+def project(items: Sequence, fields: Optional[List[str]]) -> List[Any]:
+    """Items unchanged, or reduced to JSON dicts of the selected attributes"""
+    if fields is None:
+        return list(items)
+    return [jsonable_encoder({name: getattr(item, name) for name in fields}) for item in items]
+
+
+def rows_to_dicts(rows: Sequence) -> List[Dict[str, Any]]:
+    return [jsonable_encoder(row._asdict()) for row in rows]
@@ -0,0 +1,95 @@
+"""Bounded worker pool for bcrypt hashing and verification.
+
+bcrypt costs ~250 ms of CPU per call; run on the event loop it stalls every
+other request of the worker. Calls are executed in a small thread pool
+(bcrypt releases the GIL while hashing, so threads run in parallel) with a
+bounded queue: once PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_SIZE calls
+are in flight, new ones are rejected immediately so callers can answer 503
+instead of piling up. Bulk work (user imports) uses run_background(), which
+waits for an idle worker instead, so it never takes queue slots from logins.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from app.database import DB_POOL_SIZE
+
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Sign-ins in flight stay within DB_POOL_SIZE, leaving the overflow to other endpoints
+# even if a caller forgets to release its connection before hashing
+PASSWORD_HASH_QUEUE_SIZE = int(os.getenv(
+    "PASSWORD_HASH_QUEUE_SIZE", str(max(0, min(32, DB_POOL_SIZE - PASSWORD_HASH_WORKERS)))
+))
+
+
+class PasswordPoolSaturated(Exception):
+    """All workers are busy and the queue is full"""
+
+
+class PasswordPool:
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, queue_size: int = PASSWORD_HASH_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password")
+        # Counters are only touched from the event loop thread
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+        self._released = asyncio.Condition()
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        if self.in_flight >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise PasswordPoolSaturated()
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        submitted_at = time.perf_counter()
+
+        def job():
+            started_at = time.perf_counter()
+            result = func(*args)
+            return result, started_at - submitted_at, time.perf_counter() - started_at
+
+        try:
+            result, wait_seconds, run_seconds = await asyncio.get_running_loop().run_in_executor(
+                self._executor, job
+            )
+        finally:
+            self.in_flight -= 1
+            async with self._released:
+                self._released.notify_all()
+        self.completed += 1
+        self._wait_seconds += wait_seconds
+        self._run_seconds += run_seconds
+        return result
+
+    async def run_background(self, func: Callable[..., Any], *args) -> Any:
+        """Like run(), but waits until a worker is idle instead of queueing or being rejected"""
+        async with self._released:
+            await self._released.wait_for(lambda: self.in_flight < self.workers)
+        return await self.run(func, *args)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "queued": max(self.in_flight - self.workers, 0),
+            "peak_in_flight": self.peak_in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self._wait_seconds / self.completed * 1000, 1) if self.completed else 0.0,
+            "avg_run_ms": round(self._run_seconds / self.completed * 1000, 1) if self.completed else 0.0,
+        }
+
+
+password_pool = PasswordPool()
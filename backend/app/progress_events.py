@@ -0,0 +1,111 @@
+"""Buffered "lesson viewed" events.
+
+GET lesson only records the view in memory; a background task flushes the
+buffer in bulk INSERT ... ON CONFLICT DO NOTHING statements every few seconds
+(or sooner when the batch fills up), so the read path never opens a write
+transaction. Progress rows become visible within LESSON_VIEW_FLUSH_SECONDS.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import AsyncSessionLocal
+from app.models import UserProgress
+
+logger = logging.getLogger(__name__)
+
+LESSON_VIEW_FLUSH_SECONDS = float(os.getenv("LESSON_VIEW_FLUSH_SECONDS", "2"))
+LESSON_VIEW_BATCH_SIZE = int(os.getenv("LESSON_VIEW_BATCH_SIZE", "500"))
+# Views already persisted are remembered so repeat visits don't reach the DB at all
+LESSON_VIEW_SEEN_SIZE = int(os.getenv("LESSON_VIEW_SEEN_SIZE", "100000"))
+
+
+class LessonViewBuffer:
+    def __init__(
+        self,
+        flush_interval: float = LESSON_VIEW_FLUSH_SECONDS,
+        batch_size: int = LESSON_VIEW_BATCH_SIZE,
+        seen_size: int = LESSON_VIEW_SEEN_SIZE
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.seen_size = seen_size
+        self._pending: Dict[Tuple[uuid.UUID, str], Dict] = {}
+        self._seen: "OrderedDict[Tuple[uuid.UUID, str], None]" = OrderedDict()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._size_flush: Optional[asyncio.Task] = None
+
+    def record(self, user_id: uuid.UUID, module_id: str, lesson_id: str, lesson_number: int) -> None:
+        key = (user_id, lesson_id)
+        if key in self._seen or key in self._pending:
+            return
+        now = datetime.utcnow()
+        self._pending[key] = {
+            "id": uuid.uuid4(),
+            "user_id": user_id,
+            "module_id": module_id,
+            "lesson_id": lesson_id,
+            "lesson_number": lesson_number,
+            "is_completed": False,
+            "created_at": now,
+            "updated_at": now,
+        }
+        if len(self._pending) >= self.batch_size and (self._size_flush is None or self._size_flush.done()):
+            self._size_flush = asyncio.create_task(self.flush())
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            rows = list(batch.values())
+            try:
+                async with AsyncSessionLocal() as db:
+                    for start in range(0, len(rows), self.batch_size):
+                        await db.execute(insert(UserProgress).values(
+                            rows[start:start + self.batch_size]
+                        ).on_conflict_do_nothing(
+                            index_elements=[UserProgress.user_id, UserProgress.lesson_id]
+                        ))
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Error flushing lesson views ({len(rows)} pending): {e}")
+                # Keep the events for the next attempt unless newer ones replaced them
+                for key, row in batch.items():
+                    self._pending.setdefault(key, row)
+                return
+
+            for key in batch:
+                self._seen[key] = None
+                self._seen.move_to_end(key)
+            while len(self._seen) > self.seen_size:
+                self._seen.popitem(last=False)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+lesson_view_buffer = LessonViewBuffer()
@@ -0,0 +1,237 @@
+"""Incrementally maintained analytics rollups.
+
+complete_lesson and submit_test update only the user's own row in their
+transaction and mark the module dirty; RollupAggregator recomputes the
+shared per-module rows of dirty modules from module_user_stats in the
+background, so a cohort submitting at once never queues on them. HR reports
+read a handful of rows per module:
+
+- module_user_stats: per user and module lesson / attempt totals
+- module_stats: per module totals, summed from module_user_stats
+- module_stat_buckets: how many users have completed N lessons / made N attempts
+
+Request transactions hold a shared per-module advisory lock; aggregation and
+rebuild_rollups() take it exclusively, so they see every committed update and
+never race live ones. Aggregation is idempotent: module totals lag by up to
+ROLLUP_AGGREGATE_SECONDS, and a module left dirty by a process that died is
+recomputed on its next update.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import Integer, Float, delete, false, func, literal, select, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models import ModuleStatBucket, ModuleStats, ModuleUserStats, TestAttempt, UserProgress
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_AGGREGATE_SECONDS = float(os.getenv("ROLLUP_AGGREGATE_SECONDS", "5"))
+
+LESSONS = "lessons"
+ATTEMPTS = "attempts"
+
+
+async def _lock_module(db: AsyncSession, module_id: str, exclusive: bool = False) -> None:
+    lock = func.pg_advisory_xact_lock if exclusive else func.pg_advisory_xact_lock_shared
+    await db.execute(select(lock(func.hashtext(f"rollup:{module_id}"))))
+
+
+async def _upsert_user_stats(db: AsyncSession, user_id, module_id: str, **values) -> None:
+    """Add values to the (user, module) row, creating it if missing"""
+    stmt = insert(ModuleUserStats).values(user_id=user_id, module_id=module_id, **values)
+    increments = {
+        name: getattr(ModuleUserStats, name) + getattr(stmt.excluded, name)
+        for name in values if name not in ("passed", "best_percentage")
+    }
+    if "passed" in values:
+        increments["passed"] = ModuleUserStats.passed | stmt.excluded.passed
+    if "best_percentage" in values:
+        increments["best_percentage"] = func.greatest(ModuleUserStats.best_percentage, stmt.excluded.best_percentage)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[ModuleUserStats.user_id, ModuleUserStats.module_id],
+        set_={**increments, "updated_at": datetime.utcnow()}
+    ))
+
+
+async def record_lesson_completed(db: AsyncSession, user_id, module_id: str) -> None:
+    """Count a lesson that just became completed. Call inside the completing transaction."""
+    await _lock_module(db, module_id)
+    await _upsert_user_stats(db, user_id, module_id, lessons_completed=1)
+    rollup_aggregator.mark(module_id)
+
+
+async def record_test_attempt(
+    db: AsyncSession,
+    user_id,
+    module_id: str,
+    percentage: float,
+    passed: bool,
+    time_spent_seconds: Optional[int]
+) -> None:
+    """Count a new test attempt. Call inside the submitting transaction."""
+    await _lock_module(db, module_id)
+    await _upsert_user_stats(
+        db, user_id, module_id,
+        attempts=1,
+        passed=passed,
+        passed_attempts=int(passed),
+        best_percentage=percentage,
+        percentage_sum=percentage,
+        time_spent_seconds=time_spent_seconds or 0
+    )
+    rollup_aggregator.mark(module_id)
+
+
+def _only_module(query, column, module_id: Optional[str]):
+    return query.filter(column == module_id) if module_id is not None else query
+
+
+def module_aggregate_statements(module_id: Optional[str] = None) -> List:
+    """Statements recomputing module_stats and buckets (of one module, or all) from module_user_stats"""
+    module_stats = _only_module(select(
+        ModuleUserStats.module_id,
+        func.count().filter(ModuleUserStats.passed == True),
+        func.sum(ModuleUserStats.attempts),
+        func.sum(ModuleUserStats.passed_attempts),
+        func.sum(ModuleUserStats.percentage_sum),
+        func.sum(ModuleUserStats.time_spent_seconds)
+    ), ModuleUserStats.module_id, module_id).group_by(ModuleUserStats.module_id)
+
+    buckets = union_all(*(
+        _only_module(select(
+            ModuleUserStats.module_id,
+            literal(metric),
+            column,
+            func.count()
+        ), ModuleUserStats.module_id, module_id).group_by(ModuleUserStats.module_id, column)
+        for metric, column in ((LESSONS, ModuleUserStats.lessons_completed), (ATTEMPTS, ModuleUserStats.attempts))
+    ))
+
+    return [
+        _only_module(delete(ModuleStatBucket), ModuleStatBucket.module_id, module_id),
+        _only_module(delete(ModuleStats), ModuleStats.module_id, module_id),
+        insert(ModuleStats).from_select([
+            "module_id", "passed_learners", "attempts", "passed_attempts", "percentage_sum", "time_spent_seconds"
+        ], module_stats),
+        insert(ModuleStatBucket).from_select(["module_id", "metric", "value", "users"], buckets),
+    ]
+
+
+async def aggregate_modules(db: AsyncSession, module_ids: Iterable[str]) -> None:
+    """Recompute the per-module rows of the given modules, one transaction each. Commits."""
+    for module_id in sorted(module_ids):
+        await _lock_module(db, module_id, exclusive=True)
+        for stmt in module_aggregate_statements(module_id):
+            await db.execute(stmt)
+        await db.commit()
+
+
+class RollupAggregator:
+    """Recomputes the module rows of modules marked dirty, every interval seconds"""
+
+    def __init__(self, interval: float = ROLLUP_AGGREGATE_SECONDS):
+        self.interval = interval
+        self._dirty: Set[str] = set()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def mark(self, module_id: str) -> None:
+        self._dirty.add(module_id)
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            module_ids, self._dirty = self._dirty, set()
+            try:
+                async with AsyncSessionLocal() as db:
+                    await aggregate_modules(db, module_ids)
+            except Exception as e:
+                logger.error(f"Error aggregating rollups of {len(module_ids)} module(s): {e}")
+                # Retry on the next run; recomputing a module twice is harmless
+                self._dirty |= module_ids
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+rollup_aggregator = RollupAggregator()
+
+
+def rollup_rebuild_statements(module_id: Optional[str] = None) -> List:
+    """Statements recomputing the rollups (of one module, or all) from the source tables"""
+    lessons = _only_module(select(
+        UserProgress.user_id,
+        UserProgress.module_id,
+        func.count().label("lessons_completed"),
+        literal(0).label("attempts"),
+        false().label("passed"),
+        literal(0).label("passed_attempts"),
+        literal(None, Float).label("best_percentage"),
+        literal(0, Float).label("percentage_sum"),
+        literal(0, Integer).label("time_spent_seconds")
+    ).filter(
+        UserProgress.is_completed == True,
+        UserProgress.lesson_id.isnot(None)
+    ), UserProgress.module_id, module_id).group_by(UserProgress.user_id, UserProgress.module_id)
+    attempts = _only_module(select(
+        TestAttempt.user_id,
+        TestAttempt.module_id,
+        literal(0).label("lessons_completed"),
+        func.count().label("attempts"),
+        func.bool_or(TestAttempt.passed).label("passed"),
+        func.count().filter(TestAttempt.passed == True).label("passed_attempts"),
+        func.max(TestAttempt.percentage).label("best_percentage"),
+        func.sum(TestAttempt.percentage).label("percentage_sum"),
+        func.coalesce(func.sum(TestAttempt.time_spent_seconds), 0).label("time_spent_seconds")
+    ), TestAttempt.module_id, module_id).group_by(TestAttempt.user_id, TestAttempt.module_id)
+    combined = union_all(lessons, attempts).subquery()
+    user_stats = select(
+        combined.c.user_id,
+        combined.c.module_id,
+        func.sum(combined.c.lessons_completed),
+        func.sum(combined.c.attempts),
+        func.bool_or(combined.c.passed),
+        func.sum(combined.c.passed_attempts),
+        func.max(combined.c.best_percentage),
+        func.sum(combined.c.percentage_sum),
+        func.sum(combined.c.time_spent_seconds)
+    ).group_by(combined.c.user_id, combined.c.module_id)
+
+    return [
+        _only_module(delete(ModuleUserStats), ModuleUserStats.module_id, module_id),
+        insert(ModuleUserStats).from_select([
+            "user_id", "module_id", "lessons_completed", "attempts", "passed",
+            "passed_attempts", "best_percentage", "percentage_sum", "time_spent_seconds"
+        ], user_stats),
+    ] + module_aggregate_statements(module_id)
+
+
+async def rebuild_rollups(db: AsyncSession, module_id: str) -> None:
+    """Recompute a module's rollups, e.g. after its attempts were re-scored. Commits."""
+    await _lock_module(db, module_id, exclusive=True)
+    for stmt in rollup_rebuild_statements(module_id):
+        await db.execute(stmt)
+    await db.commit()
@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request, Header, Query
 from fastapi.responses import FileResponse, StreamingResponse
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import Lesson, Module, User
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.models import Lesson
 from app.schemas import LessonResponse, LessonContentResponse
-from app.auth import get_current_admin_user
-from app.storage_service import storage_service
+from app.auth import CurrentUser, get_current_admin_user
+from app.password_pool import password_pool
+from app.catalogue import get_module_or_404, get_module_course_id, get_lesson_with_course_id
+from app.catalogue_snapshot import catalogue, LESSON_KEY_FIELDS, ORDER_KEY_TYPES
+from app.pagination import PageParams, decode_cursor, encode_cursor, page_params, parse_fields, rows_to_dicts
+from app.storage_service import storage_service, resumable_upload_service, UploadError, UploadInProgress, MAX_VIDEO_SIZE
+from app.body_limits import MULTIPART_OVERHEAD, DiskMultiPartParser, limited_request
+from app.grading import get_answer_key, rescore_jobs
+from app.user_import import detect_format, import_jobs
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 from datetime import datetime
@@ -14,14 +24,6 @@ import os
 router = APIRouter()
 
 
-def get_course_id_for_module(db: Session, module_id: str) -> str:
-    """Get course_id for a module"""
-    module = db.query(Module).filter(Module.id == module_id).first()
-    if not module:
-        return None
-    return str(module.course_id)
-
-
 class LessonUpdateRequest(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
@@ -47,16 +49,67 @@ class ModuleUpdateRequest(BaseModel):
     description: Optional[str] = None
 
 
+class VideoUploadCreateRequest(BaseModel):
+    filename: str
+    size: int
+    sha256: Optional[str] = None  # hex digest of the whole file, verified on complete
+
+
+@router.get("/admin/storage/cache")
+async def get_storage_cache_stats(
+    current_user: CurrentUser = Depends(get_current_admin_user)
+):
+    """Get content cache hit/miss counters (admin only)"""
+    return storage_service.cache.stats()
+
+
+@router.get("/admin/auth/password-pool")
+async def get_password_pool_stats(
+    current_user: CurrentUser = Depends(get_current_admin_user)
+):
+    """Get password hashing pool queue depth and latency counters (admin only)"""
+    return password_pool.stats()
+
+
+@router.post("/admin/users/import", status_code=202)
+async def import_users_file(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|jsonl)$"),
+    current_user: CurrentUser = Depends(get_current_admin_user)
+):
+    """Start a bulk import of users from a CSV (email,password,full_name,role) or JSONL file (admin only).
+
+    The import runs in the background; poll GET /admin/users/import/{job_id} for progress and the result.
+    """
+    fmt = format or detect_format(file.filename)
+    if not fmt:
+        raise HTTPException(status_code=400, detail="Unknown file format, pass format=csv or format=jsonl")
+
+    job = await run_in_threadpool(import_jobs.create, file.file, fmt)
+    import_jobs.start(job)
+    return job
+
+
+@router.get("/admin/users/import/{job_id}")
+async def get_import_job(
+    job_id: str,
+    current_user: CurrentUser = Depends(get_current_admin_user)
+):
+    """Get status, progress and result of a bulk user import (admin only)"""
+    job = await run_in_threadpool(import_jobs.status, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+
 @router.get("/admin/modules/{module_id}")
 async def get_module_for_edit(
     module_id: str,
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get module for editing (admin only)"""
-    module = db.query(Module).filter(Module.id == module_id).first()
-    if not module:
-        raise HTTPException(status_code=404, detail="Module not found")
+    module = await get_module_or_404(db, module_id)
     return module
 
 
@@ -64,13 +117,11 @@ async def get_module_for_edit(
 async def update_module(
     module_id: str,
     update_data: ModuleUpdateRequest,
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update module title and/or description (admin only)"""
-    module = db.query(Module).filter(Module.id == module_id).first()
-    if not module:
-        raise HTTPException(status_code=404, detail="Module not found")
+    module = await get_module_or_404(db, module_id)
 
     if update_data.title is not None:
         module.title = update_data.title
@@ -80,8 +131,10 @@ async def update_module(
         module.description = update_data.description
         module.updated_at = datetime.utcnow()
 
-    db.commit()
-    db.refresh(module)
+    await catalogue.notify_changed(db)
+    await db.commit()
+    await db.refresh(module)
+    await catalogue.refresh()
 
     return {
         "message": "Module updated successfully",
@@ -92,22 +145,37 @@ async def update_module(
 @router.get("/admin/modules/{module_id}/lessons")
 async def get_module_lessons(
     module_id: str,
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    page: PageParams = Depends(page_params),
+    current_user: CurrentUser = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get list of lessons for a module (admin only)"""
-    module = db.query(Module).filter(Module.id == module_id).first()
-    if not module:
-        raise HTTPException(status_code=404, detail="Module not found")
-
-    lessons = db.query(Lesson).filter(
-        Lesson.module_id == module_id
-    ).order_by(Lesson.lesson_number).all()
+    """Get lessons of a module (admin only), paginated by (lesson_number, id)"""
+    fields = parse_fields(page.fields, LessonResponse, LESSON_KEY_FIELDS)
+    module = await get_module_or_404(db, module_id)
+
+    # Only the requested columns are selected when fields= is given
+    columns = [getattr(Lesson, name) for name in fields] if fields else [Lesson]
+    query = select(*columns).filter(Lesson.module_id == module_id)
+    if page.cursor:
+        query = query.filter(
+            tuple_(Lesson.lesson_number, Lesson.id) > decode_cursor(page.cursor, ORDER_KEY_TYPES)
+        )
+    query = query.order_by(Lesson.lesson_number, Lesson.id)
+    if page.size is not None:
+        query = query.limit(page.size + 1)
+    rows = (await db.execute(query)).all()
+
+    next_cursor = None
+    if page.size is not None and len(rows) > page.size:
+        rows = rows[:page.size]
+        last = rows[-1] if fields else rows[-1][0]
+        next_cursor = encode_cursor((last.lesson_number, last.id))
 
     return {
         "module_id": module_id,
         "module_title": module.title,
-        "lessons": lessons
+        "lessons": rows_to_dicts(rows) if fields else [row[0] for row in rows],
+        "next_cursor": next_cursor
     }
 
 
@@ -115,21 +183,11 @@ async def get_module_lessons(
 async def get_lesson_for_edit(
     module_id: str,
     lesson_number: int,
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get lesson for editing (admin only)"""
-    lesson = db.query(Lesson).filter(
-        Lesson.module_id == module_id,
-        Lesson.lesson_number == lesson_number
-    ).first()
-
-    if not lesson:
-        raise HTTPException(status_code=404, detail="Lesson not found")
-
-    course_id = get_course_id_for_module(db, module_id)
-    if not course_id:
-        raise HTTPException(status_code=404, detail="Course not found")
+    lesson, course_id = await get_lesson_with_course_id(db, module_id, lesson_number)
 
     content = storage_service.get_lesson_content(course_id, module_id, lesson.id)
     if content is None:
@@ -146,21 +204,11 @@ async def update_lesson(
     module_id: str,
     lesson_number: int,
     update_data: LessonUpdateRequest,
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update lesson title and/or content (admin only)"""
-    lesson = db.query(Lesson).filter(
-        Lesson.module_id == module_id,
-        Lesson.lesson_number == lesson_number
-    ).first()
-
-    if not lesson:
-        raise HTTPException(status_code=404, detail="Lesson not found")
-
-    course_id = get_course_id_for_module(db, module_id)
-    if not course_id:
-        raise HTTPException(status_code=404, detail="Course not found")
+    lesson, course_id = await get_lesson_with_course_id(db, module_id, lesson_number)
 
     # Update title in DB if provided
     if update_data.title is not None:
@@ -169,12 +217,19 @@ async def update_lesson(
 
     # Update content in storage if provided
     if update_data.content is not None:
-        success = storage_service.save_lesson_content(course_id, module_id, lesson.id, update_data.content)
+        # Writes the file plus its gzip/brotli sidecars - CPU and disk bound, keep it off the event loop
+        success = await run_in_threadpool(
+            storage_service.save_lesson_content, course_id, module_id, lesson.id, update_data.content
+        )
         if not success:
             raise HTTPException(status_code=500, detail="Failed to save lesson content")
 
-    db.commit()
-    db.refresh(lesson)
+    if update_data.title is not None:
+        await catalogue.notify_changed(db)
+    await db.commit()
+    await db.refresh(lesson)
+    if update_data.title is not None:
+        await catalogue.refresh()
 
     return {
         "message": "Lesson updated successfully",
@@ -185,17 +240,11 @@ async def update_lesson(
 @router.get("/admin/modules/{module_id}/test")
 async def get_test_for_edit(
     module_id: str,
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get test for editing (admin only)"""
-    module = db.query(Module).filter(Module.id == module_id).first()
-    if not module:
-        raise HTTPException(status_code=404, detail="Module not found")
-
-    course_id = get_course_id_for_module(db, module_id)
-    if not course_id:
-        raise HTTPException(status_code=404, detail="Course not found")
+    course_id = await get_module_course_id(db, module_id)
 
     questions_data = storage_service.get_test_questions(course_id, module_id)
     settings_data = storage_service.get_test_settings(course_id, module_id)
@@ -224,17 +273,11 @@ async def get_test_for_edit(
 async def update_test(
     module_id: str,
     update_data: TestUpdateRequest,
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update test questions and settings (admin only)"""
-    module = db.query(Module).filter(Module.id == module_id).first()
-    if not module:
-        raise HTTPException(status_code=404, detail="Module not found")
-
-    course_id = get_course_id_for_module(db, module_id)
-    if not course_id:
-        raise HTTPException(status_code=404, detail="Course not found")
+    course_id = await get_module_course_id(db, module_id)
 
     # Prepare questions data
     questions_list = []
@@ -252,8 +295,8 @@ async def update_test(
         "questions": questions_list
     }
 
-    # Save questions
-    success = storage_service.save_test_questions(course_id, module_id, questions_data)
+    # Save questions (file write and manifest update - off the event loop)
+    success = await run_in_threadpool(storage_service.save_test_questions, course_id, module_id, questions_data)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to save test questions")
 
@@ -263,7 +306,7 @@ async def update_test(
             "module_id": module_id,
             **update_data.settings
         }
-        success = storage_service.save_test_settings(course_id, module_id, settings_data)
+        success = await run_in_threadpool(storage_service.save_test_settings, course_id, module_id, settings_data)
         if not success:
             raise HTTPException(status_code=500, detail="Failed to save test settings")
 
@@ -273,30 +316,145 @@ async def update_test(
     }
 
 
+@router.post("/admin/modules/{module_id}/test/rescore", status_code=202)
+async def rescore_test(
+    module_id: str,
+    current_user: CurrentUser = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Start re-grading all stored attempts with the current questions and settings (admin only).
+
+    Runs in the background; poll GET /admin/modules/{module_id}/test/rescore/{job_id} for the result.
+    """
+    course_id = await get_module_course_id(db, module_id)
+
+    if not await run_in_threadpool(get_answer_key, course_id, module_id):
+        raise HTTPException(status_code=404, detail="Test not found")
+
+    job = await run_in_threadpool(rescore_jobs.create, course_id, module_id)
+    rescore_jobs.start(job)
+    return job
+
+
+@router.get("/admin/modules/{module_id}/test/rescore/{job_id}")
+async def get_rescore_job(
+    module_id: str,
+    job_id: str,
+    current_user: CurrentUser = Depends(get_current_admin_user)
+):
+    """Get status, progress and result of a test re-score (admin only)"""
+    job = await run_in_threadpool(rescore_jobs.status, job_id)
+    if job is None or job["module_id"] != module_id:
+        raise HTTPException(status_code=404, detail="Re-score job not found")
+    return job
+
+
 @router.post("/admin/modules/{module_id}/lessons/{lesson_number}/video")
 async def upload_video(
     module_id: str,
     lesson_number: int,
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    current_user: CurrentUser = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Upload video file for lesson (admin only)"""
-    lesson = db.query(Lesson).filter(
-        Lesson.module_id == module_id,
-        Lesson.lesson_number == lesson_number
-    ).first()
+    """Upload video file for lesson (admin only), as multipart form field "file"."""
+    lesson, course_id = await get_lesson_with_course_id(db, module_id, lesson_number)
+
+    # Parse the form ourselves: oversized bodies are refused while being received, and
+    # the file is written once, into the video directory, then linked into place
+    upload_dir = await run_in_threadpool(storage_service.video_upload_dir, course_id, module_id, lesson.id)
+    limited = limited_request(request, MAX_VIDEO_SIZE + MULTIPART_OVERHEAD)
+    parser = DiskMultiPartParser(limited.headers, limited.stream(), upload_dir=upload_dir, max_files=1)
+    try:
+        form = await parser.parse()
+        file = form.get("file")
+        if not isinstance(file, StarletteUploadFile):
+            raise HTTPException(status_code=400, detail="Multipart field 'file' is required")
+        filename = await run_in_threadpool(
+            storage_service.publish_uploaded_video,
+            course_id, module_id, lesson.id,
+            file.filename, file.file.path, file.size, file.file.sha256.hexdigest()
+        )
+    finally:
+        await run_in_threadpool(parser.cleanup)
+    if not filename:
+        raise HTTPException(status_code=400, detail="Failed to save video file")
 
-    if not lesson:
-        raise HTTPException(status_code=404, detail="Lesson not found")
+    return {
+        "message": "Video uploaded successfully",
+        "filename": filename
+    }
 
-    course_id = get_course_id_for_module(db, module_id)
-    if not course_id:
-        raise HTTPException(status_code=404, detail="Course not found")
 
-    filename = storage_service.save_video_file(course_id, module_id, lesson.id, file)
-    if not filename:
-        raise HTTPException(status_code=400, detail="Failed to save video file")
+@router.post("/admin/modules/{module_id}/lessons/{lesson_number}/video/uploads")
+async def create_video_upload(
+    module_id: str,
+    lesson_number: int,
+    upload_data: VideoUploadCreateRequest,
+    current_user: CurrentUser = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Start a resumable video upload for lesson (admin only)"""
+    lesson, course_id = await get_lesson_with_course_id(db, module_id, lesson_number)
+
+    try:
+        return await run_in_threadpool(
+            resumable_upload_service.create,
+            course_id, module_id, lesson.id,
+            upload_data.filename, upload_data.size, upload_data.sha256
+        )
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/admin/video/uploads/{upload_id}")
+async def get_video_upload(
+    upload_id: str,
+    current_user: CurrentUser = Depends(get_current_admin_user)
+):
+    """Get received parts of a resumable upload (admin only)"""
+    upload = await run_in_threadpool(resumable_upload_service.status, upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
+
+
+@router.put("/admin/video/uploads/{upload_id}")
+async def upload_video_part(
+    upload_id: str,
+    offset: int,
+    request: Request,
+    x_content_sha256: Optional[str] = Header(None),
+    current_user: CurrentUser = Depends(get_current_admin_user)
+):
+    """Upload one part of a resumable upload at the given byte offset (admin only)"""
+    # Never buffer more than one part, whether Content-Length is sent or the body is chunked
+    data = await limited_request(request, resumable_upload_service.part_size).body()
+    try:
+        upload = await run_in_threadpool(
+            resumable_upload_service.write_part, upload_id, offset, data, x_content_sha256
+        )
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload
+
+
+@router.post("/admin/video/uploads/{upload_id}/complete")
+async def complete_video_upload(
+    upload_id: str,
+    current_user: CurrentUser = Depends(get_current_admin_user)
+):
+    """Assemble uploaded parts into the lesson video (admin only)"""
+    try:
+        filename = await run_in_threadpool(resumable_upload_service.complete, upload_id)
+    except UploadInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if filename is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
 
     return {
         "message": "Video uploaded successfully",
@@ -304,27 +462,29 @@ async def upload_video(
     }
 
 
+@router.delete("/admin/video/uploads/{upload_id}")
+async def abort_video_upload(
+    upload_id: str,
+    current_user: CurrentUser = Depends(get_current_admin_user)
+):
+    """Abort a resumable upload and discard its parts (admin only)"""
+    if not await run_in_threadpool(resumable_upload_service.abort, upload_id):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return {"message": "Upload aborted"}
+
+
 @router.get("/admin/modules/{module_id}/lessons/{lesson_number}/videos")
 async def list_lesson_videos(
     module_id: str,
     lesson_number: int,
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """List video files for lesson (admin only)"""
-    lesson = db.query(Lesson).filter(
-        Lesson.module_id == module_id,
-        Lesson.lesson_number == lesson_number
-    ).first()
-
-    if not lesson:
-        raise HTTPException(status_code=404, detail="Lesson not found")
+    lesson, course_id = await get_lesson_with_course_id(db, module_id, lesson_number)
 
-    course_id = get_course_id_for_module(db, module_id)
-    if not course_id:
-        raise HTTPException(status_code=404, detail="Course not found")
-
-    videos = storage_service.list_video_files(course_id, module_id, lesson.id)
+    # May scan the media backend (S3 listing) for a course without a manifest
+    videos = await run_in_threadpool(storage_service.list_video_files, course_id, module_id, lesson.id)
     return {"videos": videos}
 
 
@@ -333,23 +493,14 @@ async def delete_video(
     module_id: str,
     lesson_number: int,
     filename: str,
-    current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete video file (admin only)"""
-    lesson = db.query(Lesson).filter(
-        Lesson.module_id == module_id,
-        Lesson.lesson_number == lesson_number
-    ).first()
-
-    if not lesson:
-        raise HTTPException(status_code=404, detail="Lesson not found")
-
-    course_id = get_course_id_for_module(db, module_id)
-    if not course_id:
-        raise HTTPException(status_code=404, detail="Course not found")
+    lesson, course_id = await get_lesson_with_course_id(db, module_id, lesson_number)
 
-    success = storage_service.delete_video_file(course_id, module_id, lesson.id, filename)
+    # Blocking backend calls (S3 head/delete, manifest rewrite)
+    success = await run_in_threadpool(storage_service.delete_video_file, course_id, module_id, lesson.id, filename)
     if not success:
         raise HTTPException(status_code=404, detail="Video file not found")
 
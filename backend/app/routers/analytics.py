@@ -0,0 +1,135 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import Dict, List, Optional
+from app.database import get_async_db
+from app.models import ModuleStats, ModuleStatBucket
+from app.schemas import AnalyticsResponse, ModuleAnalytics
+from app.auth import CurrentUser, get_current_hr_user
+from app.catalogue_snapshot import catalogue, ModuleRecord
+from app.rollups import LESSONS, ATTEMPTS
+from app.exports import (
+    PROGRESS_HEADER,
+    attempts_export_query,
+    attempts_header,
+    export_filename,
+    progress_export_query,
+    stream_csv,
+)
+
+router = APIRouter()
+
+
+def _rate(part: int, total: int) -> float:
+    return round(part / total * 100, 1) if total else 0.0
+
+
+async def build_module_analytics(db: AsyncSession, modules: List[ModuleRecord]) -> List[ModuleAnalytics]:
+    """Cohort statistics for catalogue modules, read from the rollup tables with two queries"""
+    module_ids = [module.id for module in modules]
+    if not module_ids:
+        return []
+
+    stats_by_module = {
+        row.module_id: row
+        for row in (await db.scalars(select(ModuleStats).filter(ModuleStats.module_id.in_(module_ids)))).all()
+    }
+    buckets: Dict[str, Dict[str, Dict[int, int]]] = {}
+    bucket_rows = (await db.execute(select(
+        ModuleStatBucket.module_id, ModuleStatBucket.metric, ModuleStatBucket.value, ModuleStatBucket.users
+    ).filter(
+        ModuleStatBucket.module_id.in_(module_ids),
+        ModuleStatBucket.users > 0
+    ))).all()
+    for row in bucket_rows:
+        buckets.setdefault(row.module_id, {}).setdefault(row.metric, {})[row.value] = row.users
+
+    result = []
+    for module in modules:
+        stats = stats_by_module.get(module.id)
+        lessons = buckets.get(module.id, {}).get(LESSONS, {})
+        attempts = buckets.get(module.id, {}).get(ATTEMPTS, {})
+
+        learners = sum(lessons.values())
+        completed_learners = sum(users for value, users in lessons.items() if value >= module.total_lessons)
+        tested_learners = learners - attempts.get(0, 0)
+        passed_learners = stats.passed_learners if stats else 0
+        attempt_count = stats.attempts if stats else 0
+
+        result.append(ModuleAnalytics(
+            module_id=module.id,
+            title=module.title,
+            total_lessons=module.total_lessons,
+            learners=learners,
+            completed_learners=completed_learners,
+            completion_rate=_rate(completed_learners, learners),
+            tested_learners=tested_learners,
+            passed_learners=passed_learners,
+            pass_rate=_rate(passed_learners, tested_learners),
+            attempts=attempt_count,
+            average_score=round(stats.percentage_sum / attempt_count, 1) if attempt_count else None,
+            average_time_spent_seconds=round(stats.time_spent_seconds / attempt_count, 1) if attempt_count else None,
+            attempts_distribution={value: users for value, users in sorted(attempts.items()) if value > 0},
+            lessons_distribution=dict(sorted(lessons.items()))
+        ))
+    return result
+
+
+@router.get("/analytics/modules", response_model=AnalyticsResponse)
+async def get_modules_analytics(
+    current_user: CurrentUser = Depends(get_current_hr_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Completion and test statistics for all active modules (HR / admin only)"""
+    modules = (await catalogue.get()).active_modules()
+    return AnalyticsResponse(modules=await build_module_analytics(db, modules))
+
+
+@router.get("/analytics/modules/{module_id}", response_model=ModuleAnalytics)
+async def get_module_analytics(
+    module_id: str,
+    current_user: CurrentUser = Depends(get_current_hr_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Completion and test statistics for one module (HR / admin only)"""
+    module = (await catalogue.get()).module(module_id)
+    if not module:
+        raise HTTPException(status_code=404, detail="Module not found")
+    return (await build_module_analytics(db, [module]))[0]
+
+
+def csv_response(query, header: List[str], kind: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_csv(query, header),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(kind)}"'}
+    )
+
+
+@router.get("/analytics/export/progress")
+async def export_progress(
+    module_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    role: Optional[str] = Query(None, pattern="^(student|creator|hr)$"),
+    current_user: CurrentUser = Depends(get_current_hr_user)
+):
+    """Stream lesson progress rows as CSV (HR / admin only)"""
+    query = progress_export_query(module_id, date_from, date_to, role)
+    return csv_response(query, PROGRESS_HEADER, "progress")
+
+
+@router.get("/analytics/export/attempts")
+async def export_attempts(
+    module_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    role: Optional[str] = Query(None, pattern="^(student|creator|hr)$"),
+    include_answers: bool = False,
+    current_user: CurrentUser = Depends(get_current_hr_user)
+):
+    """Stream test attempt rows as CSV (HR / admin only)"""
+    query = attempts_export_query(module_id, date_from, date_to, role, include_answers)
+    return csv_response(query, attempts_header(include_answers), "test_attempts")
@@ -1,51 +1,81 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
-from app.models import Course, Module, User
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from typing import Any, Dict, List, Union
 from app.schemas import CourseResponse, ModuleResponse
-from app.auth import get_current_user
+from app.auth import CurrentUser, get_current_user
+from app.catalogue_snapshot import catalogue, catalogue_order, CATALOGUE_KEY_FIELDS, ORDER_KEY_TYPES
+from app.pagination import (
+    NEXT_CURSOR_HEADER,
+    PageParams,
+    page_params,
+    page_sequence,
+    parse_fields,
+    project
+)
+from app.http_cache import (
+    CATALOGUE_CACHE_CONTROL,
+    make_etag,
+    is_not_modified,
+    not_modified_response,
+    set_cache_headers
+)
 
 router = APIRouter()
 
 
-@router.get("/courses", response_model=List[CourseResponse])
+@router.get("/courses", response_model=List[Union[CourseResponse, Dict[str, Any]]])
 async def get_courses(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(page_params),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    """Get all active courses"""
-    courses = db.query(Course).filter(Course.is_active == True).order_by(Course.order_index).all()
-    return courses
+    """Get active courses, paginated by (order_index, id)"""
+    fields = parse_fields(page.fields, CourseResponse, CATALOGUE_KEY_FIELDS)
+    snapshot = await catalogue.get()
+    etag = make_etag("courses", snapshot.version, page)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, CATALOGUE_CACHE_CONTROL, snapshot.last_modified)
+
+    courses, next_cursor = page_sequence(snapshot.active_courses(), catalogue_order, page, ORDER_KEY_TYPES)
+    set_cache_headers(response, etag, CATALOGUE_CACHE_CONTROL, snapshot.last_modified)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return project(courses, fields)
 
 
 @router.get("/courses/{course_id}", response_model=CourseResponse)
 async def get_course(
     course_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Get course details"""
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = (await catalogue.get()).course(course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     return course
 
 
-@router.get("/courses/{course_id}/modules", response_model=List[ModuleResponse])
+@router.get("/courses/{course_id}/modules", response_model=List[Union[ModuleResponse, Dict[str, Any]]])
 async def get_course_modules(
     course_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(page_params),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    """Get modules for a course"""
-    course = db.query(Course).filter(Course.id == course_id).first()
+    """Get active modules of a course, paginated by (order_index, id)"""
+    fields = parse_fields(page.fields, ModuleResponse, CATALOGUE_KEY_FIELDS)
+    snapshot = await catalogue.get()
+    course = snapshot.course(course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
-    
-    modules = db.query(Module).filter(
-        Module.course_id == course_id,
-        Module.is_active == True
-    ).order_by(Module.order_index).all()
-    return modules
 
+    etag = make_etag("modules", course.id, snapshot.version, page)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, CATALOGUE_CACHE_CONTROL, snapshot.last_modified)
+
+    modules, next_cursor = page_sequence(course.active_modules, catalogue_order, page, ORDER_KEY_TYPES)
+    set_cache_headers(response, etag, CATALOGUE_CACHE_CONTROL, snapshot.last_modified)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return project(modules, fields)
@@ -1,12 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import FileResponse, StreamingResponse
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import Lesson, Module, User, UserProgress
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.models import Lesson, UserProgress
 from app.schemas import LessonContentResponse, LessonResponse
-from app.auth import get_current_user, get_current_user_optional_token
-from app.storage_service import storage_service
+from app.auth import CurrentUser, get_current_user, get_current_user_optional_token
+from app.catalogue import get_lesson_with_course_id, get_lesson_and_next_with_course_id
+from app.storage_service import storage_service, VIDEO_ACCEL_REDIRECT_PREFIX
+from app.storage_backends import parse_range_header
+from app.media_urls import sign_media_path, verify_media_signature
+from app.progress_events import lesson_view_buffer
+from app.rollups import record_lesson_completed
+from app.lesson_render import get_rendered_lesson
+from app.compression import negotiate_encoding, weak_etag
+from app.http_cache import (
+    LESSON_CACHE_CONTROL,
+    make_etag,
+    is_not_modified,
+    not_modified_response,
+    set_cache_headers
+)
 from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote, urlencode
 import uuid
 import mimetypes
 import os
@@ -14,65 +34,146 @@ import os
 router = APIRouter()
 
 
-def get_course_id_for_module(db: Session, module_id: str) -> str:
-    """Get course_id for a module"""
-    module = db.query(Module).filter(Module.id == module_id).first()
-    if not module:
-        return None
-    return str(module.course_id)
+def remote_video_response(video_path: Path, mime_type: str, headers: dict, range_header: Optional[str]) -> Response:
+    """Proxy a video from a remote media backend, honouring a single byte range"""
+    key = storage_service.get_relative_path(video_path)
+    size = storage_service.get_media_file_size(video_path)
+    if size is None:
+        raise HTTPException(status_code=404, detail="Video file not found")
+    if size == 0:
+        return Response(media_type=mime_type, headers=headers)
+
+    try:
+        byte_range = parse_range_header(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(
+        storage_service.media.iter_range(key, start, end),
+        status_code=status_code,
+        media_type=mime_type,
+        headers=headers
+    )
+
+
+def video_file_response(video_path: Path, filename: str, range_header: Optional[str] = None) -> Response:
+    """Build the video response: presigned redirect or proxy for remote media,
+    X-Accel-Redirect when enabled, otherwise FileResponse.
+
+    Blocking (manifest and media backend lookups) - call from a worker thread.
+    """
+    # Determine MIME type from file extension
+    mime_type, _ = mimetypes.guess_type(str(video_path))
+    if not mime_type or not mime_type.startswith('video/'):
+        # Fallback MIME types for common video formats
+        ext = os.path.splitext(filename)[1].lower()
+        mime_map = {
+            '.mp4': 'video/mp4',
+            '.webm': 'video/webm',
+            '.mov': 'video/quicktime',
+            '.avi': 'video/x-msvideo',
+            '.mkv': 'video/x-matroska',
+        }
+        mime_type = mime_map.get(ext, 'video/mp4')
+
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': f'inline; filename="{filename}"',
+    }
+
+    if storage_service.media.remote:
+        # Client downloads straight from the object store
+        url = storage_service.media.presigned_url(storage_service.get_relative_path(video_path), filename, mime_type)
+        if url:
+            return RedirectResponse(url, status_code=307)
+        return remote_video_response(video_path, mime_type, headers, range_header)
+
+    if VIDEO_ACCEL_REDIRECT_PREFIX:
+        # Authorization is done - let nginx send the bytes (sendfile, range requests)
+        headers['X-Accel-Redirect'] = storage_service.get_accel_redirect_uri(video_path)
+        return Response(media_type=mime_type, headers=headers)
+
+    return FileResponse(
+        str(video_path),
+        media_type=mime_type,
+        filename=filename,
+        headers=headers
+    )
 
 
 @router.get("/modules/{module_id}/lessons/{lesson_number}", response_model=LessonContentResponse)
 async def get_lesson(
     module_id: str,
     lesson_number: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    include_content: bool = True,
+    format: str = Query("markdown", pattern="^(markdown|html)$"),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get lesson content"""
-    # Get lesson from DB
-    lesson = db.query(Lesson).filter(
-        Lesson.module_id == module_id,
-        Lesson.lesson_number == lesson_number
-    ).first()
+    """Get lesson content.
 
-    if not lesson:
-        raise HTTPException(status_code=404, detail="Lesson not found")
+    With include_content=false the markdown is omitted; clients then fetch it
+    from the /content endpoint, which serves precompressed files.
+    With format=html the content is server-rendered, sanitized HTML plus
+    a table of contents and the referenced media.
+    """
+    # Lesson, next lesson and course_id in one query
+    lesson, next_lesson, course_id = await get_lesson_and_next_with_course_id(db, module_id, lesson_number)
+
+    # Mark lesson as accessed - buffered and written in bulk in the background
+    lesson_view_buffer.record(current_user.id, module_id, lesson.id, lesson_number)
+
+    # Conditional GET - answer 304 before reading the content file
+    etag = make_etag(
+        format,
+        lesson.id,
+        lesson.updated_at,
+        next_lesson.id if next_lesson else None,
+        next_lesson.updated_at if next_lesson else None,
+        storage_service.get_lesson_content_version(course_id, module_id, lesson.id) if include_content else None
+    )
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, LESSON_CACHE_CONTROL)
 
-    # Get course_id
-    course_id = get_course_id_for_module(db, module_id)
-    if not course_id:
-        raise HTTPException(status_code=404, detail="Course not found")
+    set_cache_headers(response, etag, LESSON_CACHE_CONTROL)
+    if not include_content:
+        return LessonContentResponse(lesson=lesson, content="", next_lesson=next_lesson, format=format)
+
+    if format == "html":
+        rendered = await run_in_threadpool(get_rendered_lesson, course_id, module_id, lesson.id)
+        if rendered is None:
+            return LessonContentResponse(
+                lesson=lesson,
+                content="<h1>Lesson content not found</h1>",
+                next_lesson=next_lesson,
+                format=format,
+                toc=[],
+                media=[]
+            )
+        return LessonContentResponse(
+            lesson=lesson,
+            content=rendered.html,
+            next_lesson=next_lesson,
+            format=format,
+            toc=rendered.toc,
+            media=rendered.media
+        )
 
     # Get content from storage
     content = storage_service.get_lesson_content(course_id, module_id, lesson.id)
     if content is None:
         content = "# Lesson content not found"
 
-    # Get next lesson
-    next_lesson = db.query(Lesson).filter(
-        Lesson.module_id == module_id,
-        Lesson.lesson_number == lesson_number + 1
-    ).first()
-
-    # Mark lesson as accessed (create progress entry if not exists)
-    progress = db.query(UserProgress).filter(
-        UserProgress.user_id == current_user.id,
-        UserProgress.module_id == module_id,
-        UserProgress.lesson_id == lesson.id
-    ).first()
-
-    if not progress:
-        progress = UserProgress(
-            user_id=current_user.id,
-            module_id=module_id,
-            lesson_id=lesson.id,
-            lesson_number=lesson_number,
-            is_completed=False
-        )
-        db.add(progress)
-        db.commit()
-
     return LessonContentResponse(
         lesson=lesson,
         content=content,
@@ -80,43 +181,84 @@ async def get_lesson(
     )
 
 
+@router.get("/modules/{module_id}/lessons/{lesson_number}/content")
+async def get_lesson_markdown(
+    module_id: str,
+    lesson_number: int,
+    request: Request,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get raw lesson markdown, from a precompressed sidecar when the client accepts it"""
+    lesson, course_id = await get_lesson_with_course_id(db, module_id, lesson_number)
+
+    version = storage_service.get_lesson_content_version(course_id, module_id, lesson.id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Lesson content not found")
+
+    etag = make_etag(lesson.id, version)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, LESSON_CACHE_CONTROL)
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    if encoding:
+        body = storage_service.get_lesson_content_encoded(course_id, module_id, lesson.id, encoding)
+        if body is not None:
+            response = Response(
+                content=body,
+                media_type="text/markdown",
+                headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+            )
+            set_cache_headers(response, weak_etag(etag), LESSON_CACHE_CONTROL)
+            return response
+
+    # No usable sidecar - CompressionMiddleware compresses on the fly
+    content = storage_service.get_lesson_content(course_id, module_id, lesson.id)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Lesson content not found")
+    response = Response(content=content, media_type="text/markdown")
+    set_cache_headers(response, etag, LESSON_CACHE_CONTROL)
+    return response
+
+
 @router.post("/modules/{module_id}/lessons/{lesson_number}/complete")
 async def complete_lesson(
     module_id: str,
     lesson_number: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Mark lesson as completed"""
-    lesson = db.query(Lesson).filter(
+    lesson = await db.scalar(select(Lesson).filter(
         Lesson.module_id == module_id,
         Lesson.lesson_number == lesson_number
-    ).first()
+    ))
 
     if not lesson:
         raise HTTPException(status_code=404, detail="Lesson not found")
 
-    progress = db.query(UserProgress).filter(
-        UserProgress.user_id == current_user.id,
-        UserProgress.module_id == module_id,
-        UserProgress.lesson_id == lesson.id
-    ).first()
-
-    if progress:
-        progress.is_completed = True
-        progress.completed_at = datetime.utcnow()
-    else:
-        progress = UserProgress(
-            user_id=current_user.id,
-            module_id=module_id,
-            lesson_id=lesson.id,
-            lesson_number=lesson_number,
-            is_completed=True,
-            completed_at=datetime.utcnow()
-        )
-        db.add(progress)
-
-    db.commit()
+    now = datetime.utcnow()
+    stmt = insert(UserProgress).values(
+        user_id=current_user.id,
+        module_id=module_id,
+        lesson_id=lesson.id,
+        lesson_number=lesson_number,
+        is_completed=True,
+        completed_at=now
+    )
+    # Only a first completion updates the row (and keeps its completed_at)
+    newly_completed = await db.scalar(stmt.on_conflict_do_update(
+        index_elements=[UserProgress.user_id, UserProgress.lesson_id],
+        set_={
+            "is_completed": True,
+            "completed_at": now,
+            "updated_at": now
+        },
+        where=UserProgress.is_completed.isnot(True)
+    ).returning(UserProgress.id))
+    if newly_completed is not None:
+        await record_lesson_completed(db, current_user.id, module_id)
+    await db.commit()
     return {"message": "Lesson completed", "lesson_id": lesson.id}
 
 
@@ -124,23 +266,14 @@ async def complete_lesson(
 async def get_lesson_videos(
     module_id: str,
     lesson_number: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get list of video files for lesson"""
-    lesson = db.query(Lesson).filter(
-        Lesson.module_id == module_id,
-        Lesson.lesson_number == lesson_number
-    ).first()
-
-    if not lesson:
-        raise HTTPException(status_code=404, detail="Lesson not found")
+    lesson, course_id = await get_lesson_with_course_id(db, module_id, lesson_number)
 
-    course_id = get_course_id_for_module(db, module_id)
-    if not course_id:
-        raise HTTPException(status_code=404, detail="Course not found")
-
-    videos = storage_service.list_video_files(course_id, module_id, lesson.id)
+    # May scan the media backend (S3 listing) for a course without a manifest
+    videos = await run_in_threadpool(storage_service.list_video_files, course_id, module_id, lesson.id)
     return {"videos": videos}
 
 
@@ -150,47 +283,57 @@ async def get_video_file(
     lesson_number: int,
     filename: str,
     request: Request,
-    current_user: User = Depends(get_current_user_optional_token),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user_optional_token),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Stream video file with proper MIME type and range request support"""
-    lesson = db.query(Lesson).filter(
-        Lesson.module_id == module_id,
-        Lesson.lesson_number == lesson_number
-    ).first()
+    lesson, course_id = await get_lesson_with_course_id(db, module_id, lesson_number)
 
-    if not lesson:
-        raise HTTPException(status_code=404, detail="Lesson not found")
+    video_path = await run_in_threadpool(storage_service.get_video_file_path, course_id, module_id, lesson.id, filename)
+    if not video_path:
+        raise HTTPException(status_code=404, detail="Video file not found")
 
-    course_id = get_course_id_for_module(db, module_id)
-    if not course_id:
-        raise HTTPException(status_code=404, detail="Course not found")
+    return await run_in_threadpool(video_file_response, video_path, filename, request.headers.get("range"))
+
+
+@router.get("/modules/{module_id}/lessons/{lesson_number}/video/{filename}/url")
+async def get_video_url(
+    module_id: str,
+    lesson_number: int,
+    filename: str,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a short-lived signed URL (relative to the API root) for a lesson video"""
+    lesson, course_id = await get_lesson_with_course_id(db, module_id, lesson_number)
 
-    video_path = storage_service.get_video_file_path(course_id, module_id, lesson.id, filename)
-    if not video_path or not video_path.exists():
+    video_path = await run_in_threadpool(storage_service.get_video_file_path, course_id, module_id, lesson.id, filename)
+    if not video_path:
         raise HTTPException(status_code=404, detail="Video file not found")
 
-    # Determine MIME type from file extension
-    mime_type, _ = mimetypes.guess_type(str(video_path))
-    if not mime_type or not mime_type.startswith('video/'):
-        # Fallback MIME types for common video formats
-        ext = os.path.splitext(filename)[1].lower()
-        mime_map = {
-            '.mp4': 'video/mp4',
-            '.webm': 'video/webm',
-            '.mov': 'video/quicktime',
-            '.avi': 'video/x-msvideo',
-            '.mkv': 'video/x-matroska',
-        }
-        mime_type = mime_map.get(ext, 'video/mp4')
+    media_path = storage_service.get_relative_path(video_path)
+    params = sign_media_path(media_path, current_user.id)
+    return {
+        "url": f"/media/{quote(media_path)}?{urlencode(params)}",
+        "expires_at": params["expires"]
+    }
 
-    return FileResponse(
-        str(video_path),
-        media_type=mime_type,
-        filename=filename,
-        headers={
-            'Accept-Ranges': 'bytes',
-            'Content-Disposition': f'inline; filename="{filename}"',
-        }
-    )
+
+@router.get("/media/{media_path:path}")
+async def get_signed_media(
+    media_path: str,
+    request: Request,
+    expires: int,
+    uid: str,
+    sig: str
+):
+    """Stream a video authorized by a signed URL - no DB lookup"""
+    if not verify_media_signature(media_path, uid, expires, sig):
+        raise HTTPException(status_code=403, detail="Invalid or expired media URL")
+
+    video_path = await run_in_threadpool(storage_service.get_media_file_path, media_path)
+    if not video_path:
+        raise HTTPException(status_code=404, detail="Video file not found")
+
+    return await run_in_threadpool(video_file_response, video_path, video_path.name, request.headers.get("range"))
 
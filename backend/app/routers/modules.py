@@ -1,10 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import Module, User, UserProgress, Lesson
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.models import UserProgress
 from app.schemas import ModuleResponse, LessonResponse
-from typing import List
-from app.auth import get_current_user
+from typing import Any, Dict, List, Union
+from app.auth import CurrentUser, get_current_user
+from app.catalogue_snapshot import catalogue, lesson_order, LESSON_KEY_FIELDS, ORDER_KEY_TYPES
+from app.pagination import (
+    NEXT_CURSOR_HEADER,
+    PageParams,
+    page_params,
+    page_sequence,
+    parse_fields,
+    project
+)
+from app.http_cache import (
+    CATALOGUE_CACHE_CONTROL,
+    make_etag,
+    is_not_modified,
+    not_modified_response,
+    set_cache_headers
+)
 from datetime import datetime
 
 router = APIRouter()
@@ -13,11 +30,10 @@ router = APIRouter()
 @router.get("/modules/{module_id}", response_model=ModuleResponse)
 async def get_module(
     module_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Get module information"""
-    module = db.query(Module).filter(Module.id == module_id).first()
+    module = (await catalogue.get()).module(module_id)
     if not module:
         raise HTTPException(status_code=404, detail="Module not found")
     return module
@@ -26,19 +42,19 @@ async def get_module(
 @router.post("/modules/{module_id}/start")
 async def start_module(
     module_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Start module - initialize progress"""
-    module = db.query(Module).filter(Module.id == module_id).first()
+    module = (await catalogue.get()).module(module_id)
     if not module:
         raise HTTPException(status_code=404, detail="Module not found")
 
     # Check if progress already exists
-    existing = db.query(UserProgress).filter(
+    existing = await db.scalar(select(UserProgress).filter(
         UserProgress.user_id == current_user.id,
         UserProgress.module_id == module_id
-    ).first()
+    ))
 
     if not existing:
         # Create initial progress entry
@@ -48,25 +64,32 @@ async def start_module(
             is_completed=False
         )
         db.add(progress)
-        db.commit()
+        await db.commit()
 
     return {"message": "Module started", "module_id": module_id}
 
 
-@router.get("/modules/{module_id}/lessons", response_model=List[LessonResponse])
+@router.get("/modules/{module_id}/lessons", response_model=List[Union[LessonResponse, Dict[str, Any]]])
 async def get_module_lessons(
     module_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    page: PageParams = Depends(page_params),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    """Get list of lessons for a module with titles"""
-    module = db.query(Module).filter(Module.id == module_id).first()
+    """Get lessons of a module with titles, paginated by (lesson_number, id)"""
+    fields = parse_fields(page.fields, LessonResponse, LESSON_KEY_FIELDS)
+    snapshot = await catalogue.get()
+    module = snapshot.module(module_id)
     if not module:
         raise HTTPException(status_code=404, detail="Module not found")
 
-    lessons = db.query(Lesson).filter(
-        Lesson.module_id == module_id
-    ).order_by(Lesson.lesson_number).all()
-
-    return lessons
+    etag = make_etag("lessons", module_id, snapshot.version, page)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, CATALOGUE_CACHE_CONTROL, snapshot.last_modified)
 
+    lessons, next_cursor = page_sequence(module.lessons, lesson_order, page, ORDER_KEY_TYPES)
+    set_cache_headers(response, etag, CATALOGUE_CACHE_CONTROL, snapshot.last_modified)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return project(lessons, fields)
@@ -1,43 +1,65 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import User, UserProgress, Module, Lesson, TestAttempt
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List
+from app.database import get_async_db
+from app.models import UserProgress, TestAttempt
 from app.schemas import UserProgressResponse, ModuleProgress, LessonProgress
-from app.auth import get_current_user
+from app.auth import CurrentUser, get_current_user
+from app.catalogue_snapshot import catalogue, ModuleRecord
 
 router = APIRouter()
 
 
-@router.get("/progress", response_model=UserProgressResponse)
-async def get_progress(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Get overall user progress"""
-    # Get all modules
-    modules = db.query(Module).filter(Module.is_active == True).order_by(Module.order_index).all()
+async def build_module_progress(
+    db: AsyncSession,
+    user_id,
+    modules: List[ModuleRecord]
+) -> List[ModuleProgress]:
+    """Build progress for a list of catalogue modules with two queries"""
+    module_ids = [module.id for module in modules]
+    if not module_ids:
+        return []
+
+    # User's lesson progress, keyed by lesson_id
+    progress_rows = (await db.execute(select(
+        UserProgress.module_id,
+        UserProgress.lesson_id,
+        UserProgress.is_completed,
+        UserProgress.completed_at
+    ).filter(
+        UserProgress.user_id == user_id,
+        UserProgress.module_id.in_(module_ids),
+        UserProgress.lesson_id.isnot(None)
+    ))).all()
+    progress_by_lesson = {}
+    completed_by_module: Dict[str, int] = {}
+    for row in progress_rows:
+        if row.lesson_id not in progress_by_lesson:
+            progress_by_lesson[row.lesson_id] = row
+        if row.is_completed:
+            completed_by_module[row.module_id] = completed_by_module.get(row.module_id, 0) + 1
+
+    # Test attempt aggregates per module
+    attempt_rows = (await db.execute(select(
+        TestAttempt.module_id,
+        func.count(TestAttempt.id).label("attempts"),
+        func.count(TestAttempt.id).filter(TestAttempt.passed == True).label("passed")
+    ).filter(
+        TestAttempt.user_id == user_id,
+        TestAttempt.module_id.in_(module_ids)
+    ).group_by(TestAttempt.module_id))).all()
+    attempts_by_module = {row.module_id: row for row in attempt_rows}
 
     module_progresses = []
     for module in modules:
-        # Get lesson progress
-        lesson_progresses = db.query(UserProgress).filter(
-            UserProgress.user_id == current_user.id,
-            UserProgress.module_id == module.id,
-            UserProgress.lesson_id.isnot(None)
-        ).all()
-
-        completed_lessons = sum(1 for lp in lesson_progresses if lp.is_completed)
+        completed_lessons = completed_by_module.get(module.id, 0)
         total_lessons = module.total_lessons
         progress_percentage = (completed_lessons / total_lessons * 100) if total_lessons > 0 else 0
 
-        # Get lessons
-        lessons = db.query(Lesson).filter(
-            Lesson.module_id == module.id
-        ).order_by(Lesson.order_index).all()
-
         lesson_progress_list = []
-        for lesson in lessons:
-            lp = next((l for l in lesson_progresses if l.lesson_id == lesson.id), None)
+        for lesson in sorted(module.lessons, key=lambda lesson: lesson.order_index or 0):
+            lp = progress_by_lesson.get(lesson.id)
             lesson_progress_list.append(LessonProgress(
                 lesson_id=lesson.id,
                 lesson_number=lesson.lesson_number,
@@ -45,28 +67,30 @@ async def get_progress(
                 completed_at=lp.completed_at if lp else None
             ))
 
-        # Check if test passed
-        test_attempt = db.query(TestAttempt).filter(
-            TestAttempt.user_id == current_user.id,
-            TestAttempt.module_id == module.id,
-            TestAttempt.passed == True
-        ).first()
-
-        test_attempts_count = db.query(TestAttempt).filter(
-            TestAttempt.user_id == current_user.id,
-            TestAttempt.module_id == module.id
-        ).count()
-
+        attempts = attempts_by_module.get(module.id)
         module_progresses.append(ModuleProgress(
             module_id=module.id,
             completed_lessons=completed_lessons,
             total_lessons=total_lessons,
             progress_percentage=progress_percentage,
             lessons=lesson_progress_list,
-            test_passed=test_attempt is not None,
-            test_attempts=test_attempts_count
+            test_passed=bool(attempts and attempts.passed),
+            test_attempts=attempts.attempts if attempts else 0
         ))
 
+    return module_progresses
+
+
+@router.get("/progress", response_model=UserProgressResponse)
+async def get_progress(
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get overall user progress"""
+    modules = (await catalogue.get()).active_modules()
+
+    module_progresses = await build_module_progress(db, current_user.id, modules)
+
     return UserProgressResponse(
         user_id=current_user.id,
         modules=module_progresses
@@ -76,59 +100,13 @@ async def get_progress(
 @router.get("/progress/{module_id}", response_model=ModuleProgress)
 async def get_module_progress(
     module_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get progress for specific module"""
-    module = db.query(Module).filter(Module.id == module_id).first()
+    module = (await catalogue.get()).module(module_id)
     if not module:
         raise HTTPException(status_code=404, detail="Module not found")
 
-    # Get lesson progress
-    lesson_progresses = db.query(UserProgress).filter(
-        UserProgress.user_id == current_user.id,
-        UserProgress.module_id == module_id,
-        UserProgress.lesson_id.isnot(None)
-    ).all()
-
-    completed_lessons = sum(1 for lp in lesson_progresses if lp.is_completed)
-    total_lessons = module.total_lessons
-    progress_percentage = (completed_lessons / total_lessons * 100) if total_lessons > 0 else 0
-
-    # Get lessons
-    lessons = db.query(Lesson).filter(
-        Lesson.module_id == module_id
-    ).order_by(Lesson.order_index).all()
-
-    lesson_progress_list = []
-    for lesson in lessons:
-        lp = next((l for l in lesson_progresses if l.lesson_id == lesson.id), None)
-        lesson_progress_list.append(LessonProgress(
-            lesson_id=lesson.id,
-            lesson_number=lesson.lesson_number,
-            is_completed=lp.is_completed if lp else False,
-            completed_at=lp.completed_at if lp else None
-        ))
-
-    # Check if test passed
-    test_attempt = db.query(TestAttempt).filter(
-        TestAttempt.user_id == current_user.id,
-        TestAttempt.module_id == module_id,
-        TestAttempt.passed == True
-    ).first()
-
-    test_attempts_count = db.query(TestAttempt).filter(
-        TestAttempt.user_id == current_user.id,
-        TestAttempt.module_id == module_id
-    ).count()
-
-    return ModuleProgress(
-        module_id=module_id,
-        completed_lessons=completed_lessons,
-        total_lessons=total_lessons,
-        progress_percentage=progress_percentage,
-        lessons=lesson_progress_list,
-        test_passed=test_attempt is not None,
-        test_attempts=test_attempts_count
-    )
-
+    module_progresses = await build_module_progress(db, current_user.id, [module])
+    return module_progresses[0]
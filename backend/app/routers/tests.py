@@ -1,73 +1,203 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import Module, User, TestAttempt
-from app.schemas import TestResponse, TestSubmission, TestResult, TestQuestion
-from app.auth import get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.models import TestAttempt, TestSession
+from app.schemas import TestResponse, TestSessionResponse, TestSubmission, TestResult, TestQuestion
+from app.auth import CurrentUser, get_current_user
+from app.catalogue import get_module_course_id
 from app.storage_service import storage_service
+from app.grading import get_answer_key
+from app.rollups import record_test_attempt
+from app.test_sessions import (
+    decode_test_session,
+    new_session_times,
+    session_expired,
+    shuffle_questions,
+    sign_test_session
+)
+from app.http_cache import (
+    TEST_CACHE_CONTROL,
+    make_etag,
+    is_not_modified,
+    not_modified_response,
+    set_cache_headers
+)
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+DEFAULT_TEST_SETTINGS = {
+    "passing_threshold": 0.7,
+    "time_limit_minutes": 30,
+    "max_attempts": 3,
+    "shuffle_questions": False,
+    "show_results_immediately": True,
+    "allow_review": True
+}
 
-def get_course_id_for_module(db: Session, module_id: str) -> str:
-    """Get course_id for a module"""
-    module = db.query(Module).filter(Module.id == module_id).first()
-    if not module:
-        return None
-    return str(module.course_id)
+
+def attempt_to_result(attempt: TestAttempt) -> TestResult:
+    return TestResult(
+        attempt_id=attempt.id,
+        score=attempt.score,
+        max_score=attempt.max_score,
+        percentage=attempt.percentage,
+        passed=attempt.passed,
+        submitted_at=attempt.submitted_at,
+        time_spent_seconds=attempt.time_spent_seconds,
+        suspicious_activity=attempt.suspicious_activity
+    )
+
+
+def to_public_questions(questions_data: Dict[str, Any]) -> List[TestQuestion]:
+    """Questions without correct answers, as sent to students"""
+    return [
+        TestQuestion(
+            id=q["id"],
+            type=q["type"],
+            question=q["question"],
+            options=q.get("options"),
+            points=q.get("points", 1)
+        )
+        for q in questions_data.get("questions", [])
+    ]
+
+
+def load_test(course_id: str, module_id: str) -> Tuple[List[TestQuestion], Dict[str, Any]]:
+    """Get public questions and settings of a module's test, raising 404 if missing"""
+    # Get questions and settings from storage
+    questions = storage_service.get_test_questions(course_id, module_id, transform=to_public_questions)
+    settings_data = storage_service.get_test_settings(course_id, module_id)
+
+    if not questions:
+        raise HTTPException(status_code=404, detail="Test not found")
+
+    return questions, settings_data or DEFAULT_TEST_SETTINGS
 
 
 @router.get("/modules/{module_id}/test", response_model=TestResponse)
 async def get_test(
     module_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get test questions"""
-    module = db.query(Module).filter(Module.id == module_id).first()
-    if not module:
-        raise HTTPException(status_code=404, detail="Module not found")
+    course_id = await get_module_course_id(db, module_id)
 
-    course_id = get_course_id_for_module(db, module_id)
-    if not course_id:
-        raise HTTPException(status_code=404, detail="Course not found")
+    # Conditional GET - answer 304 before loading questions
+    etag = make_etag(module_id, storage_service.get_test_version(course_id, module_id))
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, TEST_CACHE_CONTROL)
 
-    # Get questions and settings from storage
-    questions_data = storage_service.get_test_questions(course_id, module_id)
-    settings_data = storage_service.get_test_settings(course_id, module_id)
+    questions, settings = load_test(course_id, module_id)
 
-    if not questions_data:
-        raise HTTPException(status_code=404, detail="Test not found")
+    set_cache_headers(response, etag, TEST_CACHE_CONTROL)
+    return TestResponse(
+        module_id=module_id,
+        questions=questions,
+        settings=settings
+    )
 
-    # Convert to response format
-    questions = []
-    for q in questions_data.get("questions", []):
-        question = TestQuestion(
-            id=q["id"],
-            type=q["type"],
-            question=q["question"],
-            options=q.get("options"),
-            points=q.get("points", 1)
+
+async def lock_attempts(db: AsyncSession, user_id, module_id: str) -> None:
+    """Serialize starts and submissions of this user for this module until commit,
+    so attempt counting, max_attempts checks and numbering are atomic"""
+    await db.execute(select(func.pg_advisory_xact_lock(
+        func.hashtext(f"test_attempt:{user_id}:{module_id}")
+    )))
+
+
+async def count_attempts(db: AsyncSession, user_id, module_id: str) -> int:
+    return await db.scalar(select(func.count()).select_from(TestAttempt).filter(
+        TestAttempt.user_id == user_id,
+        TestAttempt.module_id == module_id
+    ))
+
+
+async def forfeit_session(db: AsyncSession, course_id: str, session: TestSession) -> None:
+    """Record a sitting whose time ran out without a submission as a failed attempt"""
+    answer_key = get_answer_key(course_id, session.module_id)
+    time_spent_seconds = int((session.deadline - session.started_at).total_seconds())
+    db.add(TestAttempt(
+        user_id=session.user_id,
+        module_id=session.module_id,
+        attempt_number=session.attempt_number,
+        score=0,
+        max_score=answer_key.max_score if answer_key else 0,
+        percentage=0,
+        passed=False,
+        answers={},
+        time_spent_seconds=time_spent_seconds,
+        started_at=session.started_at,
+        submitted_at=session.deadline,
+        suspicious_activity={"expired": True}
+    ))
+    await record_test_attempt(db, session.user_id, session.module_id, 0.0, False, time_spent_seconds)
+
+
+@router.post("/modules/{module_id}/test/start", response_model=TestSessionResponse)
+async def start_test(
+    module_id: str,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Start (or resume) the test sitting of the next attempt: per-user question order
+    and server-side deadline. Calling it again returns the same sitting."""
+    course_id = await get_module_course_id(db, module_id)
+    questions, settings = load_test(course_id, module_id)
+    max_attempts = settings.get("max_attempts")
+
+    await lock_attempts(db, current_user.id, module_id)
+    attempt_number = await count_attempts(db, current_user.id, module_id) + 1
+
+    session = None
+    if not max_attempts or attempt_number <= max_attempts:
+        session = await db.scalar(select(TestSession).filter(
+            TestSession.user_id == current_user.id,
+            TestSession.module_id == module_id,
+            TestSession.attempt_number == attempt_number
+        ))
+        if session is not None and session_expired(session.deadline):
+            await forfeit_session(db, course_id, session)
+            attempt_number += 1
+            session = None
+
+    if max_attempts and attempt_number > max_attempts:
+        await db.commit()
+        raise HTTPException(status_code=403, detail="Maximum number of attempts reached")
+
+    if session is None:
+        started_at, deadline, seed = new_session_times(settings.get("time_limit_minutes"))
+        session = TestSession(
+            user_id=current_user.id,
+            module_id=module_id,
+            attempt_number=attempt_number,
+            seed=seed,
+            started_at=started_at,
+            deadline=deadline
         )
-        questions.append(question)
+        db.add(session)
+    await db.commit()
 
-    settings = settings_data or {
-        "passing_threshold": 0.7,
-        "time_limit_minutes": 30,
-        "max_attempts": 3,
-        "shuffle_questions": False,
-        "show_results_immediately": True,
-        "allow_review": True
-    }
+    if settings.get("shuffle_questions"):
+        questions = shuffle_questions(questions, session.seed)
 
-    return TestResponse(
+    return TestSessionResponse(
         module_id=module_id,
         questions=questions,
-        settings=settings
+        settings=settings,
+        session_token=sign_test_session(
+            current_user.id, module_id, attempt_number, session.started_at, session.deadline, session.seed
+        ),
+        started_at=session.started_at,
+        deadline=session.deadline
     )
 
 
@@ -75,66 +205,66 @@ async def get_test(
 async def submit_test(
     module_id: str,
     submission: TestSubmission,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(None),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Submit test answers"""
-    module = db.query(Module).filter(Module.id == module_id).first()
-    if not module:
-        raise HTTPException(status_code=404, detail="Module not found")
+    """Submit test answers.
 
-    course_id = get_course_id_for_module(db, module_id)
-    if not course_id:
-        raise HTTPException(status_code=404, detail="Course not found")
+    Retries with the same Idempotency-Key header return the original attempt.
+    """
+    course_id = await get_module_course_id(db, module_id)
 
-    # Get test questions
-    questions_data = storage_service.get_test_questions(course_id, module_id)
+    # Get compiled answer key and settings
+    answer_key = get_answer_key(course_id, module_id)
     settings_data = storage_service.get_test_settings(course_id, module_id)
 
-    if not questions_data:
+    if not answer_key:
         raise HTTPException(status_code=404, detail="Test not found")
 
-    settings = settings_data or {"passing_threshold": 0.7}
+    settings = settings_data or DEFAULT_TEST_SETTINGS
 
-    # Calculate score
-    questions = questions_data.get("questions", [])
-    score = 0.0
-    max_score = sum(q.get("points", 1) for q in questions)
+    # Validate the test session (signed token, no DB lookup) and take timing from it.
+    # Timed tests can only be submitted within a started session.
+    session = None
+    if submission.session_token:
+        session = decode_test_session(submission.session_token, current_user.id, module_id)
+        if session is None:
+            raise HTTPException(status_code=403, detail="Test session is invalid or time limit exceeded")
+    elif settings.get("time_limit_minutes"):
+        raise HTTPException(status_code=400, detail="Timed tests must be started before submitting")
 
-    # Create answer map
+    # Calculate score
     answer_map = {ans.question_id: ans.answer for ans in submission.answers}
-
-    # Check answers
-    for q in questions:
-        q_id = q["id"]
-        user_answer = answer_map.get(q_id)
-        correct_answer = q.get("correct_answer")
-
-        if q["type"] == "multiple_choice":
-            if isinstance(correct_answer, list):
-                if isinstance(user_answer, list):
-                    if set(user_answer) == set(correct_answer):
-                        score += q.get("points", 1)
-                elif user_answer in correct_answer:
-                    score += q.get("points", 1) * 0.5  # Partial credit
-            else:
-                if user_answer == correct_answer:
-                    score += q.get("points", 1)
-        elif q["type"] == "text":
-            if user_answer and correct_answer:
-                # Simple text comparison (case-insensitive)
-                if str(user_answer).strip().lower() == str(correct_answer).strip().lower():
-                    score += q.get("points", 1)
+    score = answer_key.score(answer_map)
+    max_score = answer_key.max_score
 
     percentage = (score / max_score * 100) if max_score > 0 else 0
     passing_threshold = settings.get("passing_threshold", 0.7) * 100
     passed = percentage >= passing_threshold
 
+    await lock_attempts(db, current_user.id, module_id)
+
+    if idempotency_key:
+        previous = await db.scalar(select(TestAttempt).filter(
+            TestAttempt.user_id == current_user.id,
+            TestAttempt.module_id == module_id,
+            TestAttempt.idempotency_key == idempotency_key
+        ))
+        if previous:
+            await db.commit()
+            return attempt_to_result(previous)
+
     # Get attempt number
-    existing_attempts = db.query(TestAttempt).filter(
-        TestAttempt.user_id == current_user.id,
-        TestAttempt.module_id == module_id
-    ).count()
+    existing_attempts = await count_attempts(db, current_user.id, module_id)
+    if session and session["attempt_number"] != existing_attempts + 1:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Test session does not belong to the current attempt")
+
+    max_attempts = settings.get("max_attempts")
+    if max_attempts and existing_attempts >= max_attempts:
+        await db.rollback()
+        raise HTTPException(status_code=403, detail="Maximum number of attempts reached")
 
     # Log suspicious activity
     suspicious = {}
@@ -142,6 +272,14 @@ async def submit_test(
         suspicious = submission.suspicious_activity
         logger.warning(f"Suspicious activity for user {current_user.id}: {suspicious}")
 
+    submitted_at = datetime.utcnow()
+    if session:
+        started_at = session["started_at"]
+        time_spent_seconds = int((submitted_at - started_at).total_seconds())
+    else:
+        started_at = submitted_at
+        time_spent_seconds = submission.time_spent_seconds
+
     # Create test attempt
     attempt = TestAttempt(
         user_id=current_user.id,
@@ -151,50 +289,35 @@ async def submit_test(
         max_score=max_score,
         percentage=percentage,
         passed=passed,
-        answers={ans.question_id: ans.answer for ans in submission.answers},
-        time_spent_seconds=submission.time_spent_seconds,
-        submitted_at=datetime.utcnow(),
-        suspicious_activity=suspicious
+        answers=answer_map,
+        time_spent_seconds=time_spent_seconds,
+        started_at=started_at,
+        submitted_at=submitted_at,
+        suspicious_activity=suspicious,
+        idempotency_key=idempotency_key
     )
     db.add(attempt)
-    db.commit()
-    db.refresh(attempt)
+    await record_test_attempt(db, current_user.id, module_id, percentage, passed, time_spent_seconds)
+    await db.commit()
+    await db.refresh(attempt)
 
-    return TestResult(
-        attempt_id=attempt.id,
-        score=attempt.score,
-        max_score=attempt.max_score,
-        percentage=attempt.percentage,
-        passed=attempt.passed,
-        submitted_at=attempt.submitted_at,
-        time_spent_seconds=attempt.time_spent_seconds,
-        suspicious_activity=attempt.suspicious_activity
-    )
+    return attempt_to_result(attempt)
 
 
 @router.get("/modules/{module_id}/test/results", response_model=TestResult)
 async def get_test_results(
     module_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get latest test results for user"""
-    attempt = db.query(TestAttempt).filter(
+    attempt = await db.scalar(select(TestAttempt).filter(
         TestAttempt.user_id == current_user.id,
         TestAttempt.module_id == module_id
-    ).order_by(TestAttempt.submitted_at.desc()).first()
+    ).order_by(TestAttempt.submitted_at.desc()))
 
     if not attempt:
         raise HTTPException(status_code=404, detail="No test results found")
 
-    return TestResult(
-        attempt_id=attempt.id,
-        score=attempt.score,
-        max_score=attempt.max_score,
-        percentage=attempt.percentage,
-        passed=attempt.passed,
-        submitted_at=attempt.submitted_at,
-        time_spent_seconds=attempt.time_spent_seconds,
-        suspicious_activity=attempt.suspicious_activity
-    )
+    return attempt_to_result(attempt)
 
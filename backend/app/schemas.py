@@ -72,10 +72,24 @@ class LessonResponse(BaseModel):
         from_attributes = True
 
 
+class LessonTocEntry(BaseModel):
+    level: int
+    id: str
+    title: str
+
+
+class LessonMediaRef(BaseModel):
+    type: str  # video, image
+    src: str
+
+
 class LessonContentResponse(BaseModel):
     lesson: LessonResponse
-    content: str
+    content: str  # markdown, or sanitized HTML when format == "html"
     next_lesson: Optional[LessonResponse] = None
+    format: str = "markdown"
+    toc: Optional[List[LessonTocEntry]] = None
+    media: Optional[List[LessonMediaRef]] = None
 
 
 # Tests
@@ -98,6 +112,12 @@ class TestResponse(BaseModel):
     settings: Dict[str, Any]
 
 
+class TestSessionResponse(TestResponse):
+    session_token: str
+    started_at: datetime
+    deadline: Optional[datetime] = None
+
+
 class TestAnswer(BaseModel):
     question_id: str
     answer: Any  # str or List[str]
@@ -105,8 +125,9 @@ class TestAnswer(BaseModel):
 
 class TestSubmission(BaseModel):
     answers: List[TestAnswer]
-    time_spent_seconds: Optional[int] = None
+    time_spent_seconds: Optional[int] = None  # ignored when session_token is given
     suspicious_activity: Optional[Dict[str, Any]] = None
+    session_token: Optional[str] = None  # from POST /modules/{id}/test/start, required for timed tests
 
 
 class TestResult(BaseModel):
@@ -145,3 +166,25 @@ class UserProgressResponse(BaseModel):
     user_id: UUID
     modules: List[ModuleProgress]
 
+
+
+# Analytics
+class ModuleAnalytics(BaseModel):
+    module_id: str
+    title: str
+    total_lessons: int
+    learners: int  # users who completed a lesson or attempted the test
+    completed_learners: int
+    completion_rate: float
+    tested_learners: int
+    passed_learners: int
+    pass_rate: float
+    attempts: int
+    average_score: Optional[float]  # percentage, over all attempts
+    average_time_spent_seconds: Optional[float]  # per attempt
+    attempts_distribution: Dict[int, int]  # attempts made -> users
+    lessons_distribution: Dict[int, int]  # lessons completed -> users
+
+
+class AnalyticsResponse(BaseModel):
+    modules: List[ModuleAnalytics]
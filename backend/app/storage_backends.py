@@ -0,0 +1,263 @@
+"""Media storage backends.
+
+Video files are stored through a MediaBackend, addressed by their key: the
+path relative to STORAGE_PATH (courses/<course>/modules/.../files/video/<name>).
+
+- LocalMediaBackend keeps them on the local filesystem under STORAGE_PATH
+  (default; served by FileResponse or nginx X-Accel-Redirect).
+- S3MediaBackend keeps them in an S3-compatible bucket (AWS S3, MinIO) and
+  hands clients presigned URLs, so media bytes never pass through the API.
+  With S3_PRESIGNED_URLS=false the API proxies ranged GETs instead.
+
+Lesson content, tests and manifests stay under STORAGE_PATH.
+"""
+import os
+from datetime import timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")  # local | s3
+
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None  # e.g. http://minio:9000; None for AWS
+S3_PUBLIC_ENDPOINT_URL = os.getenv("S3_PUBLIC_ENDPOINT_URL") or None  # host clients use in presigned URLs
+S3_BUCKET = os.getenv("S3_BUCKET", "lms-media")
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID") or None
+S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY") or None
+S3_KEY_PREFIX = os.getenv("S3_KEY_PREFIX", "")
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "50"))
+S3_PRESIGNED_URLS = os.getenv("S3_PRESIGNED_URLS", "true").lower() == "true"
+S3_PRESIGNED_URL_TTL_SECONDS = int(os.getenv("S3_PRESIGNED_URL_TTL_SECONDS", "3600"))
+S3_STREAM_CHUNK_SIZE = 1024 * 1024  # 1 MB
+S3_MAX_SINGLE_PUT_SIZE = 5 * 1024 * 1024 * 1024  # S3 limit for a single PUT
+
+
+class MediaBackend:
+    """Interface for media object storage; keys are storage-relative posix paths"""
+
+    # True when objects are not files under STORAGE_PATH
+    remote = False
+
+    def publish(self, source: Path, key: str, content_type: Optional[str] = None) -> None:
+        """Store a fully written local file under key.
+
+        Raises FileExistsError instead of overwriting an existing object.
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def size(self, key: str) -> Optional[int]:
+        """Object size in bytes, None if it does not exist"""
+        raise NotImplementedError
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        """Stream bytes start..end (inclusive) of an object"""
+        raise NotImplementedError
+
+    def presigned_url(self, key: str, filename: str, content_type: Optional[str] = None) -> Optional[str]:
+        """Time-limited direct download URL, None if clients must go through the API"""
+        return None
+
+    def scan(self, prefix: str) -> Dict[str, Dict[str, Any]]:
+        """{key: {"size", "mtime_ns"}} of all objects under prefix (for manifest rebuilds)"""
+        raise NotImplementedError
+
+
+class LocalMediaBackend(MediaBackend):
+    def __init__(self, root: Path):
+        self.root = root
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def publish(self, source: Path, key: str, content_type: Optional[str] = None) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # os.link fails instead of overwriting, so concurrent uploads can't clobber each other
+        os.link(source, path)
+
+    def delete(self, key: str) -> bool:
+        path = self._path(key)
+        if not path.exists():
+            return False
+        path.unlink()
+        return True
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return self._path(key).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(S3_STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def scan(self, prefix: str) -> Dict[str, Dict[str, Any]]:
+        # Local media files are picked up by the manifest's directory scan
+        return {}
+
+
+class S3MediaBackend(MediaBackend):
+    remote = True
+
+    def __init__(
+        self,
+        bucket: str = S3_BUCKET,
+        endpoint_url: Optional[str] = S3_ENDPOINT_URL,
+        public_endpoint_url: Optional[str] = S3_PUBLIC_ENDPOINT_URL,
+        key_prefix: str = S3_KEY_PREFIX,
+        presigned_urls: bool = S3_PRESIGNED_URLS
+    ):
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3)")
+
+        self.bucket = bucket
+        self.key_prefix = key_prefix
+        self.presigned_urls = presigned_urls
+
+        # One client per process: thread-safe, keeps a pool of HTTP connections
+        config = Config(
+            region_name=S3_REGION,
+            max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+            retries={"max_attempts": 3, "mode": "standard"},
+            s3={"addressing_style": "path" if endpoint_url else "auto"},
+            signature_version="s3v4"
+        )
+        credentials = {
+            "aws_access_key_id": S3_ACCESS_KEY_ID,
+            "aws_secret_access_key": S3_SECRET_ACCESS_KEY,
+        }
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, config=config, **credentials)
+        # Presigned URLs must be signed for the host the browser talks to
+        if public_endpoint_url and public_endpoint_url != endpoint_url:
+            self.url_client = boto3.client("s3", endpoint_url=public_endpoint_url, config=config, **credentials)
+        else:
+            self.url_client = self.client
+
+    def _key(self, key: str) -> str:
+        return self.key_prefix + key
+
+    def _is_missing(self, error) -> bool:
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def publish(self, source: Path, key: str, content_type: Optional[str] = None) -> None:
+        from botocore.exceptions import ClientError
+
+        extra_args = {"ContentType": content_type} if content_type else {}
+        if source.stat().st_size > S3_MAX_SINGLE_PUT_SIZE:
+            # Multipart transfer has no conditional write - check first
+            if self.size(key) is not None:
+                raise FileExistsError(key)
+            self.client.upload_file(str(source), self.bucket, self._key(key), ExtraArgs=extra_args)
+            return
+        try:
+            with open(source, "rb") as f:
+                # Conditional write: fails with 412 if the key already exists
+                self.client.put_object(
+                    Bucket=self.bucket, Key=self._key(key), Body=f, IfNoneMatch="*", **extra_args
+                )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "412"):
+                raise FileExistsError(key)
+            raise
+
+    def delete(self, key: str) -> bool:
+        if self.size(key) is None:
+            return False
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+        return True
+
+    def size(self, key: str) -> Optional[int]:
+        from botocore.exceptions import ClientError
+
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(key))["ContentLength"]
+        except ClientError as e:
+            if self._is_missing(e):
+                return None
+            raise
+
+    def iter_range(self, key: str, start: int, end: int) -> Iterator[bytes]:
+        response = self.client.get_object(
+            Bucket=self.bucket, Key=self._key(key), Range=f"bytes={start}-{end}"
+        )
+        body = response["Body"]
+        try:
+            yield from body.iter_chunks(S3_STREAM_CHUNK_SIZE)
+        finally:
+            body.close()
+
+    def presigned_url(self, key: str, filename: str, content_type: Optional[str] = None) -> Optional[str]:
+        if not self.presigned_urls:
+            return None
+        params = {
+            "Bucket": self.bucket,
+            "Key": self._key(key),
+            "ResponseContentDisposition": f'inline; filename="{filename}"',
+        }
+        if content_type:
+            params["ResponseContentType"] = content_type
+        return self.url_client.generate_presigned_url(
+            "get_object", Params=params, ExpiresIn=S3_PRESIGNED_URL_TTL_SECONDS
+        )
+
+    def scan(self, prefix: str) -> Dict[str, Dict[str, Any]]:
+        objects = {}
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for item in page.get("Contents", []):
+                modified = item["LastModified"].astimezone(timezone.utc)
+                objects[item["Key"][len(self.key_prefix):]] = {
+                    "size": item["Size"],
+                    "mtime_ns": int(modified.timestamp()) * 1_000_000_000,
+                }
+        return objects
+
+
+def create_media_backend(storage_path: Path) -> MediaBackend:
+    if STORAGE_BACKEND == "s3":
+        logger.info(f"Using S3 media backend (bucket {S3_BUCKET}, endpoint {S3_ENDPOINT_URL or 'AWS'})")
+        return S3MediaBackend()
+    if STORAGE_BACKEND != "local":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+    return LocalMediaBackend(storage_path)
+
+
+def parse_range_header(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single 'bytes=' range, None for a full response.
+
+    Raises ValueError for an unsatisfiable range.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_text, _, end_text = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # Suffix range: last N bytes
+            start = max(size - int(end_text), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    end = min(end, size - 1)
+    if start > end:
+        raise ValueError(range_header)
+    return start, end
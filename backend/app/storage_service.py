@@ -1,22 +1,158 @@
+import hashlib
 import json
+import mimetypes
 import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Dict, Any, List, BinaryIO
+from typing import Optional, Dict, Any, List, BinaryIO, Callable, Tuple
+from urllib.parse import quote
 import logging
 
+from app.compression import SUPPORTED_ENCODINGS, SIDECAR_SUFFIXES, compress
+from app.content_manifest import ContentManifest
+from app.storage_backends import MediaBackend, create_media_backend
+
 logger = logging.getLogger(__name__)
 
 STORAGE_PATH = os.getenv("STORAGE_PATH", "./storage")
 
 # Allowed video file extensions
 ALLOWED_VIDEO_EXTENSIONS = {'.mp4', '.webm', '.mov', '.avi', '.mkv'}
-MAX_VIDEO_SIZE = 100 * 1024 * 1024  # 100 MB
+MAX_VIDEO_SIZE = int(os.getenv("MAX_VIDEO_SIZE_MB", "100")) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+# NamedTemporaryFile creates files as 0600; published videos get the usual
+# umask-derived mode so nginx (X-Accel-Redirect) can read them.
+# The umask can only be read by setting it, so do that once at import.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+PUBLISHED_FILE_MODE = 0o644 & ~_UMASK
+
+# Resumable (multipart) video uploads
+RESUMABLE_UPLOAD_PART_SIZE = int(os.getenv("RESUMABLE_UPLOAD_PART_SIZE_MB", "8")) * 1024 * 1024
+MAX_RESUMABLE_VIDEO_SIZE = int(os.getenv("MAX_RESUMABLE_VIDEO_SIZE_MB", str(10 * 1024))) * 1024 * 1024
+UPLOAD_SESSION_TTL_SECONDS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24")) * 3600
+
+# Internal nginx location aliased to STORAGE_PATH (e.g. "/protected-storage/").
+# When set, video bytes are served by nginx via X-Accel-Redirect instead of Python.
+# Only applies to the local media backend (STORAGE_BACKEND=local).
+VIDEO_ACCEL_REDIRECT_PREFIX = os.getenv("VIDEO_ACCEL_REDIRECT_PREFIX", "")
+
+# Sidecar holding a rendering of a file (e.g. lesson HTML), content.md -> content.md.rendered
+RENDERED_SIDECAR_SUFFIX = ".rendered"
+
+# Max number of files (lesson content, test questions/settings, metadata) kept in memory
+CONTENT_CACHE_SIZE = int(os.getenv("CONTENT_CACHE_SIZE", "512"))
+
+
+def _read_text(path: Path) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _read_bytes(path: Path) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _read_json(path: Path) -> Any:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _file_version(path: Path) -> Optional[str]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+class ContentCache:
+    """Bounded LRU cache of parsed files keyed by path.
+
+    Every lookup stat()s the file and reloads it when mtime or size changed,
+    so edits made outside the API are picked up. A file can be cached in
+    several representations (variants), e.g. raw JSON and a compiled form.
+    Cached values are shared between requests and must not be mutated by callers.
+    """
+
+    def __init__(self, max_entries: int = CONTENT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[Path, str], Tuple[Tuple[int, int], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: Path, loader: Callable[[Path], Any], variant: str = "") -> Any:
+        """Return the cached value for path, loading it on a miss.
+
+        Raises FileNotFoundError if the file does not exist.
+        """
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self.invalidate(path)
+            raise
+        version = (stat.st_mtime_ns, stat.st_size)
+        key = (path, variant)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = loader(path)
+
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, path: Path) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == path]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
 
 
 class StorageService:
-    def __init__(self, storage_path: str = STORAGE_PATH):
+    def __init__(
+        self,
+        storage_path: str = STORAGE_PATH,
+        cache_size: int = CONTENT_CACHE_SIZE,
+        media: Optional[MediaBackend] = None
+    ):
         self.storage_path = Path(storage_path)
         self.storage_path.mkdir(parents=True, exist_ok=True)
+        self.cache = ContentCache(cache_size)
+        # Video files; lesson content and tests always live under storage_path
+        self.media = media if media is not None else create_media_backend(self.storage_path)
+        self.manifest = ContentManifest(
+            self.storage_path / "courses", self.cache, media_scan=self.media.scan if self.media.remote else None
+        )
 
     def _get_course_path(self, course_id: str) -> Path:
         return self.storage_path / "courses" / course_id
@@ -34,57 +170,165 @@ class StorageService:
     def _get_test_path(self, course_id: str, module_id: str) -> Path:
         return self._get_module_path(course_id, module_id) / "test"
 
+    def _get_manifest_key(self, course_id: str, file_path: Path) -> str:
+        """Path of a file relative to its course directory, as used in the manifest"""
+        return file_path.relative_to(self._get_course_path(course_id)).as_posix()
+
     def get_course_metadata(self, course_id: str) -> Optional[Dict[str, Any]]:
         metadata_file = self._get_course_path(course_id) / "metadata.json"
-        if not metadata_file.exists():
-            return None
         try:
-            with open(metadata_file, "r", encoding="utf-8") as f:
-                return json.load(f)
+            return self.cache.get(metadata_file, _read_json)
+        except FileNotFoundError:
+            return None
         except Exception as e:
             logger.error(f"Error reading course metadata: {e}")
             return None
 
     def get_module_metadata(self, course_id: str, module_id: str) -> Optional[Dict[str, Any]]:
         metadata_file = self._get_module_path(course_id, module_id) / "metadata.json"
-        if not metadata_file.exists():
-            return None
         try:
-            with open(metadata_file, "r", encoding="utf-8") as f:
-                return json.load(f)
+            return self.cache.get(metadata_file, _read_json)
+        except FileNotFoundError:
+            return None
         except Exception as e:
             logger.error(f"Error reading module metadata: {e}")
             return None
 
-    def get_lesson_content(self, course_id: str, module_id: str, lesson_id: str) -> Optional[str]:
+    def get_lesson_content(
+        self,
+        course_id: str,
+        module_id: str,
+        lesson_id: str,
+        transform: Optional[Callable[[str], Any]] = None
+    ) -> Optional[Any]:
+        """Get lesson markdown; with transform, the transformed value is cached per file version"""
         content_file = self._get_lesson_path(course_id, module_id, lesson_id) / "content.md"
-        if not content_file.exists():
-            return None
         try:
-            with open(content_file, "r", encoding="utf-8") as f:
-                return f.read()
+            if transform is not None:
+                return self.cache.get(
+                    content_file, lambda path: transform(_read_text(path)), variant=transform.__qualname__
+                )
+            return self.cache.get(content_file, _read_text)
+        except FileNotFoundError:
+            return None
         except Exception as e:
             logger.error(f"Error reading lesson content: {e}")
             return None
 
-    def get_test_questions(self, course_id: str, module_id: str) -> Optional[Dict[str, Any]]:
-        questions_file = self._get_test_path(course_id, module_id) / "questions.json"
-        if not questions_file.exists():
+    def get_lesson_content_encoded(
+        self, course_id: str, module_id: str, lesson_id: str, encoding: str
+    ) -> Optional[bytes]:
+        """Precompressed content.md (sidecar) for a content-coding, if it is up to date"""
+        content_file = self._get_lesson_path(course_id, module_id, lesson_id) / "content.md"
+        sidecar = content_file.with_name(content_file.name + SIDECAR_SUFFIXES[encoding])
+        try:
+            # content.md edited outside the API after the sidecar was written - stale
+            if sidecar.stat().st_mtime_ns < content_file.stat().st_mtime_ns:
+                return None
+            return self.cache.get(sidecar, _read_bytes)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Error reading compressed lesson content: {e}")
+            return None
+
+    def get_lesson_rendering(
+        self,
+        course_id: str,
+        module_id: str,
+        lesson_id: str,
+        render: Callable[[str], Any],
+        renderer: str
+    ) -> Optional[Any]:
+        """Rendering of content.md (a JSON-serializable value), kept in a sidecar next to it.
+
+        The sidecar records the content.md version and renderer it was made
+        from; a stale one is re-rendered and replaced. The value is also
+        cached in memory per file version. Blocking - call from a worker thread.
+        """
+        content_file = self._get_lesson_path(course_id, module_id, lesson_id) / "content.md"
+
+        def load(path: Path) -> Any:
+            sidecar = path.with_name(path.name + RENDERED_SIDECAR_SUFFIX)
+            # Read before the content, so a concurrent edit leaves the sidecar stale rather than wrong
+            version = _file_version(path)
+            try:
+                rendered = _read_json(sidecar)
+                if rendered.get("source_version") == version and rendered.get("renderer") == renderer:
+                    return rendered["value"]
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable rendered sidecar {sidecar}: {e}")
+            value = render(_read_text(path))
+            self._write_rendered_sidecar(sidecar, {"renderer": renderer, "source_version": version, "value": value})
+            return value
+
+        try:
+            return self.cache.get(content_file, load, variant=f"rendered:{renderer}")
+        except FileNotFoundError:
             return None
+        except Exception as e:
+            logger.error(f"Error rendering lesson content: {e}")
+            return None
+
+    def _write_rendered_sidecar(self, sidecar: Path, rendered: Dict[str, Any]) -> None:
+        tmp_name = None
+        try:
+            with tempfile.NamedTemporaryFile(
+                "w", dir=sidecar.parent, prefix=".rendered_", suffix=".tmp", delete=False, encoding="utf-8"
+            ) as tmp:
+                tmp_name = tmp.name
+                json.dump(rendered, tmp, ensure_ascii=False)
+            os.replace(tmp_name, sidecar)
+        except OSError as e:
+            # Still served from memory; rendered again by the next process
+            logger.warning(f"Could not write rendered sidecar {sidecar}: {e}")
+            if tmp_name is not None:
+                Path(tmp_name).unlink(missing_ok=True)
+
+    def _write_compressed_sidecars(self, path: Path, data: bytes) -> None:
+        for encoding in SUPPORTED_ENCODINGS:
+            sidecar = path.with_name(path.name + SIDECAR_SUFFIXES[encoding])
+            with open(sidecar, "wb") as f:
+                f.write(compress(data, encoding, best=True))
+            self.cache.invalidate(sidecar)
+
+    def get_test_questions(
+        self,
+        course_id: str,
+        module_id: str,
+        transform: Optional[Callable[[Dict[str, Any]], Any]] = None
+    ) -> Optional[Any]:
+        """Get test questions; with transform, the transformed value is cached per file version"""
+        questions_file = self._get_test_path(course_id, module_id) / "questions.json"
         try:
-            with open(questions_file, "r", encoding="utf-8") as f:
-                return json.load(f)
+            if transform is not None:
+                return self.cache.get(
+                    questions_file, lambda path: transform(_read_json(path)), variant=transform.__qualname__
+                )
+            return self.cache.get(questions_file, _read_json)
+        except FileNotFoundError:
+            return None
         except Exception as e:
             logger.error(f"Error reading test questions: {e}")
             return None
 
+    def get_lesson_content_version(self, course_id: str, module_id: str, lesson_id: str) -> Optional[str]:
+        """Cheap version tag (mtime/size) of a lesson's content.md, without reading it"""
+        return _file_version(self._get_lesson_path(course_id, module_id, lesson_id) / "content.md")
+
+    def get_test_version(self, course_id: str, module_id: str) -> str:
+        """Cheap version tag of a module's questions.json and settings.json"""
+        test_path = self._get_test_path(course_id, module_id)
+        return f"{_file_version(test_path / 'questions.json')}/{_file_version(test_path / 'settings.json')}"
+
     def get_test_settings(self, course_id: str, module_id: str) -> Optional[Dict[str, Any]]:
         settings_file = self._get_test_path(course_id, module_id) / "settings.json"
-        if not settings_file.exists():
-            return None
         try:
-            with open(settings_file, "r", encoding="utf-8") as f:
-                return json.load(f)
+            return self.cache.get(settings_file, _read_json)
+        except FileNotFoundError:
+            return None
         except Exception as e:
             logger.error(f"Error reading test settings: {e}")
             return None
@@ -95,8 +339,15 @@ class StorageService:
             lesson_path = self._get_lesson_path(course_id, module_id, lesson_id)
             lesson_path.mkdir(parents=True, exist_ok=True)
             content_file = lesson_path / "content.md"
-            with open(content_file, "w", encoding="utf-8") as f:
-                f.write(content)
+            data = content.encode("utf-8")
+            with open(content_file, "wb") as f:
+                f.write(data)
+            self.cache.invalidate(content_file)
+            # Written after content.md, so fresh sidecars are never older than it
+            self._write_compressed_sidecars(content_file, data)
+            self.manifest.record(
+                course_id, self._get_manifest_key(course_id, content_file), hashlib.sha256(data).hexdigest()
+            )
             return True
         except Exception as e:
             logger.error(f"Error saving lesson content: {e}")
@@ -110,6 +361,8 @@ class StorageService:
             questions_file = test_path / "questions.json"
             with open(questions_file, "w", encoding="utf-8") as f:
                 json.dump(questions, f, ensure_ascii=False, indent=2)
+            self.cache.invalidate(questions_file)
+            self.manifest.record(course_id, self._get_manifest_key(course_id, questions_file))
             return True
         except Exception as e:
             logger.error(f"Error saving test questions: {e}")
@@ -123,65 +376,121 @@ class StorageService:
             settings_file = test_path / "settings.json"
             with open(settings_file, "w", encoding="utf-8") as f:
                 json.dump(settings, f, ensure_ascii=False, indent=2)
+            self.cache.invalidate(settings_file)
+            self.manifest.record(course_id, self._get_manifest_key(course_id, settings_file))
             return True
         except Exception as e:
             logger.error(f"Error saving test settings: {e}")
             return False
 
-    def save_video_file(self, course_id: str, module_id: str, lesson_id: str, file) -> Optional[str]:
-        """Save video file and return filename"""
+    def video_upload_dir(self, course_id: str, module_id: str, lesson_id: str) -> Path:
+        """Directory a lesson's video uploads are written to before publish_uploaded_video (created if missing)"""
+        video_path = self._get_lesson_files_path(course_id, module_id, lesson_id, "video")
+        video_path.mkdir(parents=True, exist_ok=True)
+        return video_path
+
+    def publish_uploaded_video(
+        self, course_id: str, module_id: str, lesson_id: str, filename: str, tmp_path: Path, size: int, sha256: str
+    ) -> Optional[str]:
+        """Publish an upload written to a temp file in video_upload_dir() and return the video filename.
+
+        The temp file is linked into place (not copied) and rejected if it
+        exceeds MAX_VIDEO_SIZE; the caller removes it afterwards. The HTTP body
+        itself is bounded while it is received (see app.body_limits).
+        Blocking - call from a worker thread in async handlers.
+        """
         try:
             # Check file extension
-            file_ext = Path(file.filename).suffix.lower()
+            file_ext = Path(filename or "").suffix.lower()
             if file_ext not in ALLOWED_VIDEO_EXTENSIONS:
                 logger.error(f"Invalid video file extension: {file_ext}")
                 return None
 
-            # Create files/video directory
-            video_path = self._get_lesson_files_path(course_id, module_id, lesson_id, "video")
-            video_path.mkdir(parents=True, exist_ok=True)
-
-            # Generate filename
-            existing_files = list(video_path.glob(f"{lesson_id}_video_*.{file_ext[1:]}"))
-            index = len(existing_files) + 1
-            filename = f"{lesson_id}_video_{index}{file_ext}"
+            # Check file size
+            if size > MAX_VIDEO_SIZE:
+                logger.error(f"Video file too large: more than {MAX_VIDEO_SIZE} bytes")
+                return None
 
-            # Save file
-            file_path = video_path / filename
-            with open(file_path, "wb") as f:
-                content = file.file.read()
-                # Check file size
-                if len(content) > MAX_VIDEO_SIZE:
-                    logger.error(f"Video file too large: {len(content)} bytes")
-                    return None
-                f.write(content)
-
-            return filename
+            os.chmod(tmp_path, PUBLISHED_FILE_MODE)
+            return self._publish_video_file(course_id, module_id, lesson_id, file_ext, tmp_path, sha256)
         except Exception as e:
             logger.error(f"Error saving video file: {e}")
             return None
 
-    def get_video_file_path(self, course_id: str, module_id: str, lesson_id: str, filename: str) -> Optional[Path]:
-        """Get path to video file"""
+    def _publish_video_file(
+        self, course_id: str, module_id: str, lesson_id: str, file_ext: str, tmp_path: Path, sha256: str
+    ) -> str:
+        """Link a fully written temp file to the next free video filename and record it in the manifest"""
         video_path = self._get_lesson_files_path(course_id, module_id, lesson_id, "video")
-        file_path = video_path / filename
-        if file_path.exists() and file_path.is_file():
-            return file_path
-        return None
+        content_type = mimetypes.guess_type(f"video{file_ext}")[0]
+        prefix = f"{lesson_id}_video_"
+        existing_files = [
+            name for name in self.manifest.list_dir(course_id, self._get_manifest_key(course_id, video_path))
+            if name.startswith(prefix) and name.endswith(file_ext)
+        ]
+        index = len(existing_files) + 1
+        # publish fails instead of overwriting, so concurrent uploads can't clobber each other
+        while True:
+            filename = f"{prefix}{index}{file_ext}"
+            try:
+                self.media.publish(tmp_path, self.get_relative_path(video_path / filename), content_type)
+                break
+            except FileExistsError:
+                index += 1
+        self.manifest.record(
+            course_id, self._get_manifest_key(course_id, video_path / filename), sha256, source=tmp_path
+        )
+        return filename
+
+    def get_video_file_path(self, course_id: str, module_id: str, lesson_id: str, filename: str) -> Optional[Path]:
+        """Get path to video file listed in the course manifest and still present"""
+        file_path = self._get_lesson_files_path(course_id, module_id, lesson_id, "video") / filename
+        if file_path.suffix.lower() not in ALLOWED_VIDEO_EXTENSIONS:
+            return None
+        if self.manifest.lookup(course_id, self._get_manifest_key(course_id, file_path)) is None:
+            return None
+        return self._existing_media_file(file_path)
+
+    def _existing_media_file(self, file_path: Path) -> Optional[Path]:
+        # A local file deleted outside the API is still in the manifest - one stat to avoid a 500
+        if not self.media.remote and not file_path.is_file():
+            return None
+        return file_path
+
+    def get_relative_path(self, file_path: Path) -> str:
+        """Path of a file relative to the storage root, with forward slashes"""
+        return file_path.relative_to(self.storage_path).as_posix()
+
+    def get_media_file_path(self, relative_path: str) -> Optional[Path]:
+        """Resolve a storage-relative path to a video file listed in the course manifest"""
+        parts = Path(relative_path).parts
+        if len(parts) < 3 or parts[0] != "courses" or ".." in parts or Path(relative_path).is_absolute():
+            return None
+        file_path = self.storage_path / relative_path
+        if file_path.suffix.lower() not in ALLOWED_VIDEO_EXTENSIONS:
+            return None
+        if self.manifest.lookup(parts[1], Path(*parts[2:]).as_posix()) is None:
+            return None
+        return self._existing_media_file(file_path)
+
+    def get_media_file_size(self, file_path: Path) -> Optional[int]:
+        """Size of a media file from the course manifest (no backend round trip)"""
+        parts = Path(self.get_relative_path(file_path)).parts
+        entry = self.manifest.lookup(parts[1], Path(*parts[2:]).as_posix())
+        return entry["size"] if entry else None
+
+    def get_accel_redirect_uri(self, file_path: Path) -> str:
+        """Internal nginx URI for a file under the storage root (X-Accel-Redirect)"""
+        return VIDEO_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + quote(self.get_relative_path(file_path))
 
     def list_video_files(self, course_id: str, module_id: str, lesson_id: str) -> List[str]:
         """List all video files for a lesson"""
         try:
             video_path = self._get_lesson_files_path(course_id, module_id, lesson_id, "video")
-            if not video_path.exists():
-                return []
-            
-            video_files = []
-            for file_path in video_path.iterdir():
-                if file_path.is_file() and file_path.suffix.lower() in ALLOWED_VIDEO_EXTENSIONS:
-                    video_files.append(file_path.name)
-            
-            return sorted(video_files)
+            return [
+                name for name in self.manifest.list_dir(course_id, self._get_manifest_key(course_id, video_path))
+                if Path(name).suffix.lower() in ALLOWED_VIDEO_EXTENSIONS
+            ]
         except Exception as e:
             logger.error(f"Error listing video files: {e}")
             return []
@@ -191,8 +500,8 @@ class StorageService:
         try:
             video_path = self._get_lesson_files_path(course_id, module_id, lesson_id, "video")
             file_path = video_path / filename
-            if file_path.exists():
-                file_path.unlink()
+            if self.media.delete(self.get_relative_path(file_path)):
+                self.manifest.remove(course_id, self._get_manifest_key(course_id, file_path))
                 return True
             return False
         except Exception as e:
@@ -200,5 +509,213 @@ class StorageService:
             return False
 
 
-storage_service = StorageService()
+class UploadError(ValueError):
+    """Invalid request within a resumable upload session"""
+
+
+class UploadInProgress(UploadError):
+    """Another request is already completing the upload session"""
+
+
+class ResumableUploadService:
+    """Chunked, resumable video uploads.
+
+    Each session lives in uploads/<upload_id>/ with a session.json and one file
+    per received part, so parts can be uploaded in parallel and retried
+    independently. complete() claims the session by renaming its directory,
+    so only one request assembles it, then concatenates the parts into the
+    lesson's files/video/ directory. All methods are blocking - call them from a
+    worker thread in async handlers.
+    """
+
+    def __init__(self, storage: StorageService, part_size: int = RESUMABLE_UPLOAD_PART_SIZE):
+        self.storage = storage
+        self.part_size = part_size
+        self.uploads_path = storage.storage_path / "uploads"
+        self.uploads_path.mkdir(parents=True, exist_ok=True)
+
+    def _get_session_path(self, upload_id: str) -> Optional[Path]:
+        try:
+            upload_id = uuid.UUID(upload_id).hex
+        except ValueError:
+            return None
+        session_path = self.uploads_path / upload_id
+        if not (session_path / "session.json").exists():
+            return None
+        return session_path
+
+    def _read_session(self, session_path: Path) -> Dict[str, Any]:
+        return _read_json(session_path / "session.json")
+
+    def _part_count(self, session: Dict[str, Any]) -> int:
+        return max(1, -(-session["total_size"] // session["part_size"]))
+
+    def _expected_part_size(self, session: Dict[str, Any], index: int) -> int:
+        if index == self._part_count(session) - 1:
+            return session["total_size"] - index * session["part_size"]
+        return session["part_size"]
 
+    def _received_parts(self, session_path: Path) -> List[int]:
+        return sorted(
+            int(part.name[len("part_"):])
+            for part in session_path.iterdir()
+            if part.name.startswith("part_")
+        )
+
+    def create(self, course_id: str, module_id: str, lesson_id: str, filename: str,
+               total_size: int, sha256: Optional[str] = None) -> Dict[str, Any]:
+        """Start an upload session and return its description"""
+        file_ext = Path(filename).suffix.lower()
+        if file_ext not in ALLOWED_VIDEO_EXTENSIONS:
+            raise UploadError(f"Invalid video file extension: {file_ext}")
+        if total_size <= 0 or total_size > MAX_RESUMABLE_VIDEO_SIZE:
+            raise UploadError(f"Video size must be between 1 and {MAX_RESUMABLE_VIDEO_SIZE} bytes")
+
+        self.cleanup_stale()
+
+        upload_id = uuid.uuid4().hex
+        session = {
+            "upload_id": upload_id,
+            "course_id": course_id,
+            "module_id": module_id,
+            "lesson_id": lesson_id,
+            "file_ext": file_ext,
+            "total_size": total_size,
+            "part_size": self.part_size,
+            "sha256": sha256.lower() if sha256 else None,
+            "created_at": time.time(),
+        }
+        session_path = self.uploads_path / upload_id
+        session_path.mkdir(parents=True)
+        with open(session_path / "session.json", "w", encoding="utf-8") as f:
+            json.dump(session, f)
+        return self._describe(session, [])
+
+    def _describe(self, session: Dict[str, Any], received: List[int]) -> Dict[str, Any]:
+        return {
+            "upload_id": session["upload_id"],
+            "total_size": session["total_size"],
+            "part_size": session["part_size"],
+            "part_count": self._part_count(session),
+            "received_offsets": [index * session["part_size"] for index in received],
+            "received_bytes": sum(self._expected_part_size(session, index) for index in received),
+        }
+
+    def status(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        session_path = self._get_session_path(upload_id)
+        if session_path is None:
+            return None
+        return self._describe(self._read_session(session_path), self._received_parts(session_path))
+
+    def write_part(self, upload_id: str, offset: int, data: bytes,
+                   sha256: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Store one part; re-sending a part replaces it"""
+        session_path = self._get_session_path(upload_id)
+        if session_path is None:
+            return None
+        session = self._read_session(session_path)
+
+        if offset < 0 or offset % session["part_size"] != 0 or offset >= session["total_size"]:
+            raise UploadError(f"Offset must be a multiple of {session['part_size']} within the file")
+        index = offset // session["part_size"]
+        expected_size = self._expected_part_size(session, index)
+        if len(data) != expected_size:
+            raise UploadError(f"Part at offset {offset} must be {expected_size} bytes, got {len(data)}")
+        if sha256 and hashlib.sha256(data).hexdigest() != sha256.lower():
+            raise UploadError(f"Checksum mismatch for part at offset {offset}")
+
+        # Write under a unique temp name, then rename, so parallel retries of a part can't interleave
+        with tempfile.NamedTemporaryFile(dir=session_path, prefix=".tmp_", delete=False) as tmp:
+            tmp.write(data)
+        os.replace(tmp.name, session_path / f"part_{index:06d}")
+
+        return self._describe(session, self._received_parts(session_path))
+
+    def complete(self, upload_id: str) -> Optional[str]:
+        """Assemble all parts into the lesson's video directory and return the filename"""
+        session_path = self._get_session_path(upload_id)
+        if session_path is None:
+            return None
+
+        # Claim the session: the rename is atomic, so concurrent completes can't both publish
+        claimed_path = session_path.with_name(f"{session_path.name}.completing")
+        try:
+            session_path.rename(claimed_path)
+        except FileNotFoundError:
+            if claimed_path.exists():
+                raise UploadInProgress("Upload is already being completed")
+            return None
+        # Keep cleanup_stale() off the session while it is assembled
+        os.utime(claimed_path)
+
+        try:
+            filename = self._assemble(claimed_path)
+        except BaseException:
+            # Let the client fix the parts and retry
+            claimed_path.rename(session_path)
+            raise
+        shutil.rmtree(claimed_path, ignore_errors=True)
+        return filename
+
+    def _assemble(self, session_path: Path) -> str:
+        session = self._read_session(session_path)
+
+        missing = set(range(self._part_count(session))) - set(self._received_parts(session_path))
+        if missing:
+            offsets = sorted(index * session["part_size"] for index in missing)
+            raise UploadError(f"Missing parts at offsets: {offsets[:20]}")
+
+        video_path = self.storage._get_lesson_files_path(
+            session["course_id"], session["module_id"], session["lesson_id"], "video"
+        )
+        video_path.mkdir(parents=True, exist_ok=True)
+
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=video_path, prefix=".upload_", suffix=".part", delete=False) as tmp:
+            tmp_path = Path(tmp.name)
+            os.fchmod(tmp.fileno(), PUBLISHED_FILE_MODE)
+        try:
+            with open(tmp_path, "wb") as out:
+                for index in range(self._part_count(session)):
+                    with open(session_path / f"part_{index:06d}", "rb") as part:
+                        while True:
+                            chunk = part.read(UPLOAD_CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            digest.update(chunk)
+                            out.write(chunk)
+            if session["sha256"] and digest.hexdigest() != session["sha256"]:
+                raise UploadError("Checksum mismatch for assembled file")
+
+            filename = self.storage._publish_video_file(
+                session["course_id"], session["module_id"], session["lesson_id"],
+                session["file_ext"], tmp_path, digest.hexdigest()
+            )
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        return filename
+
+    def abort(self, upload_id: str) -> bool:
+        session_path = self._get_session_path(upload_id)
+        if session_path is None:
+            return False
+        shutil.rmtree(session_path, ignore_errors=True)
+        return True
+
+    def cleanup_stale(self, max_age_seconds: int = UPLOAD_SESSION_TTL_SECONDS) -> int:
+        """Remove sessions with no activity for max_age_seconds; returns number removed"""
+        removed = 0
+        cutoff = time.time() - max_age_seconds
+        try:
+            for session_path in self.uploads_path.iterdir():
+                # Directory mtime changes whenever a part is added or replaced
+                if session_path.is_dir() and session_path.stat().st_mtime < cutoff:
+                    shutil.rmtree(session_path, ignore_errors=True)
+                    removed += 1
+        except Exception as e:
+            logger.error(f"Error cleaning up upload sessions: {e}")
+        return removed
+
+
+storage_service = StorageService()
+resumable_upload_service = ResumableUploadService(storage_service)
@@ -0,0 +1,97 @@
+"""Per-user test sessions.
+
+POST /modules/{id}/test/start records one sitting per (user, module, attempt
+number) in test_sessions and returns a signed token holding the user, module,
+attempt number, shuffle seed, start time and deadline. Starting again (e.g. a
+page reload) returns the same sitting, so the timer can't be reset; a sitting
+whose deadline passed without a submission counts as a failed attempt.
+submit_test verifies the token signature and checks timing from its claims
+without looking the sitting up.
+"""
+import calendar
+import hashlib
+import hmac
+import os
+import random
+import secrets
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from jose import JWTError, jwt
+
+from app.auth import SECRET_KEY, ALGORITHM
+
+# Allowance for network latency / client auto-submit after the deadline
+TEST_SUBMIT_GRACE_SECONDS = int(os.getenv("TEST_SUBMIT_GRACE_SECONDS", "60"))
+# Lifetime of a session token when the test has no time limit
+UNTIMED_SESSION_HOURS = 24
+
+TOKEN_TYPE = "test_session"
+# Session tokens are signed with a key derived from SECRET_KEY and carry their own
+# audience, so they can never pass as access tokens (and vice versa)
+SESSION_SECRET_KEY = hmac.new(SECRET_KEY.encode("utf-8"), TOKEN_TYPE.encode("utf-8"), hashlib.sha256).hexdigest()
+SESSION_AUDIENCE = TOKEN_TYPE
+
+
+def new_session_times(time_limit_minutes: Optional[int]) -> Tuple[datetime, Optional[datetime], int]:
+    """started_at, deadline (None if untimed) and shuffle seed of a new sitting"""
+    started_at = datetime.utcfromtimestamp(int(time.time()))
+    deadline = started_at + timedelta(minutes=time_limit_minutes) if time_limit_minutes else None
+    return started_at, deadline, secrets.randbits(31)
+
+
+def session_expired(deadline: Optional[datetime]) -> bool:
+    """Whether a sitting's deadline plus grace has passed (untimed sittings never expire)"""
+    return deadline is not None and datetime.utcnow() > deadline + timedelta(seconds=TEST_SUBMIT_GRACE_SECONDS)
+
+
+def sign_test_session(user_id, module_id: str, attempt_number: int, started_at: datetime,
+                      deadline: Optional[datetime], seed: int) -> str:
+    """Session token for a stored sitting"""
+    started_ts = calendar.timegm(started_at.timetuple())
+    deadline_ts = calendar.timegm(deadline.timetuple()) if deadline else None
+    expires_ts = (deadline_ts or int(time.time()) + UNTIMED_SESSION_HOURS * 3600) + TEST_SUBMIT_GRACE_SECONDS
+    claims = {
+        "typ": TOKEN_TYPE,
+        "aud": SESSION_AUDIENCE,
+        "sub": str(user_id),
+        "mod": module_id,
+        "att": attempt_number,
+        "seed": seed,
+        "st": started_ts,
+        "dl": deadline_ts,
+        "exp": expires_ts,
+    }
+    return jwt.encode(claims, SESSION_SECRET_KEY, algorithm=ALGORITHM)
+
+
+def decode_test_session(token: str, user_id, module_id: str) -> Optional[Dict[str, Any]]:
+    """Verify a session token for this user and module.
+
+    Returns the session (attempt_number, seed, started_at, deadline) or None if the token is
+    invalid, belongs to someone else, or its deadline plus grace has passed.
+    """
+    try:
+        claims = jwt.decode(token, SESSION_SECRET_KEY, algorithms=[ALGORITHM], audience=SESSION_AUDIENCE)
+    except JWTError:
+        return None
+    if claims.get("typ") != TOKEN_TYPE or claims.get("sub") != str(user_id) or claims.get("mod") != module_id:
+        return None
+
+    deadline_ts = claims.get("dl")
+    if deadline_ts and time.time() > deadline_ts + TEST_SUBMIT_GRACE_SECONDS:
+        return None
+    return {
+        "attempt_number": claims.get("att"),
+        "seed": claims["seed"],
+        "started_at": datetime.utcfromtimestamp(claims["st"]),
+        "deadline": datetime.utcfromtimestamp(deadline_ts) if deadline_ts else None,
+    }
+
+
+def shuffle_questions(questions: List[Any], seed: int) -> List[Any]:
+    """Deterministic per-session question order"""
+    shuffled = list(questions)
+    random.Random(seed).shuffle(shuffled)
+    return shuffled
@@ -0,0 +1,255 @@
+"""Bulk user provisioning from CSV or JSONL.
+
+Rows are streamed from the source and processed in batches: each batch is
+validated, checked against existing emails with one query, hashed in
+parallel on the password pool's idle workers (run_background, so logins keep
+priority) and written with a single multi-row INSERT ... ON CONFLICT DO
+NOTHING, then committed. Memory stays bounded by the batch size whatever the
+file size.
+
+POST /admin/users/import runs the import as a background job (ImportJobs,
+see background_jobs) and returns at once, so long imports don't hit proxy timeouts; import_users.py
+runs it from the console with its own pool.
+"""
+import asyncio
+import csv
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth import get_password_hash
+from app.background_jobs import BackgroundJobs, Progress
+from app.database import AsyncSessionLocal
+from app.models import User
+from app.password_pool import PasswordPool, password_pool
+from app.schemas import UserCreate
+from app.storage_service import storage_service
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 1000
+IMPORT_MAX_REPORTED_ERRORS = 1000
+IMPORT_FORMATS = ("csv", "jsonl")
+IMPORT_ROLES = ("student", "creator", "hr")
+
+# (row number, parsed row or None, parse error or None)
+ParsedRow = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+
+def detect_format(filename: Optional[str]) -> Optional[str]:
+    """Import format from a file name, or None if it can't be told"""
+    suffix = os.path.splitext(filename or "")[1].lower()
+    if suffix == ".csv":
+        return "csv"
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    return None
+
+
+def iter_user_rows(stream: TextIO, fmt: str) -> Iterator[ParsedRow]:
+    """Lazily parse a CSV (header: email,password,full_name,role) or JSONL stream"""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {key: value or None for key, value in row.items() if key}, None
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, row, None
+
+
+def _validation_message(error: ValidationError) -> str:
+    first = error.errors()[0]
+    field = ".".join(str(part) for part in first["loc"])
+    return f"{field}: {first['msg']}" if field else first["msg"]
+
+
+class UserImport:
+    def __init__(self, db: AsyncSession, pool: PasswordPool, batch_size: int = IMPORT_BATCH_SIZE,
+                 on_progress: Optional[Callable[[Dict[str, int]], None]] = None):
+        self.db = db
+        self.pool = pool
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+        self.rows = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors: List[Dict[str, Any]] = []
+        self._seen_emails = set()
+
+    def _error(self, row_number: int, email: Optional[str], message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "email": email, "error": message})
+
+    def _validate(self, row_number: int, row: Dict[str, Any]) -> Optional[UserCreate]:
+        try:
+            user = UserCreate.model_validate(row)
+        except ValidationError as e:
+            self._error(row_number, row.get("email"), _validation_message(e))
+            return None
+        user.role = user.role or "student"
+        if user.role not in IMPORT_ROLES:
+            self._error(row_number, user.email, f"role: must be one of {', '.join(IMPORT_ROLES)}")
+            return None
+        if not user.password:
+            self._error(row_number, user.email, "password: must not be empty")
+            return None
+        if user.email in self._seen_emails:
+            self._error(row_number, user.email, "Duplicate email in file")
+            return None
+        self._seen_emails.add(user.email)
+        return user
+
+    def progress(self) -> Dict[str, int]:
+        return {"rows": self.rows, "created": self.created, "failed": self.error_count}
+
+    async def _hash_passwords(self, users: List[UserCreate]) -> List[str]:
+        """Hash with one lane per pool worker, each waiting for an idle worker"""
+        hashes: List[Optional[str]] = [None] * len(users)
+        indexes = iter(range(len(users)))
+
+        async def lane() -> None:
+            for index in indexes:
+                hashes[index] = await self.pool.run_background(get_password_hash, users[index].password)
+
+        await asyncio.gather(*(lane() for _ in range(self.pool.workers)))
+        return hashes
+
+    async def _insert_batch(self, batch: List[Tuple[int, UserCreate]]) -> None:
+        existing = set((await self.db.scalars(
+            select(User.email).filter(User.email.in_([user.email for _, user in batch]))
+        )).all())
+        for row_number, user in batch:
+            if user.email in existing:
+                self._error(row_number, user.email, "Email already registered")
+        batch = [(row_number, user) for row_number, user in batch if user.email not in existing]
+        if not batch:
+            return
+
+        hashes = await self._hash_passwords([user for _, user in batch])
+
+        now = datetime.utcnow()
+        values = [
+            {
+                "id": uuid.uuid4(),
+                "email": user.email,
+                "hashed_password": hashed_password,
+                "full_name": user.full_name,
+                "role": user.role,
+                "is_superuser": False,
+                "is_active": True,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for (_, user), hashed_password in zip(batch, hashes)
+        ]
+        # Emails registered concurrently since the lookup are skipped, not failed
+        inserted = set((await self.db.scalars(
+            insert(User).values(values)
+            .on_conflict_do_nothing(index_elements=[User.email])
+            .returning(User.email)
+        )).all())
+        await self.db.commit()
+
+        self.created += len(inserted)
+        for row_number, user in batch:
+            if user.email not in inserted:
+                self._error(row_number, user.email, "Email already registered")
+
+    async def run(self, rows: Iterable[ParsedRow]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        batch: List[Tuple[int, UserCreate]] = []
+        for row_number, row, parse_error in rows:
+            self.rows += 1
+            if parse_error:
+                self._error(row_number, None, parse_error)
+                continue
+            user = self._validate(row_number, row)
+            if user is None:
+                continue
+            batch.append((row_number, user))
+            if len(batch) >= self.batch_size:
+                await self._insert_batch(batch)
+                batch = []
+                if self.on_progress:
+                    self.on_progress(self.progress())
+        if batch:
+            await self._insert_batch(batch)
+
+        elapsed = time.perf_counter() - started
+        stats = {
+            "rows": self.rows,
+            "created": self.created,
+            "failed": self.error_count,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows / elapsed, 1) if elapsed > 0 else None,
+            "errors": self.errors,
+            "errors_truncated": self.error_count > len(self.errors),
+        }
+        logger.info(
+            f"Imported users: {self.created}/{self.rows} created, {self.error_count} failed, "
+            f"{stats['rows_per_second']} rows/s"
+        )
+        return stats
+
+
+async def import_users(
+    db: AsyncSession,
+    rows: Iterable[ParsedRow],
+    batch_size: int = IMPORT_BATCH_SIZE,
+    pool: PasswordPool = password_pool,
+    on_progress: Optional[Callable[[Dict[str, int]], None]] = None
+) -> Dict[str, Any]:
+    """Create users from parsed rows; returns counts, throughput and per-row errors"""
+    return await UserImport(db, pool, batch_size, on_progress).run(rows)
+
+
+class ImportJobs(BackgroundJobs):
+    """User imports as background jobs; the uploaded file is kept next to the job status"""
+
+    label = "User import"
+
+    def _source_path(self, job: Dict[str, Any]) -> Path:
+        return self.job_path(job["job_id"], f".{job['format']}")
+
+    def create(self, source: BinaryIO, fmt: str) -> Dict[str, Any]:
+        """Store the uploaded file for a new job. Blocking - call from a worker thread."""
+        job = self._new_job(format=fmt, progress={"rows": 0, "created": 0, "failed": 0})
+        with open(self._source_path(job), "wb") as f:
+            shutil.copyfileobj(source, f)
+        return job
+
+    async def _work(self, job: Dict[str, Any], progress: Progress) -> Dict[str, Any]:
+        with open(self._source_path(job), encoding="utf-8-sig", errors="replace", newline="") as stream:
+            async with AsyncSessionLocal() as db:
+                result = await import_users(db, iter_user_rows(stream, job["format"]), on_progress=progress)
+        progress({"rows": result["rows"], "created": result["created"], "failed": result["failed"]})
+        return result
+
+    def _finished(self, job: Dict[str, Any]) -> None:
+        self._source_path(job).unlink(missing_ok=True)
+
+
+import_jobs = ImportJobs(storage_service.storage_path / "jobs" / "imports")
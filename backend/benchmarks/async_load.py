@@ -0,0 +1,73 @@
+"""
+Concurrent read load against DB-backed endpoints.
+
+Many students hit /progress (several queries per request), /auth/me and
+/courses at the same time for a fixed duration; throughput and latency
+percentiles show whether DB round-trips block the event loop. Run it
+against a build before and after a change with the same settings and
+compare the numbers (one uvicorn worker makes the difference clearest).
+
+Usage: python benchmarks/async_load.py [--users 50] [--concurrency 200] [--duration 30]
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.append(str(Path(__file__).parent))
+
+from common import auth, base_parser, create_students, latency_summary, login_students, make_client, status_summary
+
+ENDPOINTS = ["/progress", "/auth/me", "/courses"]
+
+
+async def worker(client, tokens: List[str], worker_index: int, deadline: float,
+                 latencies: Dict[str, List[float]], codes: List[int]) -> None:
+    request_index = worker_index
+    while time.perf_counter() < deadline:
+        endpoint = ENDPOINTS[request_index % len(ENDPOINTS)]
+        token = tokens[request_index % len(tokens)]
+        request_index += 1
+        started = time.perf_counter()
+        try:
+            response = await client.get(endpoint, headers=auth(token))
+            codes.append(response.status_code)
+        except Exception:
+            codes.append(0)
+            continue
+        latencies[endpoint].append(time.perf_counter() - started)
+
+
+async def run(args) -> None:
+    async with make_client(args.base_url, connections=args.concurrency) as client:
+        tokens = await login_students(client, await create_students(client, args.users, "load"))
+        print(f"{args.users} students, {args.concurrency} concurrent requests, {args.duration}s")
+
+        latencies: Dict[str, List[float]] = {endpoint: [] for endpoint in ENDPOINTS}
+        codes: List[int] = []
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            worker(client, tokens, index, deadline, latencies, codes) for index in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"{args.label}: {total / elapsed:.1f} requests/s ({status_summary(codes)}; 0 = connection error)")
+    for endpoint, values in latencies.items():
+        print(f"  {endpoint}: {latency_summary(values)}")
+    print(f"  all: {latency_summary([value for values in latencies.values() for value in values])}")
+
+
+def main():
+    parser = base_parser("Concurrent read load against DB-backed endpoints")
+    parser.add_argument("--users", type=int, default=50, help="Students to log in and spread requests over")
+    parser.add_argument("--concurrency", type=int, default=200, help="Requests in flight at any time")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+    parser.add_argument("--label", default="result", help="Name printed with the results, e.g. before / after")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Concurrency stress test for test attempt numbering and max_attempts.
+
+A fresh student fires hundreds of parallel requests at one module's test:
+- parallel /test/start calls must all return the same sitting;
+- parallel submits of that sitting with distinct Idempotency-Keys must
+  record exactly one attempt (the others get 409);
+- replays of the winning key must all return that same attempt;
+- once max_attempts attempts exist, start and submit answer 403.
+Any 5xx (e.g. a unique violation leaking out) fails the run.
+
+Usage: python benchmarks/attempt_race.py --module Company_Module_01 [--parallel 300] [--check-db]
+"""
+import asyncio
+import sys
+import uuid
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from common import auth, base_parser, bench_email, latency_summary, login, make_client, register, status_summary, Timer
+
+
+async def post(client, url: str, token: str, json=None, key: Optional[str] = None) -> Tuple[int, dict, float]:
+    headers = auth(token)
+    if key:
+        headers["Idempotency-Key"] = key
+    with Timer() as timer:
+        response = await client.post(url, json=json, headers=headers)
+    body = response.json() if response.headers.get("content-type", "").startswith("application/json") else {}
+    return response.status_code, body, timer.elapsed
+
+
+async def storm(client, url: str, token: str, count: int, json=None, keys: Optional[List[str]] = None):
+    return await asyncio.gather(*(
+        post(client, url, token, json, keys[i] if keys else None) for i in range(count)
+    ))
+
+
+def check(ok: bool, message: str, failures: List[str]) -> None:
+    print(("  ok   " if ok else "  FAIL ") + message)
+    if not ok:
+        failures.append(message)
+
+
+def attempt_numbers_in_db(email: str, module_id: str) -> List[int]:
+    from sqlalchemy import select
+    from app.database import SessionLocal
+    from app.models import TestAttempt, User
+
+    with SessionLocal() as db:
+        return list(db.scalars(
+            select(TestAttempt.attempt_number)
+            .join(User, User.id == TestAttempt.user_id)
+            .filter(User.email == email, TestAttempt.module_id == module_id)
+            .order_by(TestAttempt.attempt_number)
+        ))
+
+
+async def run(args) -> List[str]:
+    failures: List[str] = []
+    start_url = f"/modules/{args.module}/test/start"
+    submit_url = f"/modules/{args.module}/test/submit"
+
+    async with make_client(args.base_url, connections=args.parallel) as client:
+        email = bench_email("attempt-race")
+        await register(client, email)
+        token = await login(client, email)
+        print(f"student {email}, {args.parallel} parallel requests per phase")
+
+        recorded = set()
+        round_number = 0
+        while True:
+            round_number += 1
+            print(f"round {round_number}")
+
+            starts = await storm(client, start_url, token, args.parallel)
+            codes = [code for code, _, _ in starts]
+            print(f"  start: {status_summary(codes)}; {latency_summary([t for _, _, t in starts])}")
+            check(all(code < 500 for code in codes), "no 5xx on start", failures)
+            if all(code == 403 for code in codes):
+                break
+            sittings = {(body.get("started_at"), body.get("deadline")) for code, body, _ in starts if code == 200}
+            check(codes.count(200) == len(codes) and len(sittings) == 1,
+                  "every start returned the same sitting", failures)
+            session = next(body for code, body, _ in starts if code == 200)
+            max_attempts = session["settings"].get("max_attempts")
+            submission = {"answers": [], "session_token": session["session_token"]}
+
+            keys = [str(uuid.uuid4()) for _ in range(args.parallel)]
+            submits = await storm(client, submit_url, token, args.parallel, submission, keys)
+            codes = [code for code, _, _ in submits]
+            print(f"  submit: {status_summary(codes)}; {latency_summary([t for _, _, t in submits])}")
+            check(all(code < 500 for code in codes), "no 5xx on submit", failures)
+            winners = [(key, body) for key, (code, body, _) in zip(keys, submits) if code == 200]
+            check(len(winners) == 1, f"exactly one submit recorded an attempt (got {len(winners)})", failures)
+            if not winners:
+                break
+            winner_key, winner = winners[0]
+            recorded.add(winner["attempt_id"])
+
+            replays = await storm(client, submit_url, token, args.parallel, submission, [winner_key] * args.parallel)
+            replayed = {body.get("attempt_id") for code, body, _ in replays if code == 200}
+            print(f"  replay: {status_summary([code for code, _, _ in replays])}")
+            check(replayed == {winner["attempt_id"]}, "replays of the winning key returned the same attempt", failures)
+
+            if round_number > (max_attempts or args.rounds):
+                check(False, "max_attempts was not enforced", failures)
+                break
+            if not max_attempts and round_number >= args.rounds:
+                break
+
+        print(f"attempts recorded: {len(recorded)} (max_attempts {max_attempts})")
+        if max_attempts:
+            check(len(recorded) == max_attempts, "attempts recorded equal max_attempts", failures)
+            submits = await storm(client, submit_url, token, args.parallel // 10 or 1,
+                                  {"answers": [], "session_token": session["session_token"]})
+            check(all(code in (403, 409) for code, _, _ in submits), "submits after the limit are refused", failures)
+
+    if args.check_db:
+        numbers = attempt_numbers_in_db(email, args.module)
+        print(f"attempt numbers in the database: {numbers}")
+        check(numbers == list(range(1, len(numbers) + 1)), "attempt numbers are 1..N without gaps or duplicates", failures)
+    return failures
+
+
+def main():
+    parser = base_parser("Fire parallel test starts and submits for one student")
+    parser.add_argument("--module", default="Company_Module_01")
+    parser.add_argument("--parallel", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=3, help="Rounds to run when the test has no max_attempts")
+    parser.add_argument("--check-db", action="store_true", help="Also read attempt numbers from DATABASE_URL")
+    args = parser.parse_args()
+
+    failures = asyncio.run(run(args))
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    main()
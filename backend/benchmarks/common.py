@@ -0,0 +1,113 @@
+"""Helpers shared by the benchmark and stress scripts in this directory.
+
+The scripts drive a running backend over HTTP with httpx (a dev-only
+dependency: pip install httpx) and print a plain-text summary.
+"""
+import argparse
+import asyncio
+import math
+import os
+import time
+import uuid
+from typing import Dict, List, Sequence
+
+import httpx
+
+DEFAULT_BASE_URL = os.getenv("BENCH_BASE_URL", "http://localhost:8000/api/v1")
+# Default admin created by init_db.py
+DEFAULT_ADMIN_EMAIL = os.getenv("BENCH_ADMIN_EMAIL", "admin@example.com")
+DEFAULT_ADMIN_PASSWORD = os.getenv("BENCH_ADMIN_PASSWORD", "admin123")
+BENCH_PASSWORD = "bench-password"
+
+
+def base_parser(description: str) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL, help="API root, e.g. http://localhost:8000/api/v1")
+    parser.add_argument("--admin-email", default=DEFAULT_ADMIN_EMAIL)
+    parser.add_argument("--admin-password", default=DEFAULT_ADMIN_PASSWORD)
+    return parser
+
+
+def make_client(base_url: str, connections: int = 100, timeout: float = 60.0) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    return httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout)
+
+
+def bench_email(prefix: str) -> str:
+    return f"{prefix}-{uuid.uuid4().hex[:12]}@bench.example.com"
+
+
+async def register(client: httpx.AsyncClient, email: str, password: str = BENCH_PASSWORD) -> None:
+    """Register a student; an already registered email is fine"""
+    response = await client.post("/auth/register", json={"email": email, "password": password})
+    if response.status_code not in (200, 400):
+        response.raise_for_status()
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str = BENCH_PASSWORD) -> str:
+    response = await client.post("/auth/login", json={"email": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def create_students(client: httpx.AsyncClient, count: int, prefix: str, parallel: int = 4) -> List[str]:
+    """Register count students a few at a time (password hashing is bounded
+    server-side) and return their emails"""
+    emails = [bench_email(prefix) for _ in range(count)]
+    semaphore = asyncio.Semaphore(parallel)
+
+    async def create(email: str) -> None:
+        async with semaphore:
+            await register(client, email)
+
+    await asyncio.gather(*(create(email) for email in emails))
+    return emails
+
+
+async def login_students(client: httpx.AsyncClient, emails: List[str], parallel: int = 4) -> List[str]:
+    semaphore = asyncio.Semaphore(parallel)
+
+    async def token(email: str) -> str:
+        async with semaphore:
+            return await login(client, email)
+
+    return list(await asyncio.gather(*(token(email) for email in emails)))
+
+
+def auth(token: str) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending sequence"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(q / 100 * len(sorted_values)) - 1
+    return sorted_values[max(0, min(len(sorted_values) - 1, rank))]
+
+
+def latency_summary(seconds: List[float]) -> str:
+    values = sorted(seconds)
+    if not values:
+        return "n=0"
+    ms = [value * 1000 for value in values]
+    return (
+        f"n={len(ms)} mean={sum(ms) / len(ms):.1f}ms p50={percentile(ms, 50):.1f}ms "
+        f"p95={percentile(ms, 95):.1f}ms p99={percentile(ms, 99):.1f}ms max={ms[-1]:.1f}ms"
+    )
+
+
+def status_summary(codes: List[int]) -> str:
+    counts: Dict[int, int] = {}
+    for code in codes:
+        counts[code] = counts.get(code, 0) + 1
+    return ", ".join(f"{code}: {count}" for code, count in sorted(counts.items()))
+
+
+class Timer:
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
@@ -0,0 +1,174 @@
+"""
+Query plans of the progress / attempt lookups on a large seeded table.
+
+Seeds DATABASE_URL with synthetic students (explain-N@bench.example.com)
+until user_progress holds --rows rows for them, plus two test attempts per
+student and module, then runs EXPLAIN ANALYZE on the queries behind lesson
+views, completion, /progress and submit_test. Fails if any of them scans
+user_progress or test_attempts sequentially instead of using the indexes
+from alembic revision 0001. Needs lessons in the database (init_db.py).
+
+Usage: python benchmarks/explain_indexes.py [--rows 1000000] [--cleanup]
+"""
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Tuple
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+
+from app.database import engine
+
+EMAIL_PATTERN = "explain-%@bench.example.com"
+LARGE_TABLES = {"user_progress", "test_attempts"}
+
+SEED_USERS = text("""
+    INSERT INTO users (id, email, hashed_password, role, is_active, is_superuser, created_at, updated_at)
+    SELECT gen_random_uuid(), 'explain-' || n || '@bench.example.com', '-', 'student', true, false, now(), now()
+    FROM generate_series(1, :users) AS n
+    ON CONFLICT (email) DO NOTHING
+""")
+SEED_PROGRESS = text("""
+    INSERT INTO user_progress (id, user_id, module_id, lesson_id, lesson_number,
+                               is_completed, completed_at, created_at, updated_at)
+    SELECT gen_random_uuid(), u.id, l.module_id, l.id, l.lesson_number,
+           random() < 0.7, now(), now(), now()
+    FROM (SELECT id FROM users WHERE email LIKE :pattern) AS u
+    CROSS JOIN lessons AS l
+    ON CONFLICT (user_id, lesson_id) DO NOTHING
+""")
+SEED_ATTEMPTS = text("""
+    INSERT INTO test_attempts (id, user_id, module_id, attempt_number, score, max_score,
+                               percentage, passed, answers, started_at, submitted_at)
+    SELECT gen_random_uuid(), u.id, m.id, a.n, 5, 10, 50, a.n = 2, '[]'::json, now(), now()
+    FROM (SELECT id FROM users WHERE email LIKE :pattern) AS u
+    CROSS JOIN modules AS m
+    CROSS JOIN generate_series(1, 2) AS a(n)
+    ON CONFLICT DO NOTHING
+""")
+
+# (description, statement) - each mirrors a query issued by the API
+QUERIES: List[Tuple[str, str]] = [
+    ("/progress: lesson rows of a user (progress.py)", """
+        SELECT module_id, lesson_id, is_completed, completed_at FROM user_progress
+        WHERE user_id = :user_id AND module_id = ANY(:module_ids) AND lesson_id IS NOT NULL
+    """),
+    ("/progress: attempt counts of a user (progress.py)", """
+        SELECT module_id, count(id), count(id) FILTER (WHERE passed = true) FROM test_attempts
+        WHERE user_id = :user_id AND module_id = ANY(:module_ids)
+        GROUP BY module_id
+    """),
+    ("lesson view / complete: progress row of a lesson (lessons.py upsert target)", """
+        SELECT id, is_completed FROM user_progress WHERE user_id = :user_id AND lesson_id = :lesson_id
+    """),
+    ("complete_lesson upsert (lessons.py)", """
+        INSERT INTO user_progress (id, user_id, module_id, lesson_id, lesson_number, is_completed, completed_at)
+        VALUES (gen_random_uuid(), :user_id, :module_id, :lesson_id, :lesson_number, true, now())
+        ON CONFLICT (user_id, lesson_id) DO UPDATE
+        SET is_completed = true, completed_at = now(), updated_at = now()
+        WHERE user_progress.is_completed IS NOT TRUE
+        RETURNING id
+    """),
+    ("submit_test: attempt count (tests.py)", """
+        SELECT count(*) FROM test_attempts WHERE user_id = :user_id AND module_id = :module_id
+    """),
+]
+
+
+def plan_nodes(node: Dict[str, Any], depth: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    yield depth, node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child, depth + 1)
+
+
+def describe(node: Dict[str, Any]) -> str:
+    parts = [node["Node Type"]]
+    if node.get("Relation Name"):
+        parts.append(f"on {node['Relation Name']}")
+    if node.get("Index Name"):
+        parts.append(f"using {node['Index Name']}")
+    if node.get("Conflict Arbiter Indexes"):
+        parts.append(f"arbiter {', '.join(node['Conflict Arbiter Indexes'])}")
+    if "Actual Total Time" in node:
+        parts.append(f"({node['Actual Total Time']:.3f} ms, {node['Actual Rows']} rows)")
+    return " ".join(parts)
+
+
+def seed(conn, rows: int) -> None:
+    lessons = conn.scalar(text("SELECT count(*) FROM lessons"))
+    if not lessons:
+        sys.exit("no lessons in the database - run init_db.py first")
+    users = math.ceil(rows / lessons)
+    started = time.perf_counter()
+    conn.execute(SEED_USERS, {"users": users})
+    conn.execute(SEED_PROGRESS, {"pattern": EMAIL_PATTERN})
+    conn.execute(SEED_ATTEMPTS, {"pattern": EMAIL_PATTERN})
+    conn.execute(text("ANALYZE users"))
+    conn.execute(text("ANALYZE user_progress"))
+    conn.execute(text("ANALYZE test_attempts"))
+    print(f"seeded {users} students in {time.perf_counter() - started:.1f}s")
+
+
+def cleanup(conn) -> None:
+    bench_users = "SELECT id FROM users WHERE email LIKE :pattern"
+    for table in ("user_progress", "test_attempts", "test_sessions", "module_user_stats"):
+        conn.execute(text(f"DELETE FROM {table} WHERE user_id IN ({bench_users})"), {"pattern": EMAIL_PATTERN})
+    conn.execute(text("DELETE FROM users WHERE email LIKE :pattern"), {"pattern": EMAIL_PATTERN})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN progress and attempt lookups on a seeded table")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="user_progress rows to seed")
+    parser.add_argument("--cleanup", action="store_true", help="Delete the seeded students and their rows, then exit")
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        if args.cleanup:
+            cleanup(conn)
+            print("seeded students removed")
+            return
+
+        for table in sorted(LARGE_TABLES):
+            print(f"{table}: {conn.scalar(text(f'SELECT count(*) FROM {table}'))} rows before seeding")
+        seed(conn, args.rows)
+        for table in sorted(LARGE_TABLES):
+            print(f"{table}: {conn.scalar(text(f'SELECT count(*) FROM {table}'))} rows")
+
+    failures = []
+    with engine.connect() as conn:
+        sample = conn.execute(text("""
+            SELECT p.user_id, p.module_id, p.lesson_id, p.lesson_number FROM user_progress p
+            JOIN users u ON u.id = p.user_id WHERE u.email LIKE :pattern LIMIT 1
+        """), {"pattern": EMAIL_PATTERN}).one()
+        params = {
+            "user_id": str(sample.user_id),
+            "module_id": sample.module_id,
+            "module_ids": list(conn.scalars(text("SELECT id FROM modules"))),
+            "lesson_id": sample.lesson_id,
+            "lesson_number": sample.lesson_number,
+        }
+        for description, sql in QUERIES:
+            plan = conn.scalar(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"), params)[0]
+            # ANALYZE executes the statement - don't keep the upsert
+            conn.rollback()
+
+            print(f"\n{description}: {plan['Execution Time']:.3f} ms")
+            for depth, node in plan_nodes(plan["Plan"]):
+                print("  " * (depth + 1) + describe(node))
+                if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in LARGE_TABLES:
+                    failures.append(f"{description}: sequential scan on {node['Relation Name']}")
+
+    print()
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("all lookups use indexes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Latency of unrelated requests during a login storm.
+
+Registers --users students, measures a probe endpoint on its own, then
+fires all their logins at once while the probe keeps running. Password
+hashing runs in a bounded pool, so the probe's p99 should stay close to
+its baseline; logins beyond the pool's queue get 503 with Retry-After
+instead of piling up. Prints the password pool stats at the end.
+
+Usage: python benchmarks/login_storm.py [--users 300] [--probe /courses]
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Any, List, Tuple
+
+sys.path.append(str(Path(__file__).parent))
+
+from common import (
+    BENCH_PASSWORD,
+    auth,
+    base_parser,
+    create_students,
+    latency_summary,
+    login,
+    make_client,
+    status_summary,
+)
+
+
+async def probe(client, url: str, token: str, interval: float, stop: asyncio.Event, latencies: List[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get(url, headers=auth(token))
+        if response.status_code == 200:
+            latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+
+async def probe_for(client, args, token: str, coroutine) -> Tuple[List[float], Any]:
+    """Probe latencies while coroutine runs"""
+    latencies: List[float] = []
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(client, args.probe, token, args.interval, stop, latencies))
+    result = await coroutine
+    stop.set()
+    await prober
+    return latencies, result
+
+
+async def storm_login(client, email: str):
+    started = time.perf_counter()
+    response = await client.post("/auth/login", json={"email": email, "password": BENCH_PASSWORD})
+    return response.status_code, time.perf_counter() - started
+
+
+async def run(args) -> None:
+    async with make_client(args.base_url, connections=args.users + 10) as client:
+        print(f"registering {args.users} students")
+        emails = await create_students(client, args.users, "login-storm")
+        token = await login(client, emails[0])
+        admin_token = await login(client, args.admin_email, args.admin_password)
+
+        baseline, _ = await probe_for(client, args, token, asyncio.sleep(args.baseline))
+        print(f"{args.probe} alone: {latency_summary(baseline)}")
+
+        during, results = await probe_for(client, args, token, asyncio.gather(
+            *(storm_login(client, email) for email in emails)
+        ))
+        print(f"{args.probe} during {args.users} logins: {latency_summary(during)}")
+        print(f"logins: {status_summary([code for code, _ in results])}; "
+              f"{latency_summary([elapsed for code, elapsed in results if code == 200])}")
+
+        response = await client.get("/admin/auth/password-pool", headers=auth(admin_token))
+        if response.status_code == 200:
+            print(f"password pool: {response.json()}")
+
+
+def main():
+    parser = base_parser("Probe latency during a login storm")
+    parser.add_argument("--users", type=int, default=300, help="Simultaneous logins")
+    parser.add_argument("--probe", default="/courses", help="Endpoint measured during the storm")
+    parser.add_argument("--interval", type=float, default=0.02, help="Seconds between probe requests")
+    parser.add_argument("--baseline", type=float, default=5, help="Seconds to probe before the storm")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
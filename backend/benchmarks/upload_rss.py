@@ -0,0 +1,134 @@
+"""
+Server memory during parallel video uploads.
+
+Several admins upload a large video at once, then one upload larger than
+MAX_VIDEO_SIZE_MB is sent; the server's resident memory (VmRSS of --pid,
+read from /proc) is sampled throughout. With streamed uploads the peak
+stays flat instead of growing by the upload size per request, and the
+oversized upload is refused with 413. Request bodies are generated on the
+fly, so the client does not hold them in memory either.
+
+Each accepted upload adds a video to the lesson; remove them afterwards.
+
+Usage: python benchmarks/upload_rss.py --pid <uvicorn worker pid> [--uploads 5] [--size-mb 90] [--oversize-mb 150]
+"""
+import asyncio
+import io
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.append(str(Path(__file__).parent))
+
+from common import auth, base_parser, latency_summary, login, make_client, status_summary
+
+MB = 1024 * 1024
+
+
+class GeneratedFile(io.RawIOBase):
+    """Seekable file of `size` filler bytes that never holds more than one read in memory"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.position, io.SEEK_END: self.size}[whence]
+        self.position = max(0, base + offset)
+        return self.position
+
+    def read(self, size: int = -1) -> bytes:
+        remaining = self.size - self.position
+        count = remaining if size is None or size < 0 else min(size, remaining)
+        self.position += count
+        return b"\0" * count
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+async def sample_rss(pid: int, samples: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        value = rss_mb(pid)
+        if value is not None:
+            samples.append(value)
+        await asyncio.sleep(0.1)
+
+
+async def upload(client, url: str, token: str, size: int):
+    started = time.perf_counter()
+    response = await client.post(
+        url, headers=auth(token), files={"file": ("bench.mp4", GeneratedFile(size), "video/mp4")}
+    )
+    return response.status_code, time.perf_counter() - started
+
+
+async def measured(pid: int, label: str, coroutines):
+    samples: List[float] = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(pid, samples, stop))
+    results = await asyncio.gather(*coroutines)
+    stop.set()
+    await sampler
+    codes = [code for code, _ in results]
+    print(f"{label}: {status_summary(codes)}; {latency_summary([elapsed for _, elapsed in results])}")
+    if samples:
+        print(f"  server RSS: start {samples[0]:.1f} MB, peak {max(samples):.1f} MB, end {samples[-1]:.1f} MB")
+    return codes
+
+
+async def run(args) -> int:
+    if rss_mb(args.pid) is None:
+        print(f"cannot read /proc/{args.pid}/status - pass the pid of the uvicorn worker on this host")
+        return 1
+    url = f"/admin/modules/{args.module}/lessons/{args.lesson}/video"
+    failed = False
+    async with make_client(args.base_url, connections=args.uploads + 1, timeout=600) as client:
+        token = await login(client, args.admin_email, args.admin_password)
+        print(f"server RSS before: {rss_mb(args.pid):.1f} MB")
+
+        codes = await measured(args.pid, f"{args.uploads} parallel uploads of {args.size_mb} MB", (
+            upload(client, url, token, args.size_mb * MB) for _ in range(args.uploads)
+        ))
+        failed |= any(code != 200 for code in codes)
+
+        codes = await measured(args.pid, f"one upload of {args.oversize_mb} MB", [
+            upload(client, url, token, args.oversize_mb * MB)
+        ])
+        if codes != [413]:
+            print("  expected 413 for the oversized upload")
+            failed = True
+    return int(failed)
+
+
+def main():
+    parser = base_parser("Measure server memory during parallel video uploads")
+    parser.add_argument("--pid", type=int, required=True, help="Process id of the backend worker")
+    parser.add_argument("--module", default="Company_Module_01")
+    parser.add_argument("--lesson", type=int, default=1, help="Lesson number")
+    parser.add_argument("--uploads", type=int, default=5)
+    parser.add_argument("--size-mb", type=int, default=90, help="Size of each upload, below MAX_VIDEO_SIZE_MB")
+    parser.add_argument("--oversize-mb", type=int, default=150, help="Size of the upload that must be refused")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
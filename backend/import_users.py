@@ -0,0 +1,52 @@
+"""
+Script to bulk-create users from a CSV (email,password,full_name,role) or JSONL file
+Usage: python import_users.py users.csv [--format csv|jsonl] [--batch-size N] [--workers N]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+from app.database import AsyncSessionLocal, async_engine
+from app.password_pool import PasswordPool
+from app.user_import import IMPORT_BATCH_SIZE, IMPORT_FORMATS, detect_format, import_users, iter_user_rows
+
+
+async def run_import(path: str, fmt: str, batch_size: int, workers: int):
+    # The console has no logins to protect - hash on every core
+    pool = PasswordPool(workers=workers, queue_size=0)
+    try:
+        with open(path, encoding="utf-8-sig", newline="") as stream:
+            async with AsyncSessionLocal() as db:
+                return await import_users(db, iter_user_rows(stream, fmt), batch_size, pool)
+    finally:
+        pool.shutdown()
+        await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-create users from CSV or JSONL")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=IMPORT_FORMATS)
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Password hashing threads")
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    if not fmt:
+        parser.error("cannot tell the format from the file name, pass --format")
+
+    stats = asyncio.run(run_import(args.path, fmt, args.batch_size, args.workers))
+    for error in stats["errors"]:
+        print(f"row {error['row']}: {error['email'] or '-'}: {error['error']}")
+    if stats["errors_truncated"]:
+        print(f"... {stats['failed'] - len(stats['errors'])} more errors")
+    summary = {key: value for key, value in stats.items() if key not in ("errors", "errors_truncated")}
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,12 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
 
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from app.database import SessionLocal, engine
 from app.models import Base, User, Course, Module, Lesson
 from app.auth import get_password_hash
+from app.catalogue_snapshot import CATALOGUE_CHANNEL
 import uuid
 
 def init_db():
@@ -123,6 +125,8 @@ def init_db():
                     db.add(lesson)
                     print(f"  Created lesson: {lesson.title}")
         
+        # Running API workers reload their catalogue snapshot on commit
+        db.execute(select(func.pg_notify(CATALOGUE_CHANNEL, "")))
         db.commit()
         print("\nDatabase initialized successfully!")
         
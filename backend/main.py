@@ -1,11 +1,21 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+import asyncio
 import logging
 import os
 
-from app.database import engine, Base
-from app.routers import auth, courses, modules, lessons, tests, progress, admin
+from app.database import engine, async_engine, Base
+from app.routers import auth, courses, modules, lessons, tests, progress, admin, analytics
+from app.progress_events import lesson_view_buffer
+from app.rollups import rollup_aggregator
+from app.catalogue_snapshot import catalogue
+from app.auth import PRINCIPAL_CHANNEL, principal_cache
+from app.password_pool import password_pool
+from app.user_import import import_jobs
+from app.grading import rescore_jobs
+from app.compression import CompressionMiddleware
+from app.storage_service import storage_service
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,8 +32,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# gzip/brotli for JSON and text responses above COMPRESSION_MIN_SIZE
+app.add_middleware(CompressionMiddleware)
+
 # Create tables
 Base.metadata.create_all(bind=engine)
 
@@ -35,6 +49,32 @@ app.include_router(lessons.router, prefix="/api/v1", tags=["lessons"])
 app.include_router(tests.router, prefix="/api/v1", tags=["tests"])
 app.include_router(progress.router, prefix="/api/v1", tags=["progress"])
 app.include_router(admin.router, prefix="/api/v1", tags=["admin"])
+app.include_router(analytics.router, prefix="/api/v1", tags=["analytics"])
+
+
+@app.on_event("startup")
+async def startup():
+    lesson_view_buffer.start()
+    rollup_aggregator.start()
+    # Loads the catalogue snapshot and keeps it in sync via LISTEN/NOTIFY;
+    # the same connection delivers principal cache invalidations from other workers
+    catalogue.subscribe(PRINCIPAL_CHANNEL, principal_cache.invalidate, principal_cache.clear)
+    catalogue.start()
+    # Build missing content manifests in a worker thread instead of in the first requests
+    app.state.manifest_scan = asyncio.get_running_loop().run_in_executor(
+        None, storage_service.manifest.scan_missing
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await lesson_view_buffer.stop()
+    await rollup_aggregator.stop()
+    await catalogue.stop()
+    await import_jobs.stop()
+    await rescore_jobs.stop()
+    password_pool.shutdown()
+    await async_engine.dispose()
 
 
 @app.get("/")
@@ -0,0 +1,21 @@
+"""
+Script to rebuild content manifests after editing storage outside the API
+Usage: python rebuild_manifest.py [course_id ...]
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+from app.storage_service import storage_service
+
+
+def rebuild_manifests(course_ids):
+    course_ids = course_ids or storage_service.manifest.course_ids()
+    for course_id in course_ids:
+        count = storage_service.manifest.rebuild(course_id)
+        print(f"{course_id}: {count} files")
+    print(f"Rebuilt {len(course_ids)} manifest(s)")
+
+
+if __name__ == "__main__":
+    rebuild_manifests(sys.argv[1:])
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+# Unit tests never touch the real storage directory
+os.environ.setdefault("STORAGE_PATH", tempfile.mkdtemp(prefix="lms-test-storage-"))
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app import auth
+from app.models import User
+from app.password_pool import PasswordPool
+from app.routers.auth import register
+from app.schemas import UserCreate
+
+
+@pytest.fixture
+def blocked_pool(monkeypatch):
+    """One-worker password pool whose calls wait until `release` is set"""
+    pool = PasswordPool(workers=1, queue_size=8)
+    release = threading.Event()
+
+    def verify_password(plain, hashed):
+        release.wait()
+        return plain == hashed
+
+    def get_password_hash(password):
+        release.wait()
+        return password
+
+    monkeypatch.setattr(auth, "password_pool", pool)
+    monkeypatch.setattr(auth, "verify_password", verify_password)
+    monkeypatch.setattr(auth, "get_password_hash", get_password_hash)
+    yield pool, release
+    release.set()
+    pool.shutdown()
+
+
+USERS_DDL = """
+    CREATE TABLE users (
+        id CHAR(32) PRIMARY KEY, email VARCHAR UNIQUE NOT NULL, hashed_password VARCHAR NOT NULL,
+        full_name VARCHAR, role VARCHAR, is_superuser BOOLEAN, is_active BOOLEAN,
+        created_at DATETIME, updated_at DATETIME
+    )
+"""
+
+
+async def make_database(path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{path}", poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0, pool_timeout=1
+    )
+    async with engine.begin() as conn:
+        # models use the PostgreSQL UUID type, which SQLite can't render in DDL
+        await conn.execute(text(USERS_DDL))
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with sessions() as db:
+        db.add(User(email="known@example.com", hashed_password="secret"))
+        await db.commit()
+    return engine, sessions
+
+
+async def wait_for(condition) -> None:
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+async def login(sessions, email: str, password: str):
+    async with sessions() as db:
+        return await auth.authenticate_user(db, email, password)
+
+
+def test_queued_logins_hold_no_db_connections(blocked_pool, tmp_path):
+    pool, release = blocked_pool
+
+    async def scenario():
+        engine, sessions = await make_database(tmp_path / "users.db")
+        try:
+            logins = [asyncio.create_task(login(sessions, "known@example.com", "secret")) for _ in range(5)]
+            await wait_for(lambda: pool.in_flight == 5)
+            checked_out = engine.pool.checkedout()
+            release.set()
+            return checked_out, await asyncio.gather(*logins)
+        finally:
+            release.set()
+            await asyncio.gather(*logins, return_exceptions=True)
+            await engine.dispose()
+
+    checked_out, users = asyncio.run(scenario())
+    # The pool has a single connection: without releasing it, only one login could get this far
+    assert checked_out == 0
+    assert all(user is not None and user.is_active for user in users)
+
+
+def test_queued_registration_holds_no_db_connection(blocked_pool, tmp_path):
+    pool, release = blocked_pool
+
+    async def scenario():
+        engine, sessions = await make_database(tmp_path / "users.db")
+        try:
+            async with sessions() as db:
+                registration = asyncio.create_task(register(UserCreate(email="new@example.com", password="pw"), db))
+                await wait_for(lambda: pool.in_flight == 1)
+                checked_out = engine.pool.checkedout()
+                release.set()
+                return checked_out, await registration
+        finally:
+            release.set()
+            await engine.dispose()
+
+    checked_out, user = asyncio.run(scenario())
+    assert checked_out == 0
+    assert user.email == "new@example.com"
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from app.background_jobs import BackgroundJobs
+from app.grading import RescoreJobs
+
+
+class CountingJobs(BackgroundJobs):
+    def __init__(self, root):
+        super().__init__(root)
+        self.finished = []
+
+    def create(self, count):
+        return self._new_job(count=count)
+
+    async def _work(self, job, progress):
+        if job["count"] < 0:
+            raise ValueError("negative count")
+        for done in range(1, job["count"] + 1):
+            await asyncio.sleep(0.01)
+            progress({"done": done})
+        return {"total": job["count"]}
+
+    def _finished(self, job):
+        self.finished.append(job["job_id"])
+
+
+def run_job(jobs, job):
+    async def scenario():
+        jobs.start(job)
+        await asyncio.gather(*jobs._tasks)
+
+    asyncio.run(scenario())
+    return jobs.status(job["job_id"])
+
+
+def test_job_reports_progress_and_result(tmp_path):
+    jobs = CountingJobs(tmp_path)
+    job = jobs.create(3)
+    assert jobs.status(job["job_id"])["status"] == "queued"
+
+    status = run_job(jobs, job)
+    assert status["status"] == "done"
+    assert status["progress"] == {"done": 3}
+    assert status["result"] == {"total": 3}
+    assert jobs.finished == [job["job_id"]]
+
+
+def test_failed_job_records_error(tmp_path):
+    jobs = CountingJobs(tmp_path)
+    job = jobs.create(-1)
+    status = run_job(jobs, job)
+    assert status["status"] == "failed"
+    assert status["error"] == "negative count"
+    assert jobs.finished == [job["job_id"]]
+
+
+def test_stop_marks_running_jobs_failed(tmp_path):
+    jobs = CountingJobs(tmp_path)
+    job = jobs.create(1000)
+
+    async def scenario():
+        jobs.start(job)
+        await asyncio.sleep(0.05)
+        await jobs.stop()
+
+    asyncio.run(scenario())
+    status = jobs.status(job["job_id"])
+    assert status["status"] == "failed"
+    assert "shutdown" in status["error"]
+
+
+@pytest.mark.parametrize("job_id", ["missing", "../../etc/passwd", "0" * 32])
+def test_unknown_job(tmp_path, job_id):
+    assert CountingJobs(tmp_path).status(job_id) is None
+
+
+def test_rescore_of_missing_test_fails(tmp_path):
+    jobs = RescoreJobs(tmp_path)
+    job = jobs.create("no-such-course", "no-such-module")
+    status = run_job(jobs, job)
+    assert status["status"] == "failed"
+    assert status["error"] == "Test not found"
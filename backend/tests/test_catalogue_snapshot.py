@@ -0,0 +1,61 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app import catalogue_snapshot
+from app.catalogue_snapshot import Catalogue
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    calls = []
+
+    @asynccontextmanager
+    async def session():
+        yield None
+
+    async def load_snapshot(db):
+        calls.append(len(calls) + 1)
+        await asyncio.sleep(0.01)
+        return catalogue_snapshot.CatalogueSnapshot([], [], [])
+
+    monkeypatch.setattr(catalogue_snapshot, "AsyncSessionLocal", session)
+    monkeypatch.setattr(catalogue_snapshot, "load_snapshot", load_snapshot)
+    return calls
+
+
+def test_cold_start_loads_once(loads):
+    catalogue = Catalogue()
+
+    async def scenario():
+        return await asyncio.gather(*(catalogue.get() for _ in range(50)))
+
+    snapshots = asyncio.run(scenario())
+    assert loads == [1]
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+
+
+def test_concurrent_refreshes_coalesce(loads):
+    catalogue = Catalogue()
+
+    async def scenario():
+        first = asyncio.create_task(catalogue.refresh())
+        await asyncio.sleep(0)
+        # Issued while the first load runs - it may miss their change, so one more load follows
+        await asyncio.gather(first, *(catalogue.refresh() for _ in range(20)))
+
+    asyncio.run(scenario())
+    assert loads == [1, 2]
+
+
+def test_refresh_after_load_reloads(loads):
+    catalogue = Catalogue()
+
+    async def scenario():
+        await catalogue.get()
+        await catalogue.refresh()
+        await catalogue.get()
+
+    asyncio.run(scenario())
+    assert loads == [1, 2]
@@ -0,0 +1,59 @@
+import gzip
+
+import pytest
+
+from app import compression
+from app.compression import compress, negotiate_encoding, weak_etag
+
+
+@pytest.fixture
+def with_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "SUPPORTED_ENCODINGS", ("br", "gzip"))
+
+
+@pytest.fixture
+def without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "SUPPORTED_ENCODINGS", ("gzip",))
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("GZIP", "gzip"),
+    ("gzip, deflate, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("br;q=0.9, gzip;q=0.8", "br"),
+    ("br;q=0, gzip;q=0", None),
+    ("*", "br"),
+    ("*;q=0.1, br;q=0", "gzip"),
+    ("gzip;q=abc", None),
+    (" , gzip ; q=0.3", "gzip"),
+])
+def test_negotiate_encoding(with_brotli, accept_encoding, expected):
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("br", None),
+    ("br, gzip", "gzip"),
+    ("*", "gzip"),
+])
+def test_negotiate_encoding_without_brotli(without_brotli, accept_encoding, expected):
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+def test_gzip_is_deterministic():
+    data = "Урок 1: нейросети ".encode("utf-8") * 100
+    assert compress(data, "gzip") == compress(data, "gzip")
+    assert gzip.decompress(compress(data, "gzip", best=True)) == data
+
+
+def test_unknown_encoding_raises():
+    with pytest.raises(ValueError):
+        compress(b"data", "deflate")
+
+
+def test_weak_etag():
+    assert weak_etag('"abc"') == 'W/"abc"'
+    assert weak_etag('W/"abc"') == 'W/"abc"'
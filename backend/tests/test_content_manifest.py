@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+from app import content_manifest
+from app.content_manifest import ContentManifest
+from app.storage_service import ContentCache, StorageService
+
+
+@pytest.fixture
+def course(tmp_path):
+    courses = tmp_path / "courses"
+    lesson = courses / "c1" / "modules" / "m1" / "lessons" / "l1"
+    lesson.mkdir(parents=True)
+    (lesson / "content.md").write_text("# Lesson")
+    (lesson / "video.mp4").write_bytes(b"\0" * 1000)
+    return ContentManifest(courses, ContentCache()), lesson
+
+
+def test_rebuild_hashes_without_holding_the_lock(course, monkeypatch):
+    manifest, lesson = course
+    hash_file = content_manifest.hash_file
+    recorded = threading.Event()
+
+    def slow_hash(path):
+        if path.name == "video.mp4" and not recorded.is_set():
+            # An API write while the rebuild hashes must not wait for it
+            (lesson / "notes.md").write_text("notes")
+            writer = threading.Thread(
+                target=manifest.record, args=("c1", "modules/m1/lessons/l1/notes.md", "abc"), daemon=True
+            )
+            writer.start()
+            writer.join(timeout=5)
+            assert not writer.is_alive()
+            recorded.set()
+        return hash_file(path)
+
+    monkeypatch.setattr(content_manifest, "hash_file", slow_hash)
+    manifest.rebuild("c1")
+
+    files = manifest.files("c1")
+    assert recorded.is_set()
+    assert files["modules/m1/lessons/l1/notes.md"]["sha256"] == "abc"
+    assert files["modules/m1/lessons/l1/video.mp4"]["sha256"] is not None
+
+
+def test_rebuild_keeps_removals_made_during_the_scan(course, monkeypatch):
+    manifest, _ = course
+    manifest.rebuild("c1", hashes=False)
+    scan = manifest._scan
+
+    def scan_then_remove(course_id, hashes):
+        files = scan(course_id, hashes)
+        remover = threading.Thread(
+            target=manifest.remove, args=(course_id, "modules/m1/lessons/l1/video.mp4"), daemon=True
+        )
+        remover.start()
+        remover.join(timeout=5)
+        assert not remover.is_alive()
+        return files
+
+    monkeypatch.setattr(manifest, "_scan", scan_then_remove)
+    manifest.rebuild("c1")
+    assert "modules/m1/lessons/l1/video.mp4" not in manifest.files("c1")
+    assert manifest.files("c1")["modules/m1/lessons/l1/content.md"]["sha256"] is not None
+
+
+def test_scan_missing_builds_only_missing_manifests(course):
+    manifest, _ = course
+    assert manifest.scan_missing() == 1
+    assert "modules/m1/lessons/l1/content.md" in manifest.files("c1")
+    assert manifest.scan_missing() == 0
+
+
+def test_video_deleted_outside_the_api_is_not_found(tmp_path):
+    storage = StorageService(storage_path=str(tmp_path))
+    video_path = storage._get_lesson_files_path("c1", "m1", "l1", "video")
+    video_path.mkdir(parents=True)
+    (video_path / "l1_video_1.mp4").write_bytes(b"\0" * 10)
+    storage.manifest.rebuild("c1")
+
+    assert storage.get_video_file_path("c1", "m1", "l1", "l1_video_1.mp4") is not None
+    (video_path / "l1_video_1.mp4").unlink()
+    assert storage.get_video_file_path("c1", "m1", "l1", "l1_video_1.mp4") is None
+    assert storage.get_media_file_path(storage.get_relative_path(video_path / "l1_video_1.mp4")) is None
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+import pytest
+
+from app.exports import _csv_value, attempts_export_query, progress_export_query
+
+
+@pytest.mark.parametrize("value", ["=HYPERLINK(\"http://x\")", "+1", "-2+3", "@SUM(A1)", "\tcmd", "\rcmd"])
+def test_formula_like_text_is_escaped(value):
+    assert _csv_value(value) == "'" + value
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("Иван Петров", "Иван Петров"),
+    ("a=b", "a=b"),
+    (-5, -5),
+    (None, ""),
+    (datetime(2024, 1, 2, 3, 4), "2024-01-02T03:04:00"),
+    ([{"answer": "=1+1"}], '[{"answer": "=1+1"}]'),
+])
+def test_other_values_are_unchanged(value, expected):
+    assert _csv_value(value) == expected
+
+
+@pytest.mark.parametrize("query", [progress_export_query(), attempts_export_query(module_id="m1")])
+def test_exports_have_deterministic_order(query):
+    assert "ORDER BY" in str(query)
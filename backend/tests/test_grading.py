@@ -0,0 +1,83 @@
+import pytest
+
+from app.grading import compile_answer_key, grade_batch
+
+QUESTIONS = [
+    {"id": "q1", "type": "multiple_choice", "correct_answer": "b", "points": 1},
+    {"id": "q2", "type": "multiple_choice", "correct_answer": ["a", "c"], "points": 2},
+    {"id": "q3", "type": "text", "correct_answer": "  Neural Network ", "points": 3},
+    {"id": "q4", "type": "multiple_choice", "correct_answer": ["x"]},
+    {"id": "q5", "type": "matching", "correct_answer": {"a": "1"}, "points": 4},
+    {"id": "q6", "type": "text", "correct_answer": "", "points": 1},
+]
+
+
+def legacy_score(questions, answer_map):
+    """Grading loop of submit_test before the answer key was compiled"""
+    score = 0.0
+    for q in questions:
+        user_answer = answer_map.get(q["id"])
+        correct_answer = q.get("correct_answer")
+        if q["type"] == "multiple_choice":
+            if isinstance(correct_answer, list):
+                if isinstance(user_answer, list):
+                    if set(user_answer) == set(correct_answer):
+                        score += q.get("points", 1)
+                elif user_answer in correct_answer:
+                    score += q.get("points", 1) * 0.5
+            else:
+                if user_answer == correct_answer:
+                    score += q.get("points", 1)
+        elif q["type"] == "text":
+            if user_answer and correct_answer:
+                if str(user_answer).strip().lower() == str(correct_answer).strip().lower():
+                    score += q.get("points", 1)
+    return score
+
+
+ANSWER_MAPS = [
+    {},
+    {"q1": "b", "q2": ["c", "a"], "q3": "neural network", "q4": ["x"]},
+    {"q1": "a", "q2": ["a"], "q3": "NEURAL NETWORK  ", "q4": "x"},
+    {"q2": "a", "q4": "y"},
+    {"q2": ["a", "c", "d"], "q3": ""},
+    {"q1": None, "q2": None, "q3": None},
+    {"q2": ["a", "a", "c"]},
+    {"q5": {"a": "1"}, "q6": "anything"},
+    {"unknown": "b", "q1": "b"},
+]
+
+
+@pytest.mark.parametrize("answers", ANSWER_MAPS)
+def test_score_matches_legacy_grading(answers):
+    answer_key = compile_answer_key({"questions": QUESTIONS})
+    assert answer_key.score(answers) == legacy_score(QUESTIONS, answers)
+
+
+def test_max_score_counts_default_points():
+    answer_key = compile_answer_key({"questions": QUESTIONS})
+    assert answer_key.max_score == 1 + 2 + 3 + 1 + 4 + 1
+
+
+def test_single_choice_answer_to_multiple_gets_half_points():
+    answer_key = compile_answer_key({"questions": QUESTIONS})
+    assert answer_key.score({"q2": "c"}) == 1.0
+
+
+def test_unhashable_answer_scores_nothing():
+    answer_key = compile_answer_key({"questions": QUESTIONS})
+    assert answer_key.score({"q2": [["a"], "c"], "q4": {"x": 1}}) == 0.0
+
+
+def test_empty_test():
+    answer_key = compile_answer_key({})
+    assert answer_key.max_score == 0
+    assert answer_key.score({"q1": "b"}) == 0.0
+
+
+def test_grade_batch():
+    answer_key = compile_answer_key({"questions": QUESTIONS[:2]})
+    scores, percentages, passed = grade_batch(answer_key, [{"q1": "b", "q2": ["a", "c"]}, {"q1": "b"}, None], 0.7)
+    assert scores == [3.0, 1.0, 0.0]
+    assert percentages == [100.0, pytest.approx(100 / 3), 0.0]
+    assert passed == [True, False, False]
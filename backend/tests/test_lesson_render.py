@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from app import lesson_render
+from app.lesson_render import RENDERER_VERSION, get_rendered_lesson, render_lesson_markdown
+from app.storage_service import StorageService
+
+CONTENT = """# Урок 1
+
+Intro [VIDEO:intro.mp4]
+
+## Sub <script>alert(1)</script>
+
+![diagram](diagram.png)
+
+### Details &amp; notes
+"""
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = StorageService(storage_path=str(tmp_path))
+    monkeypatch.setattr(lesson_render, "storage_service", storage)
+    storage.save_lesson_content("c1", "m1", "l1", CONTENT)
+    return storage
+
+
+def sidecar_path(storage):
+    return storage._get_lesson_path("c1", "m1", "l1") / "content.md.rendered"
+
+
+def test_toc_is_built_from_sanitized_html():
+    rendered = render_lesson_markdown(CONTENT)
+    assert "script" not in rendered.html
+    assert [(item["level"], item["title"]) for item in rendered.toc] == [
+        (1, "Урок 1"),
+        (2, "Sub"),
+        (3, "Details & notes"),
+    ]
+    for item in rendered.toc:
+        assert f'id="{item["id"]}"' in rendered.html
+    assert rendered.media == [
+        {"type": "video", "src": "intro.mp4"},
+        {"type": "image", "src": "diagram.png"},
+    ]
+
+
+def test_rendered_lesson_is_kept_in_a_sidecar(storage, monkeypatch):
+    rendered = get_rendered_lesson("c1", "m1", "l1")
+    sidecar = json.loads(sidecar_path(storage).read_text(encoding="utf-8"))
+    assert sidecar["renderer"] == RENDERER_VERSION
+    assert sidecar["value"]["html"] == rendered.html
+
+    # A new process (empty in-memory cache) reads the sidecar instead of rendering
+    fresh = StorageService(storage_path=str(storage.storage_path))
+    monkeypatch.setattr(lesson_render, "storage_service", fresh)
+    monkeypatch.setattr(lesson_render, "render_lesson_markdown", lambda content: pytest.fail("rendered again"))
+    assert get_rendered_lesson("c1", "m1", "l1").toc == rendered.toc
+
+
+def test_stale_sidecar_is_rendered_again(storage):
+    get_rendered_lesson("c1", "m1", "l1")
+    storage.save_lesson_content("c1", "m1", "l1", "# Changed")
+    assert get_rendered_lesson("c1", "m1", "l1").toc[0]["title"] == "Changed"
+
+    sidecar = sidecar_path(storage)
+    data = json.loads(sidecar.read_text(encoding="utf-8"))
+    data["renderer"] = "older"
+    data["value"]["html"] = "<p>old</p>"
+    sidecar.write_text(json.dumps(data), encoding="utf-8")
+    fresh = StorageService(storage_path=str(storage.storage_path))
+    rendering = fresh.get_lesson_rendering("c1", "m1", "l1", lesson_render._render_sidecar, RENDERER_VERSION)
+    assert rendering["html"] != "<p>old</p>"
+
+
+def test_sidecar_is_not_part_of_the_manifest(storage):
+    get_rendered_lesson("c1", "m1", "l1")
+    storage.manifest.rebuild("c1", hashes=False)
+    assert not any(key.endswith(".rendered") for key in storage.manifest.files("c1"))
+
+
+def test_missing_lesson(storage):
+    assert get_rendered_lesson("c1", "m1", "missing") is None
@@ -0,0 +1,37 @@
+import time
+import uuid
+
+from app.media_urls import sign_media_path, verify_media_signature
+
+PATH = "courses/c1/modules/m1/lessons/l1/files/video/l1_video_1.mp4"
+USER_ID = "0b6f7f7e-8a43-4d5e-9a0c-1d2e3f405162"
+
+
+def test_signed_path_verifies():
+    params = sign_media_path(PATH, USER_ID)
+    assert params["uid"] == USER_ID
+    assert verify_media_signature(PATH, params["uid"], params["expires"], params["sig"])
+
+
+def test_uuid_user_id_is_signed_as_string():
+    params = sign_media_path(PATH, uuid.UUID(USER_ID))
+    assert verify_media_signature(PATH, USER_ID, params["expires"], params["sig"])
+
+
+def test_other_path_user_or_expiry_is_rejected():
+    params = sign_media_path(PATH, USER_ID)
+    assert not verify_media_signature(PATH + ".bak", USER_ID, params["expires"], params["sig"])
+    assert not verify_media_signature(PATH, "someone-else", params["expires"], params["sig"])
+    assert not verify_media_signature(PATH, USER_ID, params["expires"] + 3600, params["sig"])
+
+
+def test_expired_signature_is_rejected():
+    params = sign_media_path(PATH, USER_ID, ttl_seconds=-1)
+    assert params["expires"] < time.time()
+    assert not verify_media_signature(PATH, USER_ID, params["expires"], params["sig"])
+
+
+def test_malformed_signature_is_rejected():
+    params = sign_media_path(PATH, USER_ID)
+    for signature in ("", "abc", params["sig"][:-1], params["sig"] + "=", "ж" * len(params["sig"])):
+        assert not verify_media_signature(PATH, USER_ID, params["expires"], signature)
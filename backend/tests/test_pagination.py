@@ -0,0 +1,83 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from app.pagination import (
+    DEFAULT_PAGE_SIZE,
+    PageParams,
+    decode_cursor,
+    encode_cursor,
+    page_sequence,
+    parse_fields,
+)
+
+KEY_TYPES = (int, str)
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor((3, "Company_Module_03"))
+    assert "=" not in cursor
+    assert decode_cursor(cursor, KEY_TYPES) == (3, "Company_Module_03")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    encode_cursor((1,)),
+    encode_cursor((1, "a", 2)),
+    encode_cursor(("1", "a")),
+    encode_cursor((1, 2)),
+    "e30",  # {}
+    "NQ",  # 5
+    "bnVsbA",  # null
+    "ImFiIg",  # "ab"
+    "",
+])
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, KEY_TYPES)
+    assert error.value.status_code == 400
+
+
+ITEMS = [SimpleNamespace(order_index=index // 2, id=f"item{index:03d}") for index in range(250)]
+
+
+def sort_key(item):
+    return item.order_index, item.id
+
+
+def test_without_limit_or_cursor_returns_everything():
+    page, next_cursor = page_sequence(ITEMS, sort_key, PageParams(None, None, None), KEY_TYPES)
+    assert list(page) == ITEMS
+    assert next_cursor is None
+
+
+def test_following_cursors_returns_every_item_once():
+    seen, cursor = [], None
+    while True:
+        page, cursor = page_sequence(ITEMS, sort_key, PageParams(40, cursor, None), KEY_TYPES)
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert seen == ITEMS
+
+
+def test_cursor_without_limit_uses_default_page_size():
+    _, cursor = page_sequence(ITEMS, sort_key, PageParams(10, None, None), KEY_TYPES)
+    page, _ = page_sequence(ITEMS, sort_key, PageParams(None, cursor, None), KEY_TYPES)
+    assert list(page) == ITEMS[10:10 + DEFAULT_PAGE_SIZE]
+
+
+class Item(BaseModel):
+    id: str
+    order_index: int
+    title: str
+
+
+def test_parse_fields():
+    assert parse_fields(None, Item, ("order_index", "id")) is None
+    assert parse_fields("title, id", Item, ("order_index", "id")) == ["order_index", "id", "title"]
+    with pytest.raises(HTTPException) as error:
+        parse_fields("title,secret", Item, ("order_index", "id"))
+    assert error.value.status_code == 400
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.password_pool import PasswordPool, PasswordPoolSaturated
+from app.schemas import UserCreate
+from app.user_import import UserImport
+
+
+def slow_hash(password: str) -> str:
+    time.sleep(0.05)
+    return f"hashed-{password}"
+
+
+def test_run_background_waits_for_idle_worker_instead_of_queueing():
+    pool = PasswordPool(workers=2, queue_size=1)
+
+    async def scenario():
+        background = [asyncio.create_task(pool.run_background(slow_hash, str(i))) for i in range(6)]
+        await asyncio.sleep(0.01)
+        peak = pool.in_flight
+        # The queue slot stays free for interactive calls
+        login = await pool.run(slow_hash, "login")
+        return peak, login, await asyncio.gather(*background)
+
+    try:
+        peak, login, results = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert peak == 2
+    assert login == "hashed-login"
+    assert results == [f"hashed-{i}" for i in range(6)]
+    assert pool.rejected == 0
+
+
+def test_run_rejects_when_queue_is_full():
+    pool = PasswordPool(workers=1, queue_size=0)
+    release = threading.Event()
+
+    async def scenario():
+        blocked = asyncio.create_task(pool.run(release.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(PasswordPoolSaturated):
+            await pool.run(slow_hash, "x")
+        release.set()
+        await blocked
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert pool.rejected == 1
+
+
+def test_import_hashes_in_pool_lanes_and_keeps_order():
+    pool = PasswordPool(workers=3, queue_size=0)
+    users = [UserCreate(email=f"user{i}@example.com", password=f"password{i}") for i in range(7)]
+    importer = UserImport(db=None, pool=pool)
+
+    try:
+        hashes = asyncio.run(importer._hash_passwords(users))
+    finally:
+        pool.shutdown()
+    assert len(hashes) == 7
+    assert pool.peak_in_flight <= 3
+    assert pool.completed == 7
+    assert all(hashed.startswith("$2") for hashed in hashes)
@@ -0,0 +1,74 @@
+import asyncio
+import uuid
+
+from app import auth, catalogue_snapshot
+from app.auth import PRINCIPAL_CHANNEL, CurrentUser, PrincipalCache
+from app.catalogue_snapshot import Catalogue
+from app.models import User
+
+
+def principal(user_id) -> CurrentUser:
+    return CurrentUser(id=user_id, email="a@example.com", full_name=None, role="student",
+                       is_superuser=False, is_active=True)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.listeners = {}
+        self.executed = []
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    def is_closed(self):
+        return False
+
+    async def close(self):
+        pass
+
+    def execute(self, statement):
+        self.executed.append(statement)
+
+
+def test_user_update_notifies_other_workers(monkeypatch):
+    cache = PrincipalCache()
+    monkeypatch.setattr(auth, "principal_cache", cache)
+    user = User(id=uuid.uuid4(), email="a@example.com")
+    cache.set(str(user.id), principal(user.id))
+    connection = FakeConnection()
+
+    auth._invalidate_updated_user(None, connection, user)
+
+    assert cache.get(str(user.id)) is None
+    statement = connection.executed[0].compile()
+    assert "pg_notify" in str(statement)
+    assert list(statement.params.values()) == [PRINCIPAL_CHANNEL, str(user.id)]
+
+
+def test_subscribed_channel_invalidates_and_reconnect_clears(monkeypatch):
+    connection = FakeConnection()
+
+    async def connect(dsn):
+        return connection
+
+    monkeypatch.setattr(catalogue_snapshot.asyncpg, "connect", connect)
+    cache = PrincipalCache()
+    kept, dropped = uuid.uuid4(), uuid.uuid4()
+    cache.set(str(kept), principal(kept))
+    catalogue = Catalogue(reconnect_seconds=60)
+    catalogue.subscribe(PRINCIPAL_CHANNEL, cache.invalidate, cache.clear)
+
+    async def scenario():
+        listener = asyncio.create_task(catalogue._listen())
+        await asyncio.sleep(0.01)
+        # Entries cached before the connection existed may have missed updates
+        assert cache.get(str(kept)) is None
+        cache.set(str(kept), principal(kept))
+        cache.set(str(dropped), principal(dropped))
+        connection.listeners[PRINCIPAL_CHANNEL](connection, 1, PRINCIPAL_CHANNEL, str(dropped))
+        listener.cancel()
+        await asyncio.gather(listener, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert cache.get(str(kept)) is not None
+    assert cache.get(str(dropped)) is None
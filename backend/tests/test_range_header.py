@@ -0,0 +1,42 @@
+import pytest
+
+from app.storage_backends import parse_range_header
+
+SIZE = 1000
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=500-", (500, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=999-999", (999, 999)),
+    ("bytes= 10-20", (10, 20)),
+])
+def test_satisfiable_range(header, expected):
+    assert parse_range_header(header, SIZE) == expected
+
+
+@pytest.mark.parametrize("header", [
+    None,
+    "",
+    "items=0-99",
+    "bytes=0-1,5-6",
+    "bytes=abc-",
+    "bytes=0-xyz",
+    "bytes=-",
+])
+def test_ignored_range_means_full_response(header):
+    assert parse_range_header(header, SIZE) is None
+
+
+@pytest.mark.parametrize("header, size", [
+    ("bytes=1000-", SIZE),
+    ("bytes=20-10", SIZE),
+    ("bytes=-0", SIZE),
+    ("bytes=0-", 0),
+])
+def test_unsatisfiable_range(header, size):
+    with pytest.raises(ValueError):
+        parse_range_header(header, size)
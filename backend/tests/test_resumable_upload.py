@@ -0,0 +1,68 @@
+import threading
+import uuid
+
+import pytest
+
+from app.storage_service import ResumableUploadService, UploadError, UploadInProgress, storage_service
+
+PART_SIZE = 4
+
+
+@pytest.fixture
+def uploads():
+    return ResumableUploadService(storage_service, part_size=PART_SIZE)
+
+
+def start_upload(uploads, data: bytes) -> str:
+    lesson_id = f"lesson-{uuid.uuid4().hex[:8]}"
+    upload = uploads.create("course-1", "module-1", lesson_id, "clip.mp4", len(data))
+    return upload["upload_id"]
+
+
+def send_parts(uploads, upload_id: str, data: bytes) -> None:
+    for offset in range(0, len(data), PART_SIZE):
+        uploads.write_part(upload_id, offset, data[offset:offset + PART_SIZE])
+
+
+def test_complete_publishes_once_under_concurrency(uploads):
+    data = b"0123456789"
+    upload_id = start_upload(uploads, data)
+    send_parts(uploads, upload_id, data)
+
+    results = []
+    barrier = threading.Barrier(8)
+
+    def complete():
+        barrier.wait()
+        try:
+            results.append(uploads.complete(upload_id))
+        except UploadInProgress:
+            results.append("busy")
+
+    threads = [threading.Thread(target=complete) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    published = [result for result in results if result not in (None, "busy")]
+    assert len(published) == 1
+    assert published[0].endswith("_video_1.mp4")
+    assert uploads.status(upload_id) is None
+
+
+def test_failed_complete_keeps_session_for_retry(uploads):
+    data = b"0123456789"
+    upload_id = start_upload(uploads, data)
+    uploads.write_part(upload_id, 0, data[:PART_SIZE])
+
+    with pytest.raises(UploadError, match="Missing parts"):
+        uploads.complete(upload_id)
+
+    send_parts(uploads, upload_id, data)
+    assert uploads.complete(upload_id).endswith(".mp4")
+
+
+def test_complete_unknown_upload(uploads):
+    assert uploads.complete(uuid.uuid4().hex) is None
+    assert uploads.complete("not-a-uuid") is None
@@ -0,0 +1,43 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app import rollups
+from app.rollups import RollupAggregator
+
+
+@pytest.fixture
+def aggregated(monkeypatch):
+    calls = []
+
+    @asynccontextmanager
+    async def session():
+        yield None
+
+    async def aggregate_modules(db, module_ids):
+        if "broken" in module_ids:
+            raise RuntimeError("database is down")
+        calls.append(set(module_ids))
+
+    monkeypatch.setattr(rollups, "AsyncSessionLocal", session)
+    monkeypatch.setattr(rollups, "aggregate_modules", aggregate_modules)
+    return calls
+
+
+def test_flush_aggregates_each_dirty_module_once(aggregated):
+    aggregator = RollupAggregator()
+    for module_id in ("m1", "m2", "m1"):
+        aggregator.mark(module_id)
+    asyncio.run(aggregator.flush())
+    asyncio.run(aggregator.flush())
+    assert aggregated == [{"m1", "m2"}]
+
+
+def test_failed_flush_keeps_modules_dirty(aggregated):
+    aggregator = RollupAggregator()
+    aggregator.mark("broken")
+    aggregator.mark("m1")
+    asyncio.run(aggregator.flush())
+    assert aggregated == []
+    assert aggregator._dirty == {"broken", "m1"}
@@ -0,0 +1,87 @@
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+moto = pytest.importorskip("moto")
+
+from app.storage_backends import S3MediaBackend
+
+BUCKET = "lms-media"
+KEY = "courses/c1/modules/m1/lessons/l1/files/video/l1_video_1.mp4"
+DATA = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def s3(monkeypatch, tmp_path):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    with moto.mock_aws():
+        backend = S3MediaBackend(bucket=BUCKET, endpoint_url=None, public_endpoint_url=None,
+                                 key_prefix="media/", presigned_urls=True)
+        backend.client.create_bucket(Bucket=BUCKET)
+        source = tmp_path / "video.mp4"
+        source.write_bytes(DATA)
+        yield backend, source
+
+
+def test_publish_stores_object_under_prefix(s3):
+    backend, source = s3
+    backend.publish(source, KEY, "video/mp4")
+    head = backend.client.head_object(Bucket=BUCKET, Key="media/" + KEY)
+    assert head["ContentType"] == "video/mp4"
+    assert backend.size(KEY) == len(DATA)
+
+
+def test_publish_does_not_overwrite(s3):
+    backend, source = s3
+    backend.publish(source, KEY)
+    other = source.with_name("other.mp4")
+    other.write_bytes(b"other")
+    with pytest.raises(FileExistsError):
+        backend.publish(other, KEY)
+    assert backend.size(KEY) == len(DATA)
+
+
+def test_iter_range_returns_requested_bytes(s3):
+    backend, source = s3
+    backend.publish(source, KEY)
+    assert b"".join(backend.iter_range(KEY, 100, 1099)) == DATA[100:1100]
+    assert b"".join(backend.iter_range(KEY, len(DATA) - 10, len(DATA) - 1)) == DATA[-10:]
+
+
+def test_size_of_missing_object(s3):
+    backend, _ = s3
+    assert backend.size(KEY) is None
+
+
+def test_delete(s3):
+    backend, source = s3
+    backend.publish(source, KEY)
+    assert backend.delete(KEY) is True
+    assert backend.size(KEY) is None
+    assert backend.delete(KEY) is False
+
+
+def test_presigned_url_signs_key_and_disposition(s3):
+    backend, _ = s3
+    url = urlparse(backend.presigned_url(KEY, "lesson.mp4", "video/mp4"))
+    query = parse_qs(url.query)
+    assert url.path.endswith("/media/" + KEY)
+    assert query["response-content-disposition"] == ['inline; filename="lesson.mp4"']
+    assert query["response-content-type"] == ["video/mp4"]
+    assert "X-Amz-Signature" in query
+
+
+def test_presigned_urls_disabled(s3):
+    backend, _ = s3
+    backend.presigned_urls = False
+    assert backend.presigned_url(KEY, "lesson.mp4") is None
+
+
+def test_scan_lists_objects_without_prefix(s3):
+    backend, source = s3
+    backend.publish(source, KEY)
+    objects = backend.scan("courses/c1/")
+    assert list(objects) == [KEY]
+    assert objects[KEY]["size"] == len(DATA)
+    assert backend.scan("courses/c2/") == {}
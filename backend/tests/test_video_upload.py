@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+
+from app import storage_service as storage_module
+from app.body_limits import DiskMultiPartParser
+from app.storage_service import StorageService
+
+BOUNDARY = "lmsboundary"
+HEADERS = Headers({"content-type": f"multipart/form-data; boundary={BOUNDARY}"})
+
+
+def multipart_body(filename: str, data: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: video/mp4\r\n\r\n"
+    ).encode() + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+async def chunks(body: bytes, size: int = 7):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return StorageService(storage_path=str(tmp_path))
+
+
+def upload(storage, body: bytes, headers: Headers = HEADERS):
+    """Parse and publish like the upload endpoint; returns (filename, parser temp files)"""
+    upload_dir = storage.video_upload_dir("c1", "m1", "l1")
+    parser = DiskMultiPartParser(headers, chunks(body), upload_dir=upload_dir)
+    try:
+        form = asyncio.run(parser.parse())
+        file = form["file"]
+        assert file.file.path.parent == upload_dir
+        filename = storage.publish_uploaded_video(
+            "c1", "m1", "l1", file.filename, file.file.path, file.size, file.file.sha256.hexdigest()
+        )
+        if filename is not None:
+            # Published by linking the parsed file, not by copying it again
+            assert (upload_dir / filename).samefile(file.file.path)
+        return filename
+    finally:
+        parser.cleanup()
+        assert not list(upload_dir.glob(".upload_*"))
+
+
+def test_upload_is_written_once_and_linked_into_place(storage):
+    data = bytes(range(256)) * 40
+    filename = upload(storage, multipart_body("clip.MP4", data))
+    assert filename == "l1_video_1.mp4"
+
+    video_path = storage.get_video_file_path("c1", "m1", "l1", filename)
+    assert video_path.read_bytes() == data
+    key = storage._get_manifest_key("c1", video_path)
+    assert storage.manifest.lookup("c1", key)["sha256"] == hashlib.sha256(data).hexdigest()
+
+
+def test_rejected_uploads_leave_no_files(storage, monkeypatch):
+    assert upload(storage, multipart_body("notes.txt", b"data")) is None
+    monkeypatch.setattr(storage_module, "MAX_VIDEO_SIZE", 3)
+    assert upload(storage, multipart_body("clip.mp4", b"data")) is None
+    assert storage.list_video_files("c1", "m1", "l1") == []
+
+
+@pytest.mark.parametrize("headers, body", [
+    (Headers({"content-type": "application/json"}), b"{}"),
+    (Headers({"content-type": "multipart/form-data"}), b""),
+])
+def test_malformed_body_is_a_bad_request(storage, headers, body):
+    with pytest.raises(HTTPException) as exc_info:
+        upload(storage, body, headers)
+    assert exc_info.value.status_code == 400
+
+
+def test_interrupted_body_leaves_no_files(storage):
+    upload_dir = storage.video_upload_dir("c1", "m1", "l1")
+
+    async def broken_stream():
+        body = multipart_body("clip.mp4", b"x" * 100)
+        yield body[:len(body) // 2]
+        raise HTTPException(status_code=413, detail="Request body is too large")
+
+    parser = DiskMultiPartParser(HEADERS, broken_stream(), upload_dir=upload_dir)
+    with pytest.raises(HTTPException):
+        asyncio.run(parser.parse())
+    assert len(list(upload_dir.glob(".upload_*"))) == 1
+    parser.cleanup()
+    assert not list(upload_dir.glob(".upload_*"))
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef, useCallback } from 'react';
 import { useParams, useNavigate, Link } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
 import api from '../services/api';
@@ -6,19 +6,100 @@ import ReactMarkdown from 'react-markdown';
 import ReactPlayer from 'react-player';
 import '../App.css';
 
+// Signed video URLs are re-requested this long before they expire
+const VIDEO_URL_REFRESH_MARGIN_SECONDS = 60;
+// Fresh URLs tried after a playback error (without playback progress in between) before giving up
+const MAX_VIDEO_URL_RETRIES = 2;
+
 // Custom component for rendering video in markdown
 const VideoRenderer = ({ moduleId, lessonNumber, filename }) => {
-  const getVideoUrl = (filename) => {
-    const baseUrl = process.env.REACT_APP_API_URL || 'http://localhost:8000/api/v1';
-    const videoUrl = `${baseUrl}/modules/${moduleId}/lessons/${lessonNumber}/video/${filename}`;
-    const token = localStorage.getItem('token');
-    if (token) {
-      return `${videoUrl}?token=${encodeURIComponent(token)}`;
+  const [video, setVideo] = useState(null); // { url, expiresAt }
+  const [playing, setPlaying] = useState(false);
+  const playerRef = useRef(null);
+  const playingRef = useRef(false);
+  const resumeRef = useRef(null); // position to restore after swapping in a new URL
+  const retriesRef = useRef(0);
+
+  // Signed, short-lived URL: range requests during playback skip the token/DB check
+  const fetchVideoUrl = useCallback(async () => {
+    try {
+      const res = await api.get(`/modules/${moduleId}/lessons/${lessonNumber}/video/${filename}/url`);
+      setVideo({ url: `${api.defaults.baseURL}${res.data.url}`, expiresAt: res.data.expires_at });
+    } catch (error) {
+      console.error('Error fetching video URL:', error);
     }
-    return videoUrl;
+  }, [moduleId, lessonNumber, filename]);
+
+  // Swap in a fresh URL, continuing from the current position
+  const refreshVideoUrl = useCallback(() => {
+    const player = playerRef.current;
+    resumeRef.current = { time: player ? player.getCurrentTime() : 0, playing: playingRef.current };
+    return fetchVideoUrl();
+  }, [fetchVideoUrl]);
+
+  const setPlayingState = (value) => {
+    playingRef.current = value;
+    setPlaying(value);
   };
 
-  const videoUrl = getVideoUrl(filename);
+  const isExpiring = () =>
+    video && Date.now() / 1000 >= video.expiresAt - VIDEO_URL_REFRESH_MARGIN_SECONDS;
+
+  useEffect(() => {
+    setVideo(null);
+    resumeRef.current = null;
+    retriesRef.current = 0;
+    fetchVideoUrl();
+  }, [fetchVideoUrl]);
+
+  // Refresh before expiry so seeks after a long pause do not get a 403.
+  // While playing, swapping the source would interrupt playback - then the
+  // URL is refreshed on the next pause, or on the error the 403 causes.
+  useEffect(() => {
+    if (!video) {
+      return undefined;
+    }
+    const delay = Math.max(0, (video.expiresAt - VIDEO_URL_REFRESH_MARGIN_SECONDS) * 1000 - Date.now());
+    const timer = setTimeout(() => {
+      if (!playingRef.current) {
+        refreshVideoUrl();
+      }
+    }, delay);
+    return () => clearTimeout(timer);
+  }, [video, refreshVideoUrl]);
+
+  const handleReady = () => {
+    const resume = resumeRef.current;
+    if (resume) {
+      resumeRef.current = null;
+      if (resume.time > 0) {
+        playerRef.current.seekTo(resume.time, 'seconds');
+      }
+      setPlayingState(resume.playing || playingRef.current);
+    }
+  };
+
+  const handlePause = () => {
+    setPlayingState(false);
+    if (isExpiring()) {
+      refreshVideoUrl();
+    }
+  };
+
+  const handleError = (error) => {
+    // An expired signature answers range requests with 403, which the
+    // media element only reports as a generic error - retry with a new URL
+    if (retriesRef.current < MAX_VIDEO_URL_RETRIES) {
+      retriesRef.current += 1;
+      refreshVideoUrl();
+      return;
+    }
+    console.error('Video playback error:', error);
+  };
+
+  if (!video) {
+    return null;
+  }
   
   return (
     <div style={{ marginBottom: '30px', marginTop: '30px' }}>
@@ -32,9 +113,10 @@ const VideoRenderer = ({ moduleId, lessonNumber, filename }) => {
         maxWidth: '800px'
       }}>
         <ReactPlayer
-          url={videoUrl}
+          ref={playerRef}
+          url={video.url}
           controls
-          playing={false}
+          playing={playing}
           width="100%"
           height="100%"
           style={{
@@ -55,9 +137,16 @@ const VideoRenderer = ({ moduleId, lessonNumber, filename }) => {
               }
             }
           }}
-          onError={(error) => {
-            console.error('Video playback error:', error);
+          onReady={handleReady}
+          onPlay={() => setPlayingState(true)}
+          onProgress={() => {
+            if (playingRef.current) {
+              retriesRef.current = 0;
+            }
           }}
+          onPause={handlePause}
+          onEnded={() => setPlayingState(false)}
+          onError={handleError}
         />
       </div>
     </div>
@@ -79,9 +168,17 @@ function LessonView() {
 
   const fetchLesson = async () => {
     try {
-      const lessonRes = await api.get(`/modules/${moduleId}/lessons/${lessonNumber}`);
+      // Markdown comes separately as a plain (precompressed) document
+      const [lessonRes, contentRes] = await Promise.all([
+        api.get(`/modules/${moduleId}/lessons/${lessonNumber}`, {
+          params: { include_content: false },
+        }),
+        api.get(`/modules/${moduleId}/lessons/${lessonNumber}/content`, {
+          transformResponse: (data) => data,
+        }),
+      ]);
       setLesson(lessonRes.data.lesson);
-      setContent(lessonRes.data.content);
+      setContent(contentRes.data);
     } catch (error) {
       console.error('Error fetching lesson:', error);
     } finally {
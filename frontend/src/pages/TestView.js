@@ -12,6 +12,9 @@ function TestView() {
   const [startTime, setStartTime] = useState(null);
   const [submitting, setSubmitting] = useState(false);
   const [tabSwitches, setTabSwitches] = useState(0);
+  const [sessionToken, setSessionToken] = useState(null);
+  // One key per test sitting: retried submits return the same attempt instead of creating a new one
+  const [submissionKey] = useState(() => `${Date.now()}-${Math.random().toString(36).slice(2)}`);
   const { user, logout } = useAuth();
   const navigate = useNavigate();
 
@@ -69,8 +72,10 @@ function TestView() {
 
   const fetchTest = async () => {
     try {
-      const response = await api.get(`/modules/${moduleId}/test`);
+      // Starting a session fixes the question order and the deadline on the server
+      const response = await api.post(`/modules/${moduleId}/test/start`);
       setTest(response.data);
+      setSessionToken(response.data.session_token);
       
       // Initialize answers
       const initialAnswers = {};
@@ -84,9 +89,9 @@ function TestView() {
       setAnswers(initialAnswers);
       
       // Timer setup
-      if (response.data.settings?.time_limit_minutes) {
-        const totalSeconds = response.data.settings.time_limit_minutes * 60;
-        setTimeLeft(totalSeconds);
+      if (response.data.deadline) {
+        const deadline = new Date(`${response.data.deadline}Z`).getTime();
+        setTimeLeft(Math.max(0, Math.floor((deadline - Date.now()) / 1000)));
       }
     } catch (error) {
       console.error('Error fetching test:', error);
@@ -130,13 +135,16 @@ function TestView() {
           answer,
         })),
         time_spent_seconds: timeSpent,
+        session_token: sessionToken,
         suspicious_activity: {
           tab_switches: tabSwitches,
           time_spent: timeSpent,
         },
       };
 
-      const response = await api.post(`/modules/${moduleId}/test/submit`, submission);
+      const response = await api.post(`/modules/${moduleId}/test/submit`, submission, {
+        headers: { 'Idempotency-Key': submissionKey },
+      });
       
       // Clear saved answers
       localStorage.removeItem(`test_${moduleId}_answers`);